@@ -0,0 +1,95 @@
+# scripts/benchmarks/benchmark_backends.py
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd # type: ignore
+
+# Make the pipeline modules in scripts/python importable
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(script_dir), 'python'))
+
+from benchmark_bulk_load import make_usage_frame
+from db_backends import BACKENDS, backend_available, get_postgres_connection_string, is_embedded
+from execute_sql_analysis import ANALYSIS_QUERIES, export_query, export_query_embedded
+from load_data_to_db import load_data_to_db
+
+sql_dir = os.path.join(os.path.dirname(script_dir), 'sql', 'analysis')
+
+
+def time_backend(backend, usage, output_dir):
+    """Full load of the synthetic usage plus the staged tables, then each analysis query"""
+    database = None if not is_embedded(backend) else os.path.join(output_dir, f"benchmark.{backend}")
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        loaded = load_data_to_db(frames={'usage_records': usage}, backend=backend, database=database, use_copy=True)
+    load_seconds = time.perf_counter() - start
+    if not loaded:
+        raise RuntimeError(f"{backend} load failed")
+
+    result = {'backend': backend, 'rows': len(usage), 'load_s': load_seconds, 'load_rows_per_sec': len(usage) / load_seconds}
+    pool = None
+    if not is_embedded(backend):
+        from psycopg2.pool import ThreadedConnectionPool
+        pool = ThreadedConnectionPool(1, 1, get_postgres_connection_string())
+    for sql_file, output_file in ANALYSIS_QUERIES.items():
+        output_path = os.path.join(output_dir, f"{backend}_{output_file}")
+        if pool is None:
+            _, seconds = export_query_embedded(backend, sql_file, output_path, database=database)
+        else:
+            _, seconds = export_query(pool, os.path.join(sql_dir, sql_file), output_path)
+        result[f"{os.path.splitext(sql_file)[0]}_s"] = seconds
+    if pool is not None:
+        pool.closeall()
+    return result
+
+
+def compare_exports(backend, reference, output_dir):
+    """True when every export has the reference backend's rows (floats to 1e-9 relative)"""
+    for output_file in ANALYSIS_QUERIES.values():
+        ours = pd.read_csv(os.path.join(output_dir, f"{backend}_{output_file}"), low_memory=False)
+        theirs = pd.read_csv(os.path.join(output_dir, f"{reference}_{output_file}"), low_memory=False)
+        if list(ours.columns) != list(theirs.columns) or len(ours) != len(theirs):
+            return False
+        ours = ours.sort_values(list(ours.columns)).reset_index(drop=True)
+        theirs = theirs.sort_values(list(theirs.columns)).reset_index(drop=True)
+        for col in ours.columns:
+            if pd.api.types.is_float_dtype(ours[col]) or pd.api.types.is_float_dtype(theirs[col]):
+                if not np.allclose(ours[col].astype(float), theirs[col].astype(float), rtol=1e-9, equal_nan=True):
+                    return False
+            elif not (ours[col].astype(str) == theirs[col].astype(str)).all():
+                return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the analysis database backends on the same data")
+    parser.add_argument('--rows', type=int, default=200_000, help="synthetic usage records to load")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--backends', nargs='+', choices=list(BACKENDS), default=['sqlite', 'duckdb'],
+                        help="postgresql reloads the database configured in scripts/config/database_config.py")
+    args = parser.parse_args()
+
+    usage = make_usage_frame(args.rows, args.seed)
+    backends = [backend for backend in args.backends if backend_available(backend)]
+    for backend in sorted(set(args.backends) - set(backends)):
+        print(f"Skipping {backend}: {BACKENDS[backend]['module']} is not installed")
+    print(f"Loading {args.rows:,} usage records into {', '.join(backends)}")
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        results = [time_backend(backend, usage, output_dir) for backend in backends]
+        for result in results:
+            result['same_results'] = compare_exports(result['backend'], backends[0], output_dir)
+
+    results = pd.DataFrame(results)
+    print(results.to_string(index=False, float_format=lambda v: f"{v:,.3f}"))
+
+
+if __name__ == "__main__":
+    main()
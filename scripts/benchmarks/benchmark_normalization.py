@@ -0,0 +1,104 @@
+# scripts/benchmarks/benchmark_normalization.py
+
+import argparse
+import os
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd # type: ignore
+
+# Make the pipeline modules in scripts/python importable
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(script_dir), 'python'))
+
+from normalization import normalize_msisdn, normalize_revenue
+
+
+# The per-row functions the pipeline used before normalization.py
+def clean_msisdn(msisdn):
+    if pd.isna(msisdn):
+        return msisdn
+    cleaned = re.sub(r'[^\d]', '', str(msisdn))
+    return cleaned
+
+
+def clean_revenue(revenue):
+    if pd.isna(revenue):
+        return 0.0
+    revenue_str = str(revenue).replace(',', '.').strip()
+    try:
+        return float(revenue_str)
+    except ValueError:
+        return 0.0
+
+
+def make_usage_columns(rows, subscribers, seed):
+    """Raw-looking MSISDN and revenue columns with the formats seen in the operator files"""
+    rng = np.random.default_rng(seed)
+    national = rng.integers(700000000, 799999999, size=subscribers)
+    numbers = pd.Series(national).astype(str)
+    styles = np.array([
+        '+27' + numbers,                                                # +27745858892
+        '0' + numbers,                                                  # 0745858892
+        '+27 ' + numbers.str[:2] + ' ' + numbers.str[2:5] + ' ' + numbers.str[5:],  # +27 74 585 8892
+    ])
+    style = rng.integers(0, len(styles), size=subscribers)
+    subscriber_msisdns = styles[style, np.arange(subscribers)]
+
+    msisdn = pd.Series(subscriber_msisdns[rng.integers(0, subscribers, size=rows)], dtype='object')
+
+    cents = rng.integers(0, 5000, size=rows)
+    revenue = pd.Series((cents // 100).astype(str), dtype='object') + np.where(rng.random(rows) < 0.5, ',', '.') + pd.Series(cents % 100).astype(str)
+    revenue[rng.random(rows) < 0.01] = np.nan
+
+    return msisdn, revenue
+
+
+def time_call(func, series):
+    start = time.perf_counter()
+    result = func(series)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark MSISDN/revenue normalization: Series.apply vs vectorized")
+    parser.add_argument('--rows', type=int, default=1_000_000, help="number of usage rows")
+    parser.add_argument('--subscribers', type=int, default=50_000, help="number of distinct MSISDNs")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"Generating {args.rows:,} rows for {args.subscribers:,} subscribers...")
+    msisdn, revenue = make_usage_columns(args.rows, args.subscribers, args.seed)
+
+    results = []
+    for label, apply_func, vector_func, column in [
+        ('msisdn', clean_msisdn, normalize_msisdn, msisdn),
+        ('revenue', clean_revenue, normalize_revenue, revenue),
+    ]:
+        legacy, legacy_time = time_call(lambda s: s.apply(apply_func), column)
+        vectorized, vector_time = time_call(vector_func, column)
+
+        if label == 'revenue':
+            assert np.allclose(legacy.to_numpy(dtype='float64'), vectorized.to_numpy()), "revenue mismatch"
+        else:
+            # The apply path only strips non-digits; the one intended difference
+            # is that local 0XXXXXXXXX numbers get the 27 country code
+            expected = legacy.where(~legacy.str.startswith('0'), '27' + legacy.str[1:])
+            assert (expected == vectorized).all(), "msisdn mismatch"
+
+        results.append({
+            'column': label,
+            'apply_seconds': legacy_time,
+            'vectorized_seconds': vector_time,
+            'apply_rows_per_sec': args.rows / legacy_time,
+            'vectorized_rows_per_sec': args.rows / vector_time,
+            'speedup': legacy_time / vector_time,
+        })
+
+    print(pd.DataFrame(results).to_string(index=False, float_format=lambda v: f"{v:,.2f}"))
+
+
+if __name__ == "__main__":
+    main()
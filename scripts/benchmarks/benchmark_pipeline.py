@@ -0,0 +1,198 @@
+# scripts/benchmarks/benchmark_pipeline.py
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd # type: ignore
+
+# Make the pipeline modules in scripts/python importable
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(script_dir), 'python'))
+
+from db_backends import BACKENDS
+from generate_synthetic_data import MANIFEST_FILE
+from usage_archive import USAGE_SOURCES
+
+project_root = os.path.dirname(os.path.dirname(script_dir))
+results_dir = os.path.join(project_root, 'data', 'benchmarks')
+RESULTS_PATH = os.path.join(results_dir, 'pipeline_benchmarks.csv')
+
+# Pipeline stages in run order: script and the input rows it is measured against
+# ('usage', 'subscribers' or 'all' of the generated rows)
+STAGES = [
+    ('staging', 'staging.py', 'all'),
+    ('subscriber_consolidation', 'subscriber_consolidation.py', 'subscribers'),
+    ('weekly_qualification_report', 'weekly_qualification_report.py', 'usage'),
+    ('load_data_to_db', 'load_data_to_db.py', 'usage'),
+    ('execute_sql_analysis', 'execute_sql_analysis.py', 'usage'),
+]
+
+RESULT_COLUMNS = [
+    'run_at', 'version', 'python', 'scale', 'seed', 'backend', 'usage_source', 'stage',
+    'status', 'rows', 'seconds', 'rows_per_sec', 'peak_rss_mb',
+]
+
+
+def git_version():
+    """Short commit of the project (with -dirty for uncommitted changes), 'unknown' outside git"""
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], cwd=project_root,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def _max_rss_mb(rusage):
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return rusage.ru_maxrss / (2**20 if sys.platform == 'darwin' else 2**10)
+
+
+def run_script(work_dir, command, log_path):
+    """Run a script as a child process; returns (ok, wall seconds, peak RSS in MB or None).
+
+    Linux keeps the parent's RSS high-water mark across fork and exec, so a
+    child never reports less than this process uses; everything heavy (data
+    generation included) runs in a child to keep that floor low.
+    """
+    command = [sys.executable] + command
+    with open(log_path, 'ab') as log:
+        start = time.perf_counter()
+        process = subprocess.Popen(command, cwd=work_dir, stdout=log, stderr=subprocess.STDOUT)
+        if hasattr(os, 'wait4'):
+            # Peak RSS of exactly this child process
+            _, status, rusage = os.wait4(process.pid, 0)
+            seconds = time.perf_counter() - start
+            process.returncode = os.waitstatus_to_exitcode(status)
+            return process.returncode == 0, seconds, _max_rss_mb(rusage)
+        process.wait()
+        return process.returncode == 0, time.perf_counter() - start, None
+
+
+def make_workspace(work_dir, scale, seed, log_path):
+    """Copy of the pipeline scripts plus generated raw data, so the run never touches the project's data"""
+    shutil.copytree(os.path.join(project_root, 'scripts'), os.path.join(work_dir, 'scripts'),
+                    ignore=shutil.ignore_patterns('__pycache__', 'benchmarks'))
+    generator = os.path.join(script_dir, 'generate_synthetic_data.py')
+    ok, seconds, _ = run_script(work_dir, [generator, work_dir, '--scale', str(scale), '--seed', str(seed)], log_path)
+    if not ok:
+        raise RuntimeError(f"Generating scale {scale:g} failed, see {log_path}")
+    with open(os.path.join(work_dir, MANIFEST_FILE), 'r') as f:
+        return json.load(f)['rows'], seconds
+
+
+def benchmark_scale(scale, seed, backend, usage_source, keep=False):
+    """Generate a dataset of the given scale and run every stage on it; one result row per stage"""
+    work_dir = tempfile.mkdtemp(prefix=f"vmobile_bench_{scale:g}x_")
+    log_path = os.path.join(work_dir, 'benchmark.log')
+    try:
+        generated, seconds = make_workspace(work_dir, scale, seed, log_path)
+        print(f"Scale {scale:g}: generated {sum(generated.values()):,} rows in {seconds:.1f}s")
+        rows = {
+            'usage': generated['usage_week1'] + generated['usage_week2'],
+            'subscribers': sum(count for name, count in generated.items() if name.startswith('subscribers_')),
+        }
+        rows['all'] = rows['usage'] + rows['subscribers']
+        stage_args = {
+            'weekly_qualification_report.py': ['--usage-source', usage_source],
+            'load_data_to_db.py': ['--backend', backend, '--copy', '--usage-source', usage_source],
+            'execute_sql_analysis.py': ['--backend', backend],
+        }
+
+        results = []
+        failed = False
+        for stage, script, measured in STAGES:
+            if failed:
+                results.append({'stage': stage, 'status': 'skipped', 'rows': rows[measured]})
+                continue
+            command = [os.path.join(work_dir, 'scripts', 'python', script)] + stage_args.get(script, [])
+            ok, seconds, peak_rss = run_script(work_dir, command, log_path)
+            failed = not ok
+            results.append({
+                'stage': stage, 'status': 'done' if ok else 'failed', 'rows': rows[measured],
+                'seconds': seconds, 'rows_per_sec': rows[measured] / seconds if seconds else None,
+                'peak_rss_mb': peak_rss,
+            })
+            print(f"  {stage:<30} {'ok' if ok else 'FAILED':<7} {seconds:>8.2f}s"
+                  + (f" {peak_rss:>9.1f} MB" if peak_rss is not None else ""))
+        if failed:
+            keep = True
+            print(f"  A stage failed, see {log_path}")
+        return [dict(result, scale=scale, seed=seed, backend=backend, usage_source=usage_source) for result in results]
+    finally:
+        if keep:
+            print(f"  Workspace kept in {work_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def save_results(results, path=RESULTS_PATH):
+    """Append this run's rows to the results file, creating it with a header the first time"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    frame = pd.DataFrame(results).reindex(columns=RESULT_COLUMNS)
+    frame.to_csv(path, mode='a', header=not os.path.exists(path), index=False)
+    return frame
+
+
+def compare_with_previous(current, path=RESULTS_PATH):
+    """Seconds of this run next to the latest earlier run of the same scale, backend and usage source"""
+    if current.empty:
+        return None
+    history = pd.read_csv(path)
+    keys = ['scale', 'seed', 'backend', 'usage_source', 'stage']
+    earlier = history[(history['run_at'] < current['run_at'].iloc[0]) & (history['status'] == 'done')]
+    if earlier.empty:
+        print("\nNo earlier results to compare with")
+        return None
+    previous = earlier.sort_values('run_at').groupby(keys, as_index=False).last()
+    comparison = current.merge(previous[keys + ['version', 'seconds', 'peak_rss_mb']], on=keys, suffixes=('', '_previous'))
+    if comparison.empty:
+        print("\nNo earlier results for these scales to compare with")
+        return None
+    comparison['speedup'] = comparison['seconds_previous'] / comparison['seconds']
+    print(f"\nCompared with earlier runs ({', '.join(comparison['version_previous'].unique())}):")
+    print(comparison[['scale', 'stage', 'seconds_previous', 'seconds', 'speedup', 'peak_rss_mb_previous', 'peak_rss_mb']]
+          .to_string(index=False, float_format=lambda v: f"{v:,.2f}"))
+    return comparison
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every pipeline stage on synthetic data at several scale factors")
+    parser.add_argument('--scales', type=float, nargs='+', default=[1, 10, 100],
+                        help="multiples of the shipped data volume (1 to 1000)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--backend', default='duckdb', choices=list(BACKENDS),
+                        help="analysis database; postgresql reloads the database configured in scripts/config")
+    parser.add_argument('--usage-source', default='staging', choices=USAGE_SOURCES)
+    parser.add_argument('--results', default=RESULTS_PATH, help="CSV the results are appended to")
+    parser.add_argument('--version', default=None, help="label of this run in the results (default: git describe)")
+    parser.add_argument('--keep', action='store_true', help="keep the generated workspaces")
+    args = parser.parse_args()
+
+    run_at = datetime.datetime.now().isoformat(timespec='seconds')
+    version = args.version or git_version()
+    print(f"Benchmarking {version} at scales {', '.join(f'{scale:g}x' for scale in args.scales)} ({args.backend})")
+
+    results = []
+    for scale in args.scales:
+        results += benchmark_scale(scale, args.seed, args.backend, args.usage_source, keep=args.keep)
+    for result in results:
+        result.update(run_at=run_at, version=version, python=platform.python_version())
+
+    current = save_results(results, args.results)
+    print()
+    print(current[['scale', 'stage', 'status', 'rows', 'seconds', 'rows_per_sec', 'peak_rss_mb']]
+          .to_string(index=False, float_format=lambda v: f"{v:,.2f}"))
+    print(f"\nResults appended to {args.results}")
+    compare_with_previous(current[current['status'] == 'done'], args.results)
+
+
+if __name__ == "__main__":
+    main()
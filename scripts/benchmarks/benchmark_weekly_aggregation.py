@@ -0,0 +1,91 @@
+# scripts/benchmarks/benchmark_weekly_aggregation.py
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd # type: ignore
+
+# Make the pipeline modules in scripts/python importable
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(script_dir), 'python'))
+
+from usage_ingestion import SMS_EVENT_IDS, VOICE_EVENT_IDS, summarize_usage_by_msisdn
+
+
+# The three groupbys and two merges the weekly report used before the fused aggregation
+def three_pass_totals(weekly_usage):
+    weekly_revenue = weekly_usage.groupby('msisdn').agg({
+        'usage_event_revenue': 'sum'
+    }).reset_index().rename(columns={'usage_event_revenue': 'total_weekly_revenue'})
+
+    sms_counts = weekly_usage[weekly_usage['usage_event_type_id'].isin(SMS_EVENT_IDS)]
+    sms_counts = sms_counts.groupby('msisdn').agg({
+        'usage_event_billing_quantity': 'sum'
+    }).reset_index().rename(columns={'usage_event_billing_quantity': 'total_sms_count'})
+
+    voice_counts = weekly_usage[weekly_usage['usage_event_type_id'].isin(VOICE_EVENT_IDS)]
+    voice_counts = voice_counts.groupby('msisdn').size().reset_index().rename(columns={0: 'total_voice_call_count'})
+
+    totals = weekly_revenue.merge(sms_counts, on='msisdn', how='left').merge(voice_counts, on='msisdn', how='left')
+    totals['total_sms_count'] = totals['total_sms_count'].fillna(0)
+    totals['total_voice_call_count'] = totals['total_voice_call_count'].fillna(0).astype('int64')
+    return totals
+
+
+def make_weekly_usage(rows, subscribers, seed):
+    """Typed usage records shaped like one week of the staged usage data"""
+    rng = np.random.default_rng(seed)
+    event_type = rng.integers(1, 11, size=rows)
+    msisdn = 27700000000 + rng.integers(0, subscribers, size=rows)
+    return pd.DataFrame({
+        'msisdn': pd.array(msisdn, dtype='Int64'),
+        'usage_event_type_id': pd.array(event_type, dtype='Int64'),
+        'usage_event_billing_quantity': np.where(np.isin(event_type, SMS_EVENT_IDS), 1.0, rng.integers(1, 600, size=rows)),
+        'usage_event_revenue': np.round(rng.random(rows) * 5, 2),
+    })
+
+
+def time_call(func, usage):
+    start = time.perf_counter()
+    result = func(usage)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark weekly per-subscriber totals: 3 groupbys + merges vs fused bincount")
+    parser.add_argument('--rows', type=int, default=10_000_000, help="number of usage events")
+    parser.add_argument('--subscribers', type=int, default=1_000_000, help="number of distinct MSISDNs")
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs per method (best is reported)")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"Generating {args.rows:,} events for {args.subscribers:,} subscribers...")
+    usage = make_weekly_usage(args.rows, args.subscribers, args.seed)
+
+    results = []
+    outputs = {}
+    for label, func in [('three_pass', three_pass_totals), ('fused', summarize_usage_by_msisdn)]:
+        timings = []
+        for _ in range(args.repeat):
+            outputs[label], seconds = time_call(func, usage)
+            timings.append(seconds)
+        best = min(timings)
+        results.append({'method': label, 'seconds': best, 'rows_per_sec': args.rows / best})
+
+    # Same subscribers, counts and (to the cent) revenue as the report compares them
+    legacy, fused = outputs['three_pass'], outputs['fused']
+    assert legacy['msisdn'].equals(fused['msisdn']), "msisdn mismatch"
+    assert (legacy['total_weekly_revenue'].round(2) == fused['total_weekly_revenue'].round(2)).all(), "revenue mismatch"
+    assert (legacy['total_sms_count'] == fused['total_sms_count']).all(), "sms mismatch"
+    assert (legacy['total_voice_call_count'] == fused['total_voice_call_count']).all(), "voice mismatch"
+
+    results = pd.DataFrame(results)
+    results['speedup'] = results['seconds'].iloc[0] / results['seconds']
+    print(results.to_string(index=False, float_format=lambda v: f"{v:,.2f}"))
+
+
+if __name__ == "__main__":
+    main()
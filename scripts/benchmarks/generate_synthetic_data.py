@@ -0,0 +1,331 @@
+# scripts/benchmarks/generate_synthetic_data.py
+
+import argparse
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd # type: ignore
+
+# Setup paths
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(script_dir))
+raw_data_dir = os.path.join(project_root, 'data', 'raw')
+
+# Written next to the generated data/raw: scale, seed and rows per file
+MANIFEST_FILE = 'synthetic_manifest.json'
+
+# Row counts of the shipped raw files; scale 1 reproduces them, scale N is N times as many
+BASE_ROWS = {
+    'usage_week1': 5_348,
+    'usage_week2': 5_909,
+    'subscribers': 401,     # distinct people across the three operator systems
+}
+# People seen in usage but in no subscriber extract (23 of 382 in the shipped data)
+UNKNOWN_SHARE = 0.06
+
+# Which systems hold a person, as shares of all people (from the shipped extracts:
+# no overlap between VMobile and ArrowMobile, BlueMobile overlaps both)
+SYSTEM_MEMBERSHIP = [
+    (('vmobile',), 0.237),
+    (('arrowmobile',), 0.257),
+    (('bluemobile',), 0.297),
+    (('vmobile', 'bluemobile'), 0.035),
+    (('arrowmobile', 'bluemobile'), 0.07),
+    (('vmobile', 'arrowmobile', 'bluemobile'), 0.0),
+]
+# Second BlueMobile row for the same number (alias city, typo or swapped birthday)
+BLUEMOBILE_DUPLICATE_SHARE = 0.07
+
+# Usage event types: (share, tracking unit, billing unit, rate per billed unit low/high)
+EVENT_TYPES = {
+    1: (0.32, 'MBs', 'MBs', 0.08, 0.20),
+    2: (0.04, 'MBs', 'MBs', 0.20, 0.40),
+    3: (0.04, 'seconds', 'minutes', 0.60, 1.50),
+    4: (0.06, 'seconds', 'minutes', 0.48, 0.96),
+    5: (0.29, 'seconds', 'seconds', 0.02, 0.06),
+    6: (0.03, 'SMSs', 'SMSs', 0.50, 0.70),
+    7: (0.04, 'seconds', 'minutes', 0.60, 1.20),
+    8: (0.18, 'seconds', 'seconds', 0.10, 0.20),
+    9: (0.02, 'SMSs', 'SMSs', 0.60, 0.80),
+}
+
+# Each file in the dialect of the shipped one: delimiter, encoding (utf-8-sig
+# writes the BOM), decimal separator and date formats
+USAGE_FILES = {
+    'usage_week1': {
+        'file': 'VMobile_usage_records.csv', 'sep': ';', 'encoding': 'utf-8', 'decimal': ',',
+        'date_format': '%d %m %Y %H:%M', 'first_day': '2025-07-14', 'days': 6,
+    },
+    'usage_week2': {
+        'file': 'VMobile_usage_records_week_2.csv', 'sep': ',', 'encoding': 'utf-8-sig', 'decimal': '.',
+        'date_format': '%Y/%m/%d %H:%M', 'first_day': '2025-07-20', 'days': 7,
+    },
+}
+USAGE_HEADER = [
+    'MSISDN', 'USAGE_EVENT_DATE_TIME', 'USAGE_EVENT_CITY_ID', 'USAGE_EVENT_TYPE_ID',
+    'USAGE_EVENT_TRACKING_QUANTITY', 'USAGE_EVENT_TRACKING_UNIT', 'USAGE_EVENT_BILLING_QUANTITY',
+    'USAGE_EVENT_BILLING_UNIT', 'USAGE_EVENT_REVENUE',
+]
+SUBSCRIBER_DATE_FORMAT = '%d %m %Y'
+LOOKUP_FILES = ['VMobile_city_lookup.csv', 'VMobile_usage_event_lookup.csv']
+
+USAGE_CHUNK_ROWS = 1_000_000
+
+
+def _read_raw(file_name, **kwargs):
+    return pd.read_csv(os.path.join(raw_data_dir, file_name), sep=';', dtype=str, **kwargs)
+
+
+def _name_pools():
+    """First and last names used in the shipped subscriber extracts"""
+    vmobile = _read_raw('VMobile_subscribers.csv')
+    arrowmobile = _read_raw('VMobile_subscribers_arrowmobile.csv')
+    bluemobile = _read_raw('VMobile_subscribers_bluemobile.csv')
+    first = pd.concat([vmobile['First Name'], arrowmobile['FirstName'], bluemobile['Name']]).dropna().unique()
+    last = pd.concat([vmobile['Last Name'], arrowmobile['LastName'], bluemobile['Surname']]).dropna().unique()
+    return np.sort(first), np.sort(last)
+
+
+def _city_pools():
+    """City ids, names and alternative names (NaN where there is none) of the city lookup"""
+    cities = _read_raw('VMobile_city_lookup.csv')
+    return (cities['CITY_ID'].astype(int).to_numpy(), cities['CITY_NAME'].to_numpy(),
+            cities['ALTERNATIVE_CITY_NAME'].to_numpy())
+
+
+def _random_dates(rng, first, last, size):
+    first, last = pd.Timestamp(first), pd.Timestamp(last)
+    days = rng.integers(0, (last - first).days + 1, size=size)
+    return first + pd.to_timedelta(days, unit='D')
+
+
+def _typo(rng, names):
+    """Names with their last character replaced, like 'Johw' for 'John'"""
+    letters = np.array(list('abcdefghijklmnopqrstuvwxyz'))
+    names = pd.Series(names, dtype=object)
+    return (names.str[:-1] + letters[rng.integers(0, len(letters), size=len(names))]).to_numpy()
+
+
+def make_people(rng, scale):
+    """One row per person: canonical 11-digit MSISDN, names, city, SIM activation and birth dates"""
+    count = max(int(round(BASE_ROWS['subscribers'] * scale)), 1)
+    first_names, last_names = _name_pools()
+    city_ids, city_names, alternative_names = _city_pools()
+    # Cities weighted towards the metros, like the shipped extracts
+    weights = np.where(np.isin(city_names, ['Johannesburg', 'Cape Town', 'Ekurhuleni', 'Durban', 'Pretoria']), 8.0, 1.0)
+    city = rng.choice(len(city_ids), size=count, p=weights / weights.sum())
+    return pd.DataFrame({
+        'msisdn': 27_700_000_000 + rng.choice(100_000_000, size=count, replace=False),
+        'first_name': first_names[rng.integers(0, len(first_names), size=count)],
+        'last_name': last_names[rng.integers(0, len(last_names), size=count)],
+        'city_id': city_ids[city],
+        'city': city_names[city],
+        'alternative_city': alternative_names[city],
+        'sim_activation_date': _random_dates(rng, '2023-07-01', '2025-06-30', count),
+        'date_of_birth': _random_dates(rng, '1940-01-01', '2007-06-30', count),
+    })
+
+
+def assign_systems(rng, people):
+    """Person rows per operator system, following SYSTEM_MEMBERSHIP"""
+    shares = np.array([share for _, share in SYSTEM_MEMBERSHIP])
+    choice = rng.choice(len(SYSTEM_MEMBERSHIP), size=len(people), p=shares / shares.sum())
+    held = {'vmobile': [], 'arrowmobile': [], 'bluemobile': []}
+    for i, (systems, _) in enumerate(SYSTEM_MEMBERSHIP):
+        for system in systems:
+            held[system].append(np.flatnonzero(choice == i))
+    return {system: people.iloc[np.sort(np.concatenate(rows))].reset_index(drop=True) for system, rows in held.items()}
+
+
+def _city_as_written(rng, people, alias_share):
+    """City names, some written as their alternative name (Tshwane, Egoli, Kaapstad...)"""
+    use_alias = people['alternative_city'].notna().to_numpy() & (rng.random(len(people)) < alias_share)
+    return np.where(use_alias, people['alternative_city'].to_numpy(), people['city'].to_numpy())
+
+
+def _bluemobile_duplicates(rng, people):
+    """Second rows for some numbers: the city as its alias, a typo in the name or day/month swapped"""
+    duplicates = people.sample(frac=BLUEMOBILE_DUPLICATE_SHARE, random_state=rng).copy()
+    kind = rng.integers(0, 3, size=len(duplicates))
+    has_alias = duplicates['alternative_city'].notna().to_numpy()
+    duplicates['city'] = np.where((kind == 0) & has_alias, duplicates['alternative_city'], duplicates['city'])
+    duplicates['first_name'] = np.where(kind == 1, _typo(rng, duplicates['first_name']), duplicates['first_name'])
+    # Only dates with a day of 12 or less can be swapped
+    swapped = pd.to_datetime(duplicates['date_of_birth'].dt.strftime('%Y-%d-%m'), format='%Y-%m-%d', errors='coerce')
+    duplicates['date_of_birth'] = swapped.where((kind == 2) & swapped.notna(), duplicates['date_of_birth'])
+    return duplicates
+
+
+def write_subscribers(rng, systems, output_dir):
+    """The three operator extracts, each with its own columns, MSISDN format and column order"""
+    vmobile = systems['vmobile']
+    pd.DataFrame({
+        'Location': vmobile['city'],
+        'Cell Number': '+' + vmobile['msisdn'].astype(str),
+        'SIM Activation Date': vmobile['sim_activation_date'].dt.strftime(SUBSCRIBER_DATE_FORMAT),
+        'First Name': vmobile['first_name'],
+        'Last Name': vmobile['last_name'],
+        'Birthday': vmobile['date_of_birth'].dt.strftime(SUBSCRIBER_DATE_FORMAT),
+    }).to_csv(os.path.join(output_dir, 'VMobile_subscribers.csv'), sep=';', index=False)
+
+    arrowmobile = systems['arrowmobile']
+    pd.DataFrame({
+        'CellNo': '+' + arrowmobile['msisdn'].astype(str),
+        'FirstName': arrowmobile['first_name'],
+        'LastName': arrowmobile['last_name'],
+        'Area': _city_as_written(rng, arrowmobile, 0.02),
+        'SIMDate': arrowmobile['sim_activation_date'].dt.strftime(SUBSCRIBER_DATE_FORMAT),
+    }).to_csv(os.path.join(output_dir, 'VMobile_subscribers_arrowmobile.csv'), sep=';', index=False)
+
+    # BlueMobile: national 0XXXXXXXXX numbers, aliases and duplicate rows next to their original
+    bluemobile = systems['bluemobile'].copy()
+    bluemobile['city'] = _city_as_written(rng, bluemobile, 0.15)
+    bluemobile = pd.concat([bluemobile, _bluemobile_duplicates(rng, bluemobile)]).sort_values('msisdn', kind='stable')
+    pd.DataFrame({
+        'Activate': bluemobile['sim_activation_date'].dt.strftime(SUBSCRIBER_DATE_FORMAT),
+        'Name': bluemobile['first_name'],
+        'City': bluemobile['city'],
+        'Cell': '0' + (bluemobile['msisdn'] - 27_000_000_000).astype(str),
+        'Date': bluemobile['date_of_birth'].dt.strftime(SUBSCRIBER_DATE_FORMAT),
+        'Surname': bluemobile['last_name'],
+    }).to_csv(os.path.join(output_dir, 'VMobile_subscribers_bluemobile.csv'), sep=';', index=False)
+
+    return {'vmobile': len(vmobile), 'arrowmobile': len(arrowmobile), 'bluemobile': len(bluemobile)}
+
+
+def make_usage_chunk(rng, msisdns, weights, cities, rows, first_day, days):
+    """rows usage events of the given subscribers (activity-weighted) within days from first_day"""
+    type_ids = np.array(list(EVENT_TYPES))
+    shares, tracking_units, billing_units, rate_low, rate_high = (np.array(values) for values in zip(*EVENT_TYPES.values()))
+    chosen = rng.choice(len(type_ids), size=rows, p=shares / shares.sum())
+
+    subscriber = rng.choice(len(msisdns), size=rows, p=weights)
+    tracking = rng.integers(1, 301, size=rows).astype('int64')
+    # Calls tracked in seconds are billed in started minutes (capped at 5 like the shipped data)
+    billing = np.where(billing_units[chosen] == 'minutes', np.minimum(-(-tracking // 60), 5), tracking)
+    rate = rate_low[chosen] + (rate_high[chosen] - rate_low[chosen]) * rng.random(rows)
+    # Most events happen where the subscriber lives
+    city = np.where(rng.random(rows) < 0.8, cities[subscriber], rng.integers(1, 36, size=rows))
+
+    minute = rng.integers(0, days * 24 * 60, size=rows)
+    return pd.DataFrame({
+        'MSISDN': msisdns[subscriber],
+        'USAGE_EVENT_DATE_TIME': pd.Timestamp(first_day) + pd.to_timedelta(minute, unit='min'),
+        'USAGE_EVENT_CITY_ID': city,
+        'USAGE_EVENT_TYPE_ID': type_ids[chosen],
+        'USAGE_EVENT_TRACKING_QUANTITY': tracking,
+        'USAGE_EVENT_TRACKING_UNIT': tracking_units[chosen],
+        'USAGE_EVENT_BILLING_QUANTITY': billing,
+        'USAGE_EVENT_BILLING_UNIT': billing_units[chosen],
+        'USAGE_EVENT_REVENUE': np.round(billing * rate, 2),
+    })
+
+
+def _usage_lines(chunk, spec):
+    """CSV text of a usage chunk in the file's dialect.
+
+    Every column except the MSISDN has few distinct values (minutes of the
+    week, whole quantities, cents), so each is formatted once through a lookup
+    table; pandas to_csv with a date_format is about 8x slower at 1000x.
+    """
+    first_day = pd.Timestamp(spec['first_day'])
+    minutes = pd.date_range(first_day, periods=spec['days'] * 24 * 60, freq='min')
+    time_text = minutes.strftime(spec['date_format']).to_numpy(dtype=object)
+    minute = ((chunk['USAGE_EVENT_DATE_TIME'] - first_day) // pd.Timedelta(minutes=1)).to_numpy()
+
+    cents = np.round(chunk['USAGE_EVENT_REVENUE'].to_numpy() * 100).astype('int64')
+    # '%.10g' writes whole revenues as '4' like the shipped files, not '4.0'
+    revenue_text = np.array([f"{value / 100:.10g}".replace('.', spec['decimal']) for value in range(cents.max() + 1)],
+                            dtype=object)
+    whole = max(int(chunk[col].max()) for col in ['USAGE_EVENT_CITY_ID', 'USAGE_EVENT_TYPE_ID',
+                                                   'USAGE_EVENT_TRACKING_QUANTITY', 'USAGE_EVENT_BILLING_QUANTITY'])
+    whole_text = np.array([str(value) for value in range(whole + 1)], dtype=object)
+
+    columns = [
+        ('+' + chunk['MSISDN'].astype(str)).to_numpy(dtype=object),
+        time_text[minute],
+        whole_text[chunk['USAGE_EVENT_CITY_ID'].to_numpy()],
+        whole_text[chunk['USAGE_EVENT_TYPE_ID'].to_numpy()],
+        whole_text[chunk['USAGE_EVENT_TRACKING_QUANTITY'].to_numpy()],
+        chunk['USAGE_EVENT_TRACKING_UNIT'].to_numpy(dtype=object),
+        whole_text[chunk['USAGE_EVENT_BILLING_QUANTITY'].to_numpy()],
+        chunk['USAGE_EVENT_BILLING_UNIT'].to_numpy(dtype=object),
+        revenue_text[cents],
+    ]
+    lines = columns[0]
+    for column in columns[1:]:
+        lines = lines + spec['sep'] + column
+    return '\n'.join(lines.tolist()) + '\n'
+
+
+def write_usage(rng, people, scale, output_dir):
+    """Both weekly usage files, written in chunks so memory stays flat at any scale"""
+    # Usage comes from the subscribers plus some numbers no operator system knows
+    unknown = max(int(round(len(people) * UNKNOWN_SHARE)), 1)
+    known = set(people['msisdn'])
+    extra = 27_700_000_000 + rng.integers(0, 100_000_000, size=unknown * 2)
+    extra = np.unique(extra[~np.isin(extra, list(known))])[:unknown]
+    msisdns = np.concatenate([people['msisdn'].to_numpy(), extra])
+    cities = np.concatenate([people['city_id'].to_numpy(), rng.integers(1, 36, size=len(extra))])
+    # Uneven activity: a few heavy users, many light ones
+    weights = rng.gamma(4.0, size=len(msisdns))
+    weights /= weights.sum()
+
+    written = {}
+    for name, spec in USAGE_FILES.items():
+        rows = max(int(round(BASE_ROWS[name] * scale)), 1)
+        path = os.path.join(output_dir, spec['file'])
+        with open(path, 'w', encoding=spec['encoding'], newline='') as f:
+            f.write(spec['sep'].join(USAGE_HEADER) + '\n')
+            for start in range(0, rows, USAGE_CHUNK_ROWS):
+                chunk = make_usage_chunk(rng, msisdns, weights, cities, min(USAGE_CHUNK_ROWS, rows - start),
+                                         spec['first_day'], spec['days'])
+                f.write(_usage_lines(chunk, spec))
+        written[name] = rows
+    return written
+
+
+def generate_dataset(output_root, scale=1.0, seed=42):
+    """Write a synthetic data/raw under output_root; returns the rows written per file.
+
+    Same files, columns and quirks as the shipped raw data (semicolon and comma
+    files, BOM, decimal commas, +27 and 0 MSISDNs, both date formats, city
+    aliases and duplicates across and within the operator systems), with scale
+    times the rows. The same seed and scale always give the same files.
+    """
+    rng = np.random.default_rng(seed)
+    output_dir = os.path.join(output_root, 'data', 'raw')
+    os.makedirs(output_dir, exist_ok=True)
+    for file_name in LOOKUP_FILES:
+        shutil.copyfile(os.path.join(raw_data_dir, file_name), os.path.join(output_dir, file_name))
+
+    people = make_people(rng, scale)
+    subscribers = write_subscribers(rng, assign_systems(rng, people), output_dir)
+    usage = write_usage(rng, people, scale, output_dir)
+    rows = dict({'subscribers_' + system: count for system, count in subscribers.items()}, **usage)
+    with open(os.path.join(output_root, MANIFEST_FILE), 'w') as f:
+        json.dump({'scale': scale, 'seed': seed, 'rows': rows}, f, indent=1)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate seeded synthetic subscriber and usage files at a scale factor")
+    parser.add_argument('output', help="directory to write data/raw into (not the project itself)")
+    parser.add_argument('--scale', type=float, default=1.0, help="multiple of the shipped row counts (1 to 1000)")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    if os.path.abspath(args.output) == project_root:
+        parser.error("refusing to overwrite the project's own data/raw")
+    start = time.perf_counter()
+    rows = generate_dataset(args.output, scale=args.scale, seed=args.seed)
+    for name, count in rows.items():
+        print(f"{name:<28} {count:>12,}")
+    print(f"Generated scale {args.scale:g} in {time.perf_counter() - start:.1f}s -> {os.path.join(args.output, 'data', 'raw')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,13 +3,23 @@
 POSTGRES_CONFIG = {
     'host': 'localhost',
     'database': 'vmobile_analysis',
-    'user': 'postgres', 
+    'user': 'postgres',
     'password': '1234',
     'port': '5432'
 }
 
-# Set to False to use PostgreSQL (True would use SQLite)
-USE_SQLITE = False
+# Analysis database: 'postgresql' (the server above), or one of the embedded
+# engines 'sqlite' / 'duckdb', which keep the whole database in one file under
+# data/database and need no server (see scripts/python/db_backends.py)
+DB_BACKEND = 'postgresql'
+
+# Database files of the embedded backends, in data/database. Every load
+# recreates them, so they are kept out of git (vmobile_analysis.db there is
+# the tracked original database and is left alone)
+EMBEDDED_DATABASE_FILES = {
+    'sqlite': 'vmobile_analysis_local.db',
+    'duckdb': 'vmobile_analysis_local.duckdb',
+}
 
 # Connection string for psycopg2
 def get_postgres_connection_string():
@@ -29,4 +39,4 @@ def get_connection_string():
 def get_db_connection_string():
     """Display-friendly connection string"""
     config = POSTGRES_CONFIG
-    return f"PostgreSQL: {config['host']}:{config['port']}/{config['database']}"
\ No newline at end of file
+    return f"PostgreSQL: {config['host']}:{config['port']}/{config['database']}"
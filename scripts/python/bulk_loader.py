@@ -0,0 +1,159 @@
+# scripts/python/bulk_loader.py
+
+import io
+
+import pandas as pd # type: ignore
+
+# Rows written to the in-memory buffer per COPY round trip
+DEFAULT_BATCH_ROWS = 100_000
+
+# Explicit PostgreSQL column types for every table the loader writes.
+# Columns not listed here fall back to a type derived from the (typed) dtype.
+# usage_records, master_subscribers and the lookups are normally created by
+# scripts/sql/schema/tables.sql; keep these types in line with it.
+TABLE_COLUMN_TYPES = {
+    'usage_records': {
+        'msisdn': 'BIGINT',
+        'usage_event_date_time': 'TIMESTAMP',
+        'usage_event_city_id': 'SMALLINT',
+        'usage_event_type_id': 'SMALLINT',
+        'usage_event_tracking_quantity': 'NUMERIC',
+        'usage_event_tracking_unit': 'TEXT',
+        'usage_event_billing_quantity': 'NUMERIC',
+        'usage_event_billing_unit': 'TEXT',
+        'usage_event_revenue': 'NUMERIC(12,2)',
+        'region_id': 'SMALLINT',
+    },
+    'all_subscribers': {
+        'region': 'TEXT',
+        'cell_phone_number': 'BIGINT',
+        'sim_activation_date': 'DATE',
+        'first_name': 'TEXT',
+        'last_name': 'TEXT',
+        'date_of_birth': 'TEXT',
+        'source_system_name': 'TEXT',
+        'source_priority': 'SMALLINT',
+        'is_master_record': 'BOOLEAN',
+    },
+    'subscriber_details': {
+        'msisdn': 'BIGINT',
+        'week_start': 'DATE',
+        'weekly_revenue': 'NUMERIC(14,2)',
+        'total_events': 'INTEGER',
+        'sms_events': 'INTEGER',
+        'voice_events': 'INTEGER',
+        'is_qualifying': 'SMALLINT',
+        'first_name': 'TEXT',
+        'last_name': 'TEXT',
+        'region': 'TEXT',
+        'date_of_birth': 'TEXT',
+        'sim_activation_date': 'DATE',
+        'source_system_name': 'TEXT',
+    },
+    'regional_analysis': {
+        'week_start': 'DATE',
+        'region_name': 'TEXT',
+        'province_name': 'TEXT',
+        'total_subscribers': 'INTEGER',
+        'total_revenue': 'NUMERIC(14,2)',
+        'qualifying_subscribers': 'INTEGER',
+        'avg_qualifier_revenue': 'NUMERIC(14,2)',
+        'qualification_rate': 'NUMERIC(9,2)',
+    },
+    'weekly_summary_trends': {
+        'week_start': 'DATE',
+        'total_subscribers': 'INTEGER',
+        'total_revenue': 'NUMERIC(14,2)',
+        'total_events': 'INTEGER',
+        'qualifying_subscribers': 'INTEGER',
+        'avg_qualifier_revenue': 'NUMERIC(14,2)',
+        'qualification_rate': 'NUMERIC(9,2)',
+    },
+    'city_lookup': {
+        'CITY_ID': 'SMALLINT',
+        'PROVINCE_NAME': 'TEXT',
+        'CITY_NAME': 'TEXT',
+        'ALTERNATIVE_CITY_NAME': 'TEXT',
+        'CITY_LATITUDE': 'DOUBLE PRECISION',
+        'CITY_LONGITUDE': 'DOUBLE PRECISION',
+        'CITY_POPULATION': 'TEXT',
+    },
+    'region_dim': {
+        'region_id': 'SMALLINT',
+        'region_name': 'TEXT',
+        'province_name': 'TEXT',
+    },
+    'usage_event_lookup': {
+        'USAGE_EVENT_TYPE_ID': 'SMALLINT',
+        'USAGE_EVENT_TYPE': 'TEXT',
+    },
+}
+# Same layout for the master list and its upsert staging table
+TABLE_COLUMN_TYPES['master_subscribers'] = TABLE_COLUMN_TYPES['all_subscribers']
+TABLE_COLUMN_TYPES['master_subscribers_incoming'] = TABLE_COLUMN_TYPES['all_subscribers']
+
+INTEGER_TYPES = {'SMALLINT', 'INTEGER', 'BIGINT'}
+
+
+def _dtype_to_sql(dtype):
+    if pd.api.types.is_bool_dtype(dtype):
+        return 'BOOLEAN'
+    if pd.api.types.is_integer_dtype(dtype):
+        return 'BIGINT'
+    if pd.api.types.is_float_dtype(dtype):
+        return 'DOUBLE PRECISION'
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return 'TIMESTAMP'
+    return 'TEXT'
+
+
+def column_types_for(table_name, df, explicit=None):
+    """PostgreSQL type per DataFrame column, explicit types (default: the table's in TABLE_COLUMN_TYPES) first"""
+    explicit = TABLE_COLUMN_TYPES.get(table_name, {}) if explicit is None else explicit
+    return {col: explicit.get(col, _dtype_to_sql(df[col].dtype)) for col in df.columns}
+
+
+def _quote(identifier):
+    return '"' + str(identifier).replace('"', '""') + '"'
+
+
+def create_table(cursor, table_name, column_types, if_exists='append'):
+    """'replace' drops and recreates the table, 'append' creates it only if missing"""
+    if if_exists == 'replace':
+        cursor.execute(f"DROP TABLE IF EXISTS {_quote(table_name)};")
+    columns = ',\n    '.join(f"{_quote(col)} {sql_type}" for col, sql_type in column_types.items())
+    cursor.execute(f"CREATE TABLE IF NOT EXISTS {_quote(table_name)} (\n    {columns}\n);")
+
+
+def _write_csv_batch(batch, column_types, buffer):
+    # Integer columns may come in as floats (NaN holes); COPY wants '3', not '3.0'
+    batch = batch.copy()
+    for col, sql_type in column_types.items():
+        if sql_type in INTEGER_TYPES and not pd.api.types.is_integer_dtype(batch[col].dtype):
+            batch[col] = pd.to_numeric(batch[col], errors='coerce').round().astype('Int64')
+    batch.to_csv(buffer, index=False, header=False, date_format='%Y-%m-%d %H:%M:%S')
+
+
+def copy_dataframe(conn, df, table_name, if_exists='append', batch_rows=DEFAULT_BATCH_ROWS, column_types=None):
+    """Bulk load a DataFrame with COPY FROM STDIN, streaming it in CSV batches.
+
+    conn is a SQLAlchemy Connection; COPY runs on its DBAPI connection so it
+    takes part in the caller's transaction. column_types overrides the
+    explicit types of table_name in TABLE_COLUMN_TYPES. Returns the number of rows copied.
+    """
+    column_types = column_types_for(table_name, df, column_types)
+    cursor = conn.connection.cursor()
+    try:
+        create_table(cursor, table_name, column_types, if_exists=if_exists)
+
+        column_list = ', '.join(_quote(col) for col in df.columns)
+        copy_sql = f"COPY {_quote(table_name)} ({column_list}) FROM STDIN WITH (FORMAT csv, NULL '')"
+
+        for start in range(0, len(df), batch_rows):
+            buffer = io.StringIO()
+            _write_csv_batch(df.iloc[start:start + batch_rows], column_types, buffer)
+            buffer.seek(0)
+            cursor.copy_expert(copy_sql, buffer)
+    finally:
+        cursor.close()
+    return len(df)
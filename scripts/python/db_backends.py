@@ -0,0 +1,165 @@
+# scripts/python/db_backends.py
+
+import importlib.util
+import os
+import re
+import sys
+
+import pandas as pd # type: ignore
+
+from bulk_loader import column_types_for, create_table
+from instrumentation import span
+
+# Setup paths
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(script_dir))
+data_dir = os.path.join(project_root, 'data')
+database_dir = os.path.join(data_dir, 'database')
+sql_dir = os.path.join(project_root, 'scripts', 'sql')
+
+# scripts/config/database_config.py is the one place the database settings live
+sys.path.insert(0, project_root)
+from scripts.config.database_config import ( # noqa: E402
+    DB_BACKEND, EMBEDDED_DATABASE_FILES, get_connection_string, get_db_connection_string,
+    get_postgres_connection_string
+)
+
+# The analysis SQL is written for PostgreSQL. The embedded engines run it
+# translated by translate_sql, or a dialect variant scripts/sql/<kind>/<backend>/<file>
+# where a statement has no direct translation (e.g. partitioned tables).
+# export_digits: SQLite sums NUMERIC as binary floats, so its exports are
+# rounded to this many decimals to drop the noise (98029.22000000003).
+BACKENDS = {
+    'postgresql': {'label': 'PostgreSQL', 'module': 'psycopg2', 'embedded': False, 'export_digits': None},
+    'sqlite': {'label': 'SQLite', 'module': 'sqlite3', 'embedded': True, 'export_digits': 10},
+    'duckdb': {'label': 'DuckDB', 'module': 'duckdb', 'embedded': True, 'export_digits': None},
+}
+
+
+def backend_available(backend):
+    return importlib.util.find_spec(BACKENDS[backend]['module']) is not None
+
+
+def resolve_backend(backend=None):
+    """Backend name to use (default: DB_BACKEND from database_config); fails if unknown or not installed"""
+    backend = backend or DB_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown database backend {backend!r}, expected one of {list(BACKENDS)}")
+    if not backend_available(backend):
+        raise ImportError(f"{BACKENDS[backend]['label']} backend needs the {BACKENDS[backend]['module']} package")
+    return backend
+
+
+def is_embedded(backend):
+    return BACKENDS[backend]['embedded']
+
+
+def database_path(backend, database=None):
+    """File of an embedded backend's database; database overrides the configured one"""
+    return database or os.path.join(database_dir, EMBEDDED_DATABASE_FILES[backend])
+
+
+def describe(backend, database=None):
+    if not is_embedded(backend):
+        return get_db_connection_string()
+    return f"{BACKENDS[backend]['label']}: {database_path(backend, database)}"
+
+
+def connect(backend, database=None, read_only=False):
+    """DBAPI connection to an embedded backend's database file"""
+    path = database_path(backend, database)
+    if backend == 'sqlite':
+        import sqlite3
+        if read_only:
+            return sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        return sqlite3.connect(path)
+    if backend == 'duckdb':
+        import duckdb
+        return duckdb.connect(path, read_only=read_only)
+    raise ValueError(f"{backend} is not an embedded backend")
+
+
+# PostgreSQL-only syntax and its rewrite, per embedded backend. expr::TYPE casts
+# cover identifiers and single function calls, the only operands the SQL uses.
+_CAST = (re.compile(r'(\b\w+\([^()]*\)|\b[\w."]+)::(\w+)'), r'CAST(\1 AS \2)')
+_TRANSLATIONS = {
+    'sqlite': [
+        _CAST,
+        (re.compile(r'\bCREATE OR REPLACE VIEW\b', re.IGNORECASE), 'CREATE VIEW'),
+    ],
+    'duckdb': [],
+}
+
+
+def translate_sql(sql, backend):
+    """PostgreSQL analysis SQL in the dialect of the given backend"""
+    for pattern, replacement in _TRANSLATIONS.get(backend, []):
+        sql = pattern.sub(replacement, sql)
+    return sql
+
+
+def read_sql(kind, file_name, backend):
+    """SQL of scripts/sql/<kind>/<file_name> for a backend: its dialect variant if there is one, else translated"""
+    variant = os.path.join(sql_dir, kind, backend, file_name)
+    if is_embedded(backend) and os.path.exists(variant):
+        with open(variant, 'r') as f:
+            return f.read()
+    with open(os.path.join(sql_dir, kind, file_name), 'r') as f:
+        return translate_sql(f.read(), backend)
+
+
+def execute_script(conn, backend, sql):
+    """Run a file's worth of ;-separated statements"""
+    if backend == 'sqlite':
+        conn.executescript(sql)
+    else:
+        conn.execute(sql)
+
+
+def table_exists(conn, backend, table_name):
+    if backend == 'sqlite':
+        query = "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?"
+    else:
+        query = "SELECT 1 FROM information_schema.tables WHERE table_name = ?"
+    return conn.execute(query, [table_name]).fetchone() is not None
+
+
+def _sqlite_values(df, column_types):
+    """SQLite has no date types: DATE/TIMESTAMP columns are stored as ISO text"""
+    df = df.copy()
+    for col, sql_type in column_types.items():
+        values = df[col]
+        if sql_type in ('DATE', 'TIMESTAMP') or pd.api.types.is_datetime64_any_dtype(values.dtype):
+            times = pd.to_datetime(values, errors='coerce')
+            df[col] = times.dt.strftime('%Y-%m-%d' if sql_type == 'DATE' else '%Y-%m-%d %H:%M:%S')
+        elif isinstance(values.dtype, pd.CategoricalDtype):
+            df[col] = values.astype(object)
+    return df
+
+
+def write_frame(conn, backend, df, table_name, if_exists='append'):
+    """Insert a DataFrame into an embedded backend's table, creating it (with the loader's types) if needed.
+
+    'replace' empties an existing table first, keeping its schema-file types.
+    """
+    column_types = column_types_for(table_name, df)
+    exists = table_exists(conn, backend, table_name)
+    if exists and if_exists == 'replace':
+        conn.execute(f'DELETE FROM "{table_name}"')
+    elif not exists:
+        create_table(conn, table_name, column_types)
+
+    columns = ', '.join(f'"{col}"' for col in df.columns)
+    with span('write', table_name, rows_in=len(df)) as step:
+        if backend == 'sqlite':
+            df = _sqlite_values(df, column_types)
+            df.to_sql(table_name, conn, if_exists='append', index=False, chunksize=50_000)
+        else:
+            # DuckDB scans the DataFrame in place (columnar, no row conversion)
+            conn.register('incoming_frame', df)
+            try:
+                conn.execute(f'INSERT INTO "{table_name}" ({columns}) SELECT {columns} FROM incoming_frame')
+            finally:
+                conn.unregister('incoming_frame')
+        step.count(rows_out=len(df))
+    return len(df)
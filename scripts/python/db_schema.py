@@ -0,0 +1,63 @@
+# scripts/python/db_schema.py
+
+import os
+
+from sqlalchemy import inspect, text # type: ignore
+
+# Setup paths
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(script_dir))
+schema_dir = os.path.join(project_root, 'scripts', 'sql', 'schema')
+
+# Tables whose layout comes from scripts/sql/schema/tables.sql
+MANAGED_TABLES = ['usage_records', 'master_subscribers', 'city_lookup', 'region_dim', 'usage_event_lookup']
+
+# Bump together with a change to tables.sql; older tables are recreated on the next full load
+SCHEMA_VERSION = 3
+SCHEMA_MARKER = f"vmobile schema v{SCHEMA_VERSION}"
+
+
+def _run_sql_file(conn, file_name):
+    with open(os.path.join(schema_dir, file_name), 'r') as f:
+        conn.exec_driver_sql(f.read())
+
+
+def _table_marker(conn, table_name):
+    return conn.execute(
+        text("SELECT obj_description(to_regclass(:table_name), 'pg_class')"),
+        {'table_name': table_name}
+    ).scalar()
+
+
+def is_managed(conn, table_name):
+    return table_name in MANAGED_TABLES and _table_marker(conn, table_name) == SCHEMA_MARKER
+
+
+def schema_is_current(conn):
+    """True when every managed table exists and was created by this schema version"""
+    return all(is_managed(conn, table_name) for table_name in MANAGED_TABLES)
+
+
+def apply_schema(conn):
+    """Create the typed tables, replacing ones created by to_sql or an older schema.
+
+    Dependent views are dropped with them (the loader recreates its views).
+    Only use this ahead of a full load: replaced tables start out empty.
+    """
+    existing = set(inspect(conn).get_table_names())
+    for table_name in MANAGED_TABLES:
+        if table_name in existing and not is_managed(conn, table_name):
+            print(f"Recreating {table_name} with the typed schema")
+            conn.execute(text(f'DROP TABLE "{table_name}" CASCADE;'))
+
+    _run_sql_file(conn, 'tables.sql')
+    for table_name in MANAGED_TABLES:
+        conn.execute(text(f"COMMENT ON TABLE \"{table_name}\" IS '{SCHEMA_MARKER}';"))
+
+
+def create_schema_indexes(conn):
+    _run_sql_file(conn, 'indexes.sql')
+
+
+def truncate_table(conn, table_name):
+    conn.execute(text(f'TRUNCATE "{table_name}";'))
@@ -1,29 +1,155 @@
-import psycopg2
-import pandas as pd
+# scripts/python/execute_sql_analysis.py
+
+import argparse
+import csv
+import hashlib
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from decimal import Decimal
+
+from db_backends import (
+    BACKENDS, connect, database_path, describe, get_postgres_connection_string, is_embedded, read_sql, resolve_backend
+)
+from instrumentation import in_context, span
+from query_cache import QueryCache, read_data_versions
+
+# Rows fetched from a server-side cursor per round trip
+DEFAULT_FETCH_ROWS = 10_000
 
-# Direct configuration - no imports needed
-POSTGRES_CONFIG = {
-    'host': 'localhost',
-    'database': 'vmobile_analysis',
-    'user': 'postgres', 
-    'password': '1234',
-    'port': '5432'
+# Analysis SQL files in scripts/sql/analysis and the CSV each one is exported to
+ANALYSIS_QUERIES = {
+    'weekly_trends_analysis.sql': 'weekly_summary_trends.csv',
+    'regional_analysis.sql': 'regional_analysis.csv',
+    'subscriber_details.sql': 'subscriber_details.csv'
 }
 
-def get_postgres_connection_string():
-    config = POSTGRES_CONFIG
-    return f"host={config['host']} dbname={config['database']} user={config['user']} password={config['password']} port={config['port']}"
 
-def run_sql_analysis():
+def _csv_row(row):
+    # NUMERIC comes back as Decimal; write it as float like the earlier pandas export did
+    return [float(value) if isinstance(value, Decimal) else value for value in row]
+
+
+def _rounded_csv_row(row, digits):
+    return [round(value, digits) if isinstance(value, float) else value for value in _csv_row(row)]
+
+
+def _write_cursor_csv(cursor, output_path, fetch_rows, digits=None):
+    """Write an executed cursor's result to CSV, fetch_rows rows at a time; returns the row count.
+
+    digits rounds float values (see export_digits in db_backends.BACKENDS).
+    """
+    rows = 0
+    tmp_path = output_path + '.tmp'
+    with open(tmp_path, 'w', newline='') as out:
+        writer = csv.writer(out, lineterminator='\n')
+        batch = cursor.fetchmany(fetch_rows)
+        writer.writerow([column[0] for column in cursor.description])
+        while batch:
+            if digits is None:
+                writer.writerows(_csv_row(row) for row in batch)
+            else:
+                writer.writerows(_rounded_csv_row(row, digits) for row in batch)
+            rows += len(batch)
+            batch = cursor.fetchmany(fetch_rows)
+    os.replace(tmp_path, output_path)
+    return rows
+
+
+def export_query(pool, sql_path, output_path, fetch_rows=DEFAULT_FETCH_ROWS):
+    """Stream one query's result to CSV through a server-side cursor.
+
+    Only fetch_rows rows are held in memory at a time. Returns (rows, seconds).
+    """
+    with open(sql_path, 'r') as f:
+        # DECLARE ... CURSOR FOR takes a single statement without the trailing ';'
+        query = f.read().strip().rstrip(';')
+
+    start = time.perf_counter()
+    conn = pool.getconn()
+    try:
+        # Named cursors only live inside a transaction; it is rolled back when done
+        with span('sql_query', os.path.basename(sql_path)) as step, \
+                conn.cursor(name=f"export_{os.path.splitext(os.path.basename(sql_path))[0]}") as cursor:
+            cursor.itersize = fetch_rows
+            cursor.execute(query)
+            rows = _write_cursor_csv(cursor, output_path, fetch_rows)
+            step.count(rows_out=rows)
+    finally:
+        conn.rollback()
+        pool.putconn(conn)
+    return rows, time.perf_counter() - start
+
+
+def export_query_embedded(backend, sql_file, output_path, fetch_rows=DEFAULT_FETCH_ROWS, database=None):
+    """Run one analysis query on an embedded backend (own read-only connection) and export it to CSV.
+
+    Returns (rows, seconds).
+    """
+    query = read_sql('analysis', sql_file, backend)
+    start = time.perf_counter()
+    conn = connect(backend, database, read_only=True)
+    try:
+        with span('sql_query', sql_file) as step:
+            cursor = conn.cursor()
+            cursor.execute(query)
+            rows = _write_cursor_csv(cursor, output_path, fetch_rows, BACKENDS[backend]['export_digits'])
+            step.count(rows_out=rows)
+    finally:
+        conn.close()
+    return rows, time.perf_counter() - start
+
+
+def query_text(backend, sql_path):
+    """A query as it is executed on the backend (PostgreSQL: without the trailing ';', see export_query)"""
+    if is_embedded(backend):
+        return read_sql('analysis', os.path.basename(sql_path), backend)
+    with open(sql_path, 'r') as f:
+        return f.read().strip().rstrip(';')
+
+
+def cache_database_id(backend, database=None):
+    """Which database cached results came from; PostgreSQL's connection string is hashed (it may hold a password)"""
+    if is_embedded(backend):
+        return f"{backend}:{os.path.abspath(database_path(backend, database))}"
+    return f"{backend}:{hashlib.sha256(get_postgres_connection_string().encode('utf-8')).hexdigest()[:16]}"
+
+
+def _data_versions(backend, pool=None, database=None):
+    if pool is None:
+        conn = connect(backend, database, read_only=True)
+        try:
+            return read_data_versions(conn)
+        finally:
+            conn.close()
+    conn = pool.getconn()
+    try:
+        return read_data_versions(conn)
+    finally:
+        conn.rollback()
+        pool.putconn(conn)
+
+
+def run_sql_analysis(max_workers=3, fetch_rows=DEFAULT_FETCH_ROWS, backend=None, database=None, output_dir=None,
+                     use_cache=True, cache=None):
+    """Run the analysis SQL on the configured (or given) backend and export each result to CSV.
+
+    database / output_dir override an embedded backend's database file and
+    the export folder (data/processed). Results are cached (see query_cache):
+    a query whose SQL and input tables are unchanged since the last run is
+    copied from the cache instead of executed. use_cache=False executes every
+    query and refreshes the cache.
+    """
+    backend = resolve_backend(backend)
+    label = BACKENDS[backend]['label']
     # Setup paths - CORRECTED
     script_dir = os.path.dirname(os.path.abspath(__file__))
     project_root = os.path.dirname(os.path.dirname(script_dir))  # Go up TWO levels to VMobile
     data_dir = os.path.join(project_root, 'data')
     sql_dir = os.path.join(project_root, 'scripts', 'sql')  # Correct: scripts/sql
     analysis_dir = os.path.join(sql_dir, 'analysis')
-    output_dir = os.path.join(data_dir, 'processed')
-    
+    output_dir = output_dir or os.path.join(data_dir, 'processed')
+
     print(f"Script directory: {script_dir}")
     print(f"Project root: {project_root}")
     print(f"Looking for SQL files in: {analysis_dir}")
@@ -38,50 +164,108 @@ def run_sql_analysis():
         for root, dirs, files in os.walk(project_root):
             if 'sql' in root.lower():
                 print(f"  {root}")
-        return
+        return False
     
     # Create output directory if it doesn't exist
     os.makedirs(output_dir, exist_ok=True)
     
-    # Connect to PostgreSQL
-    try:
-        conn = psycopg2.connect(get_postgres_connection_string())
-        print("Connected to PostgreSQL successfully!")
-    except Exception as e:
-        print(f"Error connecting to PostgreSQL: {e}")
-        return
-    
-    # Define SQL files and their output names
-    sql_queries = {
-        'weekly_trends_analysis.sql': 'weekly_summary_trends.csv',
-        'regional_analysis.sql': 'regional_analysis.csv', 
-        'subscriber_details.sql': 'subscriber_details.csv'
-    }
-    
+    sql_queries = ANALYSIS_QUERIES
+
+    # One connection per worker (pooled on PostgreSQL); the queries run side by side
+    workers = max(1, min(max_workers, len(sql_queries)))
+    pool = None
+    if is_embedded(backend):
+        print(f"Querying {describe(backend, database)}")
+    else:
+        try:
+            from psycopg2.pool import ThreadedConnectionPool
+            pool = ThreadedConnectionPool(1, workers, get_postgres_connection_string())
+            print(f"Connected to PostgreSQL successfully! (pool of {workers} connections)")
+        except Exception as e:
+            print(f"Error connecting to PostgreSQL: {e}")
+            return False
+
+    # Content versions of the tables the queries read, recorded by load_data_to_db
+    cache = cache or QueryCache()
+    database_id = cache_database_id(backend, database)
+    versions = _data_versions(backend, pool, database)
+    if versions is None:
+        print("No data versions recorded by the loader, query results are not cached")
+
     print("Executing SQL analysis...")
-    
-    for sql_file, output_file in sql_queries.items():
-        sql_path = os.path.join(analysis_dir, sql_file)
-        
-        if os.path.exists(sql_path):
-            with open(sql_path, 'r') as f:
-                query = f.read()
-            
+
+    results = []
+    keys = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        for sql_file, output_file in sql_queries.items():
+            sql_path = os.path.join(analysis_dir, sql_file)
+            if not os.path.exists(sql_path):
+                print(f"Warning: {sql_file} not found in {analysis_dir}")
+                continue
+            output_path = os.path.join(output_dir, output_file)
+            keys[sql_file] = cache.key(query_text(backend, sql_path), database_id, versions)
+            start = time.perf_counter()
+            rows = cache.serve(sql_file, database_id, keys[sql_file], output_path) if use_cache else None
+            if rows is not None:
+                print(f"Saved {rows} records to {output_file} from the result cache")
+                results.append({'query': sql_file, 'rows': rows, 'seconds': time.perf_counter() - start, 'cache': 'hit'})
+                continue
             print(f"Running {sql_file}...")
+            # in_context: the queries' spans stay under the calling stage
+            if pool is None:
+                future = executor.submit(in_context(export_query_embedded), backend, sql_file, output_path, fetch_rows, database)
+            else:
+                future = executor.submit(in_context(export_query), pool, sql_path, output_path, fetch_rows)
+            futures[future] = sql_file
+
+        for future in as_completed(futures):
+            sql_file = futures[future]
             try:
-                result_df = pd.read_sql_query(query, conn)
-                
-                # Save results
-                output_path = os.path.join(output_dir, output_file)
-                result_df.to_csv(output_path, index=False)
-                print(f"Saved {len(result_df)} records to {output_file}")
+                rows, seconds = future.result()
             except Exception as e:
                 print(f"Error running {sql_file}: {e}")
+                results.append({'query': sql_file, 'rows': None, 'seconds': None})
+                continue
+            print(f"Saved {rows} records to {sql_queries[sql_file]} ({seconds:.2f}s)")
+            cache.store(sql_file, database_id, keys[sql_file], os.path.join(output_dir, sql_queries[sql_file]), rows, seconds)
+            results.append({'query': sql_file, 'rows': rows, 'seconds': seconds, 'cache': 'miss'})
+
+    if pool is not None:
+        pool.closeall()
+
+    # Stale entries: queries of this database that are gone or can't be cached any more
+    stale = {cache.entry_name(sql_file, database_id) for sql_file, key in keys.items() if key is None}
+    stale |= {name for name in cache.index
+              if name.startswith(f"{database_id}::") and name.split('::', 1)[1] not in sql_queries}
+    removed = cache.evict(keep=set(cache.index) - stale)
+    cache.save()
+
+    print(f"\n{'Query':<30} {'Rows':>10} {'Seconds':>9} {'Cache':>6}")
+    for result in sorted(results, key=lambda r: r['query']):
+        if result['rows'] is None:
+            print(f"{result['query']:<30} {'failed':>10} {'':>9} {'':>6}")
         else:
-            print(f"Warning: {sql_file} not found in {analysis_dir}")
-    
-    conn.close()
-    print("\nPostgreSQL analysis complete! Files ready for Power BI.")
+            print(f"{result['query']:<30} {result['rows']:>10} {result['seconds']:>9.2f} {result['cache']:>6}")
+    hits = sum(1 for result in results if result.get('cache') == 'hit')
+    print(f"Result cache: {hits} hit(s), {len(results) - hits} miss(es)"
+          + (f", {removed} stale result(s) evicted" if removed else ""))
+
+    if any(result['rows'] is None for result in results):
+        print(f"\n{label} analysis finished with errors, see the failed queries above.")
+        return False
+    print(f"\n{label} analysis complete! Files ready for Power BI.")
+    return True
 
 if __name__ == "__main__":
-    run_sql_analysis()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Run the analysis SQL concurrently and export the results to CSV")
+    parser.add_argument('--max-workers', type=int, default=3, help="queries (and pooled connections) at the same time")
+    parser.add_argument('--fetch-rows', type=int, default=DEFAULT_FETCH_ROWS, help="rows fetched per server-side cursor round trip")
+    parser.add_argument('--backend', choices=list(BACKENDS),
+                        help="analysis database (default: DB_BACKEND in scripts/config/database_config.py)")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="execute every query even if its cached result is current (the cache is refreshed)")
+    args = parser.parse_args()
+
+    run_sql_analysis(max_workers=args.max_workers, fetch_rows=args.fetch_rows, backend=args.backend,
+                     use_cache=not args.no_cache)
@@ -0,0 +1,313 @@
+# scripts/python/instrumentation.py
+
+import argparse
+import contextlib
+import contextvars
+import cProfile
+import csv
+import io
+import itertools
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows: spans are recorded without peak memory
+    resource = None
+
+# Setup paths
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(script_dir))
+data_dir = os.path.join(project_root, 'data')
+run_reports_dir = os.path.join(data_dir, 'run_reports')
+
+# What a span measures; 'stage' is the whole pipeline stage around the others
+STEP_KINDS = ['stage', 'load', 'normalize', 'parse_dates', 'aggregate', 'merge', 'write', 'sql_query']
+
+# Columns of the per-step CSV report, one row per (stage, step, name)
+STEP_COLUMNS = [
+    'stage', 'step', 'name', 'calls', 'seconds', 'self_seconds', 'rows_in', 'rows_out', 'rejected',
+    'peak_rss_mb', 'peak_growth_mb',
+]
+
+# Innermost open span of the current thread/task. Thread pools copy the
+# context into their workers (see in_context) so spans keep their stage.
+# Finished spans are only kept between start_run and end_run, so long-lived
+# callers that never start a run don't accumulate them.
+_current = contextvars.ContextVar('instrumentation_span', default=None)
+_ids = itertools.count(1)
+_lock = threading.Lock()
+_spans = []
+_run = {'name': None, 'started_at': None, 'start': None, 'profile': set(), 'trace_memory': set(), 'stage_profiles': {}}
+
+
+def _peak_rss_mb():
+    """High-water RSS of the whole process so far (ru_maxrss is KiB on Linux, bytes on macOS)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (2**20 if sys.platform == 'darwin' else 2**10)
+
+
+class Span:
+    """One timed step: its kind, what it ran on, rows in and out, rejected rows and memory.
+
+    rows_in / rows_out / rejected are set (or added to with count) by the
+    instrumented code while the span is open.
+    """
+
+    def __init__(self, step, name, stage, parent, rows_in=None):
+        self.id = next(_ids)
+        self.step = step
+        self.name = name
+        self.stage = stage
+        self.parent_id = parent.id if parent is not None else None
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.rejected = None
+        self.seconds = 0.0
+        self.child_seconds = 0.0
+        self.peak_rss_mb = None
+        self.peak_growth_mb = None
+
+    def count(self, rows_in=None, rows_out=None, rejected=None):
+        """Add to the row counts (for steps that see their rows in several pieces)"""
+        if rows_in is not None:
+            self.rows_in = (self.rows_in or 0) + int(rows_in)
+        if rows_out is not None:
+            self.rows_out = (self.rows_out or 0) + int(rows_out)
+        if rejected is not None:
+            self.rejected = (self.rejected or 0) + int(rejected)
+
+    def as_dict(self):
+        return {
+            'id': self.id, 'parent_id': self.parent_id, 'stage': self.stage, 'step': self.step, 'name': self.name,
+            # Children run in a thread pool can add up to more than their parent
+            'seconds': self.seconds, 'self_seconds': max(self.seconds - self.child_seconds, 0.0),
+            'rows_in': self.rows_in, 'rows_out': self.rows_out, 'rejected': self.rejected,
+            'peak_rss_mb': self.peak_rss_mb, 'peak_growth_mb': self.peak_growth_mb,
+        }
+
+
+@contextlib.contextmanager
+def span(step, name=None, rows_in=None, stage=None):
+    """Time a step and record it under the enclosing span's stage.
+
+    Spans nest: a parent's self_seconds leave out the time of its children.
+    Peak memory is the process high-water mark when the span ends; growth is
+    how much the span raised it (exact only while no other stage runs).
+    Outside a run the span is timed but not recorded.
+    """
+    parent = _current.get()
+    stage = stage or (parent.stage if parent is not None else None)
+    current = Span(step, name, stage, parent, rows_in=rows_in)
+    token = _current.set(current)
+    peak_before = _peak_rss_mb()
+    start = time.perf_counter()
+    try:
+        yield current
+    finally:
+        current.seconds = time.perf_counter() - start
+        current.peak_rss_mb = _peak_rss_mb()
+        if peak_before is not None:
+            current.peak_growth_mb = current.peak_rss_mb - peak_before
+        _current.reset(token)
+        with _lock:
+            if parent is not None:
+                parent.child_seconds += current.seconds
+            if _run['start'] is not None:
+                _spans.append(current)
+
+
+def timed_chunks(step, name, chunks):
+    """Iterate chunks, recording the time spent producing each one (and its rows) as a span"""
+    chunks = iter(chunks)
+    while True:
+        with span(step, name) as current:
+            chunk = next(chunks, None)
+            if chunk is not None:
+                current.count(rows_out=len(chunk))
+        if chunk is None:
+            return
+        yield chunk
+
+
+def in_context(func):
+    """func bound to a copy of the current context, for handing to a thread pool"""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(func, *args, **kwargs)
+
+
+def _stage_wanted(stage, selected):
+    return 'all' in selected or stage in selected
+
+
+@contextlib.contextmanager
+def stage_span(stage):
+    """Span around a whole pipeline stage, with the cProfile / tracemalloc hooks of start_run.
+
+    cProfile follows only the stage's own thread. tracemalloc is process-wide,
+    so with stages running side by side its figures include theirs
+    (run the pipeline with --max-workers 1 for clean numbers).
+    """
+    profiler = cProfile.Profile() if _stage_wanted(stage, _run['profile']) else None
+    trace = _stage_wanted(stage, _run['trace_memory'])
+    if trace:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+        tracemalloc.reset_peak()
+    with span('stage', stage, stage=stage) as current:
+        if profiler is not None:
+            try:
+                profiler.enable()
+            except ValueError as e:  # Python 3.12+: one profiler at a time
+                print(f"Not profiling {stage}: {e}")
+                profiler = None
+        try:
+            yield current
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                _run['stage_profiles'].setdefault(stage, {})['cprofile'] = profiler
+            if trace:
+                _, peak = tracemalloc.get_traced_memory()
+                _run['stage_profiles'].setdefault(stage, {}).update(
+                    traced_peak_mb=peak / 2**20, snapshot=tracemalloc.take_snapshot()
+                )
+
+
+def start_run(name, profile=(), trace_memory=()):
+    """Forget earlier spans and start a new run.
+
+    profile / trace_memory are stage names (or 'all') to run under cProfile /
+    tracemalloc; their output is written next to the run report.
+    """
+    with _lock:
+        _spans.clear()
+    _run.update(name=name, started_at=datetime.now(), start=time.perf_counter(),
+                profile=set(profile or ()), trace_memory=set(trace_memory or ()), stage_profiles={})
+
+
+def end_run():
+    """Stop recording spans and forget the run's spans and profiles (write_run_report first)"""
+    with _lock:
+        _spans.clear()
+    _run.update(name=None, started_at=None, start=None, profile=set(), trace_memory=set(), stage_profiles={})
+
+
+def spans():
+    with _lock:
+        return [current.as_dict() for current in _spans]
+
+
+def summarize_steps(span_rows):
+    """Spans grouped by (stage, step, name): calls, total and self time, summed rows, peak memory"""
+    grouped = {}
+    for row in span_rows:
+        key = (row['stage'], row['step'], row['name'])
+        entry = grouped.setdefault(key, dict(zip(STEP_COLUMNS, key + (0, 0.0, 0.0, None, None, None, None, None))))
+        entry['calls'] += 1
+        entry['seconds'] += row['seconds']
+        entry['self_seconds'] += row['self_seconds']
+        for col in ('rows_in', 'rows_out', 'rejected', 'peak_growth_mb'):
+            if row[col] is not None:
+                entry[col] = (entry[col] or 0) + row[col]
+        if row['peak_rss_mb'] is not None:
+            entry['peak_rss_mb'] = max(entry['peak_rss_mb'] or 0, row['peak_rss_mb'])
+    return sorted(grouped.values(), key=lambda entry: -entry['self_seconds'])
+
+
+def _write_stage_profiles(profile_dir):
+    """cProfile stats (.prof plus the top functions as text) and tracemalloc top allocations per stage"""
+    written = {}
+    for stage, outputs in _run['stage_profiles'].items():
+        os.makedirs(profile_dir, exist_ok=True)
+        written[stage] = {}
+        if 'cprofile' in outputs:
+            prof_path = os.path.join(profile_dir, f"{stage}.prof")
+            outputs['cprofile'].dump_stats(prof_path)
+            text = io.StringIO()
+            pstats.Stats(prof_path, stream=text).sort_stats('cumulative').print_stats(40)
+            with open(prof_path + '.txt', 'w') as f:
+                f.write(text.getvalue())
+            written[stage]['cprofile'] = prof_path
+        if 'snapshot' in outputs:
+            trace_path = os.path.join(profile_dir, f"{stage}.tracemalloc.txt")
+            with open(trace_path, 'w') as f:
+                f.write(f"Traced peak: {outputs['traced_peak_mb']:.1f} MB\n\nTop allocations by line:\n")
+                for stat in outputs['snapshot'].statistics('lineno')[:30]:
+                    f.write(f"{stat}\n")
+            written[stage]['tracemalloc'] = trace_path
+            written[stage]['traced_peak_mb'] = outputs['traced_peak_mb']
+    return written
+
+
+def write_run_report(status=None, stages=None, options=None, output_dir=run_reports_dir):
+    """Write the run's spans as <run>_<started>.json (everything) and .csv (per step); returns the JSON path.
+
+    stages is the pipeline_runner report ({stage: {'status', 'seconds'}}).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    started_at = _run['started_at'] or datetime.now()
+    base = os.path.join(output_dir, f"{_run['name'] or 'run'}_{started_at.strftime('%Y%m%d_%H%M%S')}")
+    span_rows = spans()
+    steps = summarize_steps(span_rows)
+
+    report = {
+        'run': _run['name'],
+        'started_at': started_at.isoformat(timespec='seconds'),
+        'finished_at': datetime.now().isoformat(timespec='seconds'),
+        'seconds': time.perf_counter() - _run['start'] if _run['start'] is not None else None,
+        'status': status,
+        'options': options or {},
+        'peak_rss_mb': _peak_rss_mb(),
+        'stages': {name: {'status': entry['status'], 'seconds': entry['seconds']} for name, entry in (stages or {}).items()},
+        'profiles': _write_stage_profiles(base),
+        'steps': steps,
+        'spans': span_rows,
+    }
+    with open(base + '.json', 'w') as f:
+        json.dump(report, f, indent=1, default=str)
+    with open(base + '.csv', 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=STEP_COLUMNS, lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(steps)
+    return base + '.json'
+
+
+def print_steps(steps, limit=20):
+    """The steps that took the most time of their own"""
+    print(f"\n{'Stage':<28} {'Step':<12} {'Name':<30} {'Calls':>6} {'Self s':>8} {'Rows in':>11} {'Rows out':>11} {'Rejected':>9}")
+    for entry in steps[:limit]:
+        print(f"{str(entry['stage']):<28} {entry['step']:<12} {str(entry['name']):<30} {entry['calls']:>6} "
+              f"{entry['self_seconds']:>8.2f} {_count(entry['rows_in']):>11} {_count(entry['rows_out']):>11} "
+              f"{_count(entry['rejected']):>9}")
+
+
+def _count(value):
+    return '' if value is None else f"{value:,}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show the slowest steps of a pipeline run report")
+    parser.add_argument('report', nargs='?', help="run report JSON (default: the latest in data/run_reports)")
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+
+    path = args.report
+    if path is None:
+        reports = sorted(f for f in os.listdir(run_reports_dir) if f.endswith('.json')) if os.path.exists(run_reports_dir) else []
+        if not reports:
+            parser.error(f"no run reports in {run_reports_dir}")
+        path = os.path.join(run_reports_dir, reports[-1])
+    with open(path, 'r') as f:
+        report = json.load(f)
+    print(f"Run {report['run']} started {report['started_at']}: {report['status']}, "
+          f"{report['seconds']:.2f}s, peak RSS {report['peak_rss_mb'] or 0:.0f} MB")
+    print_steps(report['steps'], limit=args.limit)
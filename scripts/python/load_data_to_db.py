@@ -1,28 +1,34 @@
+import argparse
 import pandas as pd
 import os
 import sys
-from sqlalchemy import create_engine, text
-import psycopg2
+from sqlalchemy import create_engine, inspect, text
 
-# Direct configuration
-POSTGRES_CONFIG = {
-    'host': 'localhost',
-    'database': 'vmobile_analysis',
-    'user': 'postgres', 
-    'password': '1234',
-    'port': '5432'
-}
-
-def get_connection_string():
-    return f"postgresql://{POSTGRES_CONFIG['user']}:{POSTGRES_CONFIG['password']}@{POSTGRES_CONFIG['host']}:{POSTGRES_CONFIG['port']}/{POSTGRES_CONFIG['database']}"
-
-def get_db_connection_string():
-    return f"PostgreSQL: {POSTGRES_CONFIG['host']}:{POSTGRES_CONFIG['port']}/{POSTGRES_CONFIG['database']}"
-
-USE_SQLITE = False
-
-print("Loading data to database for advanced analysis...")
-print(f"Using: {'SQLite' if USE_SQLITE else 'PostgreSQL'}")
+from bulk_loader import copy_dataframe
+from db_backends import (
+    BACKENDS, connect, database_path, describe, execute_script, get_connection_string, is_embedded, read_sql,
+    resolve_backend, write_frame
+)
+from instrumentation import span
+from db_schema import MANAGED_TABLES, apply_schema, create_schema_indexes, schema_is_current, truncate_table
+from load_watermarks import (
+    UNDATED, add_week_digests, ensure_watermark_table, file_sha256, get_watermark, get_week_digests,
+    merge_week_digests, set_watermark, set_week_digests, week_keys
+)
+from query_cache import (
+    VERSION_DDL, VERSION_TABLE, content_digest, frame_digest, invalidate_versions, record_versions
+)
+from region_dimension import REGION_TABLE, RegionResolver
+from subscriber_master_store import read_change_log
+from subscriber_week_fact import FACT_DDL, FACT_INDEX, FACT_REBUILD, FACT_TABLE, rebuild_fact, refresh_fact_weeks
+from usage_partitions import (
+    drop_week_partitions, ensure_week_partitions, prepare_swap_table, swap_week_partition, weeks_of
+)
+from staging import USAGE_DATASETS, iter_staged_chunks, read_staged, source_path
+from subscriber_sketches import SKETCH_MARKER, SKETCH_TABLE, rebuild_sketches, sketches_are_current
+from usage_archive import USAGE_SOURCES, open_archive
+from usage_event_store import read_usage_events
+from usage_ingestion import DEFAULT_CHUNKSIZE
 
 # Setup paths
 script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -32,135 +38,678 @@ raw_data_dir = os.path.join(data_dir, 'raw')
 processed_data_dir = os.path.join(data_dir, 'processed')
 database_dir = os.path.join(data_dir, 'database')
 
-print(f"Project root: {project_root}")
-print(f"Data directory: {data_dir}")
-
-# Create database directory if it doesn't exist
-os.makedirs(database_dir, exist_ok=True)
-
-try:
-    # Create SQLAlchemy engine
-    engine = create_engine(get_connection_string())
-    
-    # Test connection
-    with engine.connect() as conn:
-        result = conn.execute(text("SELECT version();"))
-        print("Connected to PostgreSQL:", result.fetchone()[0])
-    
-    # Load all tables - LOOKUP FILES ARE IN RAW FOLDER
-    tables_to_load = {
-        'all_subscribers': ('processed', 'combined_subscribers_all.csv', ','),
-        'master_subscribers': ('processed', 'combined_subscribers_master.csv', ','),
-        'subscriber_details': ('processed', 'subscriber_details.csv', ','),
-        'regional_analysis': ('processed', 'regional_analysis.csv', ','),
-        'weekly_summary_trends': ('processed', 'weekly_summary_trends.csv', ','),
-        'city_lookup': ('raw', 'VMobile_city_lookup.csv', ';'),  # Use semicolon delimiter
-        'usage_event_lookup': ('raw', 'VMobile_usage_event_lookup.csv', ';')  # Use semicolon delimiter
-    }
+# Load all tables - LOOKUP FILES ARE IN RAW FOLDER, all read from the typed staging copies
+tables_to_load = [
+    'all_subscribers',
+    'master_subscribers',
+    'subscriber_details',
+    'regional_analysis',
+    'weekly_summary_trends',
+    'city_lookup',
+    'usage_event_lookup'
+]
+
+# Tables the loader stamps with a content version when it loads them (see query_cache.py)
+USAGE_TABLES = ['usage_records', FACT_TABLE, SKETCH_TABLE]
+VERSIONED_TABLES = tables_to_load + [REGION_TABLE] + USAGE_TABLES
+
+# Tables that decide the region_id of usage rows, so part of usage_records' version
+REGION_INPUTS = ['master_subscribers', 'city_lookup', REGION_TABLE]
+
 
+def write_table(conn, df, table_name, if_exists='append', use_copy=False):
+    """Write a DataFrame with COPY (explicit column types) or with DataFrame.to_sql.
+
+    Tables from the typed schema are never dropped: 'replace' empties them and
+    the rows are appended, so their column types and indexes are kept.
+    usage_records gets the week partitions its rows need created first.
+    """
+    if table_name in MANAGED_TABLES:
+        if if_exists == 'replace':
+            if table_name == 'usage_records':
+                drop_week_partitions(conn)
+            truncate_table(conn, table_name)
+        if_exists = 'append'
+    with span('write', table_name, rows_in=len(df)) as step:
+        if table_name == 'usage_records':
+            ensure_week_partitions(conn, weeks_of(df['usage_event_date_time']))
+        if use_copy:
+            copy_dataframe(conn, df, table_name, if_exists=if_exists)
+        else:
+            df.to_sql(table_name, conn, if_exists=if_exists, index=False)
+        step.count(rows_out=len(df))
+
+
+def _table_frame(table_name, frames):
+    """DataFrame for a table: handed in by the caller, else read from staging"""
+    if frames and table_name in frames:
+        return frames[table_name]
+    return read_staged(table_name)
+
+
+def load_tables(engine, use_copy=False, frames=None):
+    """Replace every table of tables_to_load; returns {table_name: rows loaded}"""
     print("Loading tables to database...")
-    for table_name, (folder, file_name, delimiter) in tables_to_load.items():
-        if folder == 'processed':
-            file_path = os.path.join(processed_data_dir, file_name)
-        else:  # raw folder
-            file_path = os.path.join(raw_data_dir, file_name)
-            
-        if os.path.exists(file_path):
-            df = pd.read_csv(file_path, delimiter=delimiter)
-            df.to_sql(table_name, engine, if_exists='replace', index=False)
+    rows_loaded = {}
+    for table_name in tables_to_load:
+        file_path = source_path(table_name)
+        if frames and table_name in frames or os.path.exists(file_path):
+            df = _table_frame(table_name, frames)
+            with engine.begin() as conn:
+                write_table(conn, df, table_name, if_exists='replace', use_copy=use_copy)
+                record_versions(conn, 'postgresql', {table_name: frame_digest(df)})
             print(f"Loaded {table_name}: {len(df)} records")
             print(f"Columns in {table_name}: {df.columns.tolist()}")
+            rows_loaded[table_name] = len(df)
         else:
             print(f"ERROR: File not found: {file_path}")
+    return rows_loaded
 
-    # Load and prepare usage data
-    print("Preparing usage data...")
-    
-    def prepare_usage_data():
-        usage_week1_path = os.path.join(raw_data_dir, 'VMobile_usage_records.csv')
-        usage_week2_path = os.path.join(raw_data_dir, 'VMobile_usage_records_week_2.csv')
-        
-        if not os.path.exists(usage_week1_path):
-            print(f"ERROR: Usage week1 file not found: {usage_week1_path}")
-            return pd.DataFrame()
-        if not os.path.exists(usage_week2_path):
-            print(f"ERROR: Usage week2 file not found: {usage_week2_path}")
+
+def prepare_regions(frames=None, existing=None):
+    """Region dimension of the city lookup and master subscribers being loaded, with its resolver for usage rows"""
+    return RegionResolver(_table_frame('city_lookup', frames), _table_frame('master_subscribers', frames), existing=existing)
+
+
+def load_region_dimension(engine, use_copy=False, frames=None, keep_ids=False):
+    """(Re)write region_dim and return its resolver.
+
+    keep_ids keeps the IDs of regions already in the database, so usage rows
+    loaded earlier still point at the right region (incremental loads).
+    """
+    with engine.begin() as conn:
+        existing = None
+        if keep_ids and inspect(conn).has_table(REGION_TABLE):
+            existing = pd.read_sql(text(f"SELECT region_id, region_name, province_name FROM {REGION_TABLE};"), conn)
+        regions = prepare_regions(frames, existing)
+        write_table(conn, regions.dim, REGION_TABLE, if_exists='replace', use_copy=use_copy)
+        record_versions(conn, 'postgresql', {REGION_TABLE: frame_digest(regions.dim)})
+    print(f"Loaded {REGION_TABLE}: {len(regions.dim)} regions")
+    return regions
+
+
+def prepare_usage_data(usage_source='staging'):
+    for name in USAGE_DATASETS:
+        if not os.path.exists(source_path(name)):
+            print(f"ERROR: Usage file not found: {source_path(name)}")
             return pd.DataFrame()
-            
-        # Load the data
-        usage_week1 = pd.read_csv(usage_week1_path, delimiter=';')
-        usage_week2 = pd.read_csv(usage_week2_path)
-        
-        # Standardize column names - BOTH FILES HAVE MSISDN
-        column_mapping = {
-            'MSISDN': 'msisdn',
-            'USAGE_EVENT_DATE_TIME': 'usage_event_date_time',
-            'USAGE_EVENT_CITY_ID': 'usage_event_city_id', 
-            'USAGE_EVENT_TYPE_ID': 'usage_event_type_id',
-            'USAGE_EVENT_TRACKING_QUANTITY': 'usage_event_tracking_quantity',
-            'USAGE_EVENT_TRACKING_UNIT': 'usage_event_tracking_unit', 
-            'USAGE_EVENT_BILLING_QUANTITY': 'usage_event_billing_quantity',
-            'USAGE_EVENT_BILLING_UNIT': 'usage_event_billing_unit',
-            'USAGE_EVENT_REVENUE': 'usage_event_revenue'
-        }
-        
-        usage_week1_clean = usage_week1.rename(columns=column_mapping)
-        usage_week2_clean = usage_week2.rename(columns=column_mapping)
-        
-        def clean_msisdn(msisdn):
-            import re
-            if pd.isna(msisdn):
-                return msisdn
-            cleaned = re.sub(r'[^\d]', '', str(msisdn))
-            return cleaned
-        
-        def clean_revenue(revenue):
-            if pd.isna(revenue):
-                return 0.0
-            revenue_str = str(revenue).replace(',', '.')
-            try:
-                return float(revenue_str)
-            except ValueError:
-                return 0.0
-        
-        # Clean the data
-        usage_week1_clean['msisdn'] = usage_week1_clean['msisdn'].apply(clean_msisdn)
-        usage_week2_clean['msisdn'] = usage_week2_clean['msisdn'].apply(clean_msisdn)
-        usage_week1_clean['usage_event_revenue'] = usage_week1_clean['usage_event_revenue'].apply(clean_revenue)
-        usage_week2_clean['usage_event_revenue'] = usage_week2_clean['usage_event_revenue'].apply(clean_revenue)
-        
-        # Combine and parse dates
-        all_usage = pd.concat([usage_week1_clean, usage_week2_clean], ignore_index=True)
-        all_usage['usage_event_date_time'] = pd.to_datetime(
-            all_usage['usage_event_date_time'], 
-            dayfirst=True, 
-            errors='coerce'
-        )
-        
-        return all_usage
-
-    # Load usage data
-    usage_data = prepare_usage_data()
+
+    # Compact columns memory-mapped from usage_event_store / usage_archive
+    if usage_source == 'event_store':
+        return read_usage_events()
+    if usage_source == 'archive':
+        return open_archive().usage_frame()
+
+    # Typed usage records: canonical int64 MSISDN, parsed dates, float revenue
+    return pd.concat([read_staged(name) for name in USAGE_DATASETS], ignore_index=True)
+
+
+def load_usage_records(engine, regions, streaming=False, chunksize=DEFAULT_CHUNKSIZE, use_copy=False, usage_data=None,
+                       usage_source='staging'):
+    """Load usage data into usage_records, optionally streamed in chunks, each row with its region_id"""
+    print("Preparing usage data...")
+
+    if streaming:
+        # Each staged chunk is written before the next one is read,
+        # so only one chunk of usage records is in memory at a time
+        rows_loaded = 0
+        for name in USAGE_DATASETS:
+            if not os.path.exists(source_path(name)):
+                print(f"ERROR: Usage file not found: {source_path(name)}")
+                continue
+            for chunk in iter_staged_chunks(name, chunksize):
+                chunk = regions.assign(chunk)
+                with engine.begin() as conn:
+                    write_table(conn, chunk, 'usage_records', if_exists='replace' if rows_loaded == 0 else 'append', use_copy=use_copy)
+                rows_loaded += len(chunk)
+                print(f"Loaded {rows_loaded} usage records so far...")
+
+        if rows_loaded:
+            print(f"Loaded usage_records: {rows_loaded} records")
+        else:
+            print("ERROR: No usage data to load")
+        return
+
+    if usage_data is None:
+        usage_data = prepare_usage_data(usage_source)
     if not usage_data.empty:
-        usage_data.to_sql('usage_records', engine, if_exists='replace', index=False)
+        usage_data = regions.assign(usage_data)
+        with engine.begin() as conn:
+            write_table(conn, usage_data, 'usage_records', if_exists='replace', use_copy=use_copy)
         print(f"Loaded usage_records: {len(usage_data)} records")
     else:
         print("ERROR: No usage data to load")
 
-    # Create indexes for better performance
-    with engine.connect() as conn:
+
+def _max_event_time(usage_df):
+    latest = usage_df['usage_event_date_time'].max()
+    return None if pd.isna(latest) else latest
+
+
+def _has_duplicate_masters(conn):
+    return conn.execute(text(
+        "SELECT 1 FROM master_subscribers GROUP BY cell_phone_number HAVING COUNT(*) > 1 LIMIT 1;"
+    )).fetchone() is not None
+
+
+def apply_master_changes(conn, changes, use_copy=False):
+    """Apply a subscriber master change log: upsert inserts/updates/flips, delete the rest.
+
+    Returns the number of changed rows, or None if the table can't be
+    changed by key (not there yet, or duplicate numbers) and needs a full upsert.
+    """
+    if not inspect(conn).has_table('master_subscribers') or _has_duplicate_masters(conn):
+        return None
+
+    is_delete = changes['change_type'] == 'delete'
+    deleted = 0
+    if is_delete.any():
+        keys = [int(key) for key in changes.loc[is_delete, 'cell_phone_number']]
+        deleted = conn.execute(
+            text("DELETE FROM master_subscribers WHERE cell_phone_number = ANY(:keys);"), {'keys': keys}
+        ).rowcount
+
+    upserts = changes.loc[~is_delete].drop(columns=['change_type', 'previous_source_system_name'])
+    changed = upsert_master_subscribers(conn, upserts, use_copy=use_copy) if len(upserts) else 0
+    return changed + deleted
+
+
+def upsert_master_subscribers(conn, master_df, use_copy=False):
+    """Insert new and update changed master records, keyed on cell_phone_number"""
+    if not inspect(conn).has_table('master_subscribers'):
+        write_table(conn, master_df, 'master_subscribers', use_copy=use_copy)
+        return len(master_df)
+
+    # Masters consolidated before MSISDN canonicalization can hold the same
+    # number twice; those can't be upserted by key, so replace them once
+    if _has_duplicate_masters(conn) or master_df['cell_phone_number'].duplicated().any():
+        print("master_subscribers has duplicate cell_phone_number keys, replacing the table")
+        conn.execute(text("DROP INDEX IF EXISTS uq_master_subscribers_cell;"))
+        write_table(conn, master_df, 'master_subscribers', if_exists='replace', use_copy=use_copy)
+        return len(master_df)
+
+    write_table(conn, master_df, 'master_subscribers_incoming', if_exists='replace', use_copy=use_copy)
+    conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS uq_master_subscribers_cell ON master_subscribers (cell_phone_number);"))
+
+    columns = [f'"{col}"' for col in master_df.columns]
+    value_columns = [col for col in columns if col != '"cell_phone_number"']
+    result = conn.execute(text(f"""
+        INSERT INTO master_subscribers ({', '.join(columns)})
+        SELECT {', '.join(columns)} FROM master_subscribers_incoming
+        ON CONFLICT (cell_phone_number) DO UPDATE SET
+            {', '.join(f'{col} = EXCLUDED.{col}' for col in value_columns)}
+        WHERE ({', '.join(f'master_subscribers.{col}' for col in value_columns)})
+            IS DISTINCT FROM ({', '.join(f'EXCLUDED.{col}' for col in value_columns)});
+    """))
+    conn.execute(text("DROP TABLE master_subscribers_incoming;"))
+    return result.rowcount
+
+
+def load_tables_incremental(engine, use_copy=False, frames=None):
+    """Reload only tables whose source file changed; master subscribers are upserted.
+
+    Returns the names of the tables that were (re)loaded.
+    """
+    print("Loading changed tables to database...")
+    reloaded = set()
+    for table_name in tables_to_load:
+        file_path = source_path(table_name)
+        if not os.path.exists(file_path):
+            print(f"ERROR: File not found: {file_path}")
+            continue
+
+        file_hash = file_sha256(file_path)
+        with engine.begin() as conn:
+            watermark = get_watermark(conn, table_name)
+            if watermark and watermark['file_hash'] == file_hash:
+                print(f"{table_name} unchanged since last load, skipped")
+                continue
+
+            # The consolidation's change log, if it starts from the master file loaded last time
+            changes = None
+            if table_name == 'master_subscribers':
+                changes = read_change_log(watermark['file_hash'] if watermark else None, file_hash)
+            changed = None if changes is None else apply_master_changes(conn, changes, use_copy=use_copy)
+
+            df = _table_frame(table_name, frames)
+            if changed is not None:
+                print(f"Applied master_subscribers change log: {changed} inserted, updated or deleted records")
+            elif table_name == 'master_subscribers':
+                changed = upsert_master_subscribers(conn, df, use_copy=use_copy)
+                print(f"Upserted master_subscribers: {changed} new or changed records")
+            else:
+                write_table(conn, df, table_name, if_exists='replace', use_copy=use_copy)
+                print(f"Loaded {table_name}: {len(df)} records")
+            set_watermark(conn, table_name, file_hash, rows_loaded=len(df))
+            record_versions(conn, 'postgresql', {table_name: frame_digest(df)})
+            reloaded.add(table_name)
+    return reloaded
+
+
+def refresh_usage_regions(engine, regions, use_copy=False):
+    """Re-resolve region_id of the usage records already loaded, after the master list or city lookup changed.
+
+    Only rows whose region changed are rewritten, and only their weeks of
+    subscriber_week_fact are recomputed.
+    """
+    with engine.begin() as conn:
+        write_table(conn, regions.master_regions(), 'usage_regions_incoming', if_exists='replace', use_copy=use_copy)
+        city_region = """COALESCE((SELECT cl."CITY_ID" FROM city_lookup cl WHERE cl."CITY_ID" = u.usage_event_city_id), 0)"""
+        weeks = set()
+        for update in (
+            # Subscribers with a master region
+            """UPDATE usage_records u SET region_id = i.region_id
+               FROM usage_regions_incoming i
+               WHERE u.msisdn = i.msisdn AND u.region_id IS DISTINCT FROM i.region_id
+               RETURNING u.week_start""",
+            # Everyone else falls back to the event city
+            f"""UPDATE usage_records u SET region_id = {city_region}
+               WHERE NOT EXISTS (SELECT 1 FROM usage_regions_incoming i WHERE i.msisdn = u.msisdn)
+                 AND u.region_id IS DISTINCT FROM {city_region}
+               RETURNING u.week_start""",
+        ):
+            rows = conn.execute(text(f"WITH updated AS ({update}) SELECT DISTINCT week_start FROM updated;")).fetchall()
+            weeks |= {row[0] for row in rows if row[0] is not None}
+        conn.execute(text("DROP TABLE usage_regions_incoming;"))
+        fact_rows = refresh_fact_weeks(conn, weeks)
+        rebuild_sketches(conn, 'postgresql', weeks)
+        if weeks:
+            _record_usage_versions(conn)
+    if weeks:
+        print(f"Regions changed in {len(weeks)} week(s) of usage records, subscriber_week_fact refreshed: {fact_rows} rows")
+
+
+def _later(event_time, other):
+    if other is None or (event_time is not None and pd.Timestamp(event_time) >= pd.Timestamp(other)):
+        return event_time
+    return other
+
+
+def _summarize_usage_source(name, chunksize):
+    """{week: (rows, digest)} and the latest event time of a usage source's staged rows"""
+    digests = {}
+    max_event_time = None
+    for chunk in iter_staged_chunks(name, chunksize):
+        add_week_digests(digests, chunk)
+        max_event_time = _later(max_event_time, _max_event_time(chunk))
+    return digests, max_event_time
+
+
+def load_usage_records_incremental(engine, regions, chunksize=DEFAULT_CHUNKSIZE, use_copy=False):
+    """Reload the weeks of usage records whose rows changed in a source file.
+
+    Unchanged files (same hash) are skipped. A changed or new file is summed
+    up per week (row count and row-hash digest, see load_watermarks) and
+    compared with what was loaded from it, so new rows in the watermark's
+    minute, late or corrected rows of older weeks, removed rows and undated
+    rows are all found. Those weeks are swapped in again from every source,
+    so a refresh costs the changed weeks' volume rather than the whole history.
+    """
+    print("Loading changed usage weeks...")
+    # Swapped weeks, watermarks and digests commit together
+    with engine.begin() as conn:
+        changed_sources = {}
+        weeks = set()
+        for name in USAGE_DATASETS:
+            file_path = source_path(name)
+            if not os.path.exists(file_path):
+                print(f"ERROR: Usage file not found: {file_path}")
+                continue
+
+            file_hash = file_sha256(file_path)
+            watermark = get_watermark(conn, name)
+            if watermark and watermark['file_hash'] == file_hash:
+                print(f"{name} unchanged since last load, skipped")
+                continue
+
+            # A source without digests (loaded before they were kept) has all its weeks reloaded
+            digests, max_event_time = _summarize_usage_source(name, chunksize)
+            loaded = get_week_digests(conn, name)
+            changed = {week for week in set(digests) | set(loaded) if digests.get(week) != loaded.get(week)}
+            changed_sources[name] = (file_hash, digests, max_event_time)
+            weeks |= changed
+            print(f"{name} changed in {len(changed)} week(s)")
+
+        if weeks:
+            chunks = (chunk for name in USAGE_DATASETS for chunk in iter_staged_chunks(name, chunksize))
+            rows_loaded = _swap_usage_weeks(conn, weeks, regions, chunks, use_copy=use_copy)
+            # Only the swapped weeks are re-aggregated
+            week_starts = [pd.Timestamp(week).date() for week in weeks if week != UNDATED]
+            fact_rows = refresh_fact_weeks(conn, week_starts)
+            rebuild_sketches(conn, 'postgresql', week_starts)
+            print(f"Reloaded {rows_loaded} usage records in {len(weeks)} week(s): {', '.join(sorted(weeks))}")
+            print(f"Refreshed subscriber_week_fact for {len(week_starts)} week(s): {fact_rows} rows")
+        for name, (file_hash, digests, max_event_time) in changed_sources.items():
+            set_watermark(conn, name, file_hash, max_event_time, sum(rows for rows, _ in digests.values()))
+            set_week_digests(conn, name, digests)
+        if weeks:
+            _record_usage_versions(conn)
+
+
+def usage_versions(usage_digests, versions):
+    """Versions of usage_records and the tables built from it.
+
+    usage_records: its rows (week digests summed over the sources, see
+    load_watermarks) and the tables that resolve their region_id; the fact
+    table and the sketches add the SQL / sketch version that builds them.
+    """
+    usage = content_digest(sorted(usage_digests.items()), [versions.get(table_name) for table_name in REGION_INPUTS])
+    fact = content_digest(usage, FACT_DDL, FACT_REBUILD)
+    return {'usage_records': usage, FACT_TABLE: fact, SKETCH_TABLE: content_digest(fact, SKETCH_MARKER)}
+
+
+def _record_usage_versions(conn):
+    """Version the usage tables from the recorded week digests of every source and the current table versions"""
+    conn.exec_driver_sql(VERSION_DDL)
+    versions = dict(conn.execute(text(f"SELECT table_name, version FROM {VERSION_TABLE};")).fetchall())
+    digests = merge_week_digests(get_week_digests(conn, name) for name in USAGE_DATASETS)
+    record_versions(conn, 'postgresql', usage_versions(digests, versions))
+
+
+def record_watermarks(engine, rows_loaded=None):
+    """After a full load, remember what was loaded so incremental runs start from here.
+
+    rows_loaded is {table_name: rows} as returned by load_tables; the usage
+    sources' counts come with their week digests.
+    """
+    rows_loaded = rows_loaded or {}
+    with engine.begin() as conn:
+        ensure_watermark_table(conn)
+        for name in tables_to_load + USAGE_DATASETS:
+            file_path = source_path(name)
+            if not os.path.exists(file_path):
+                continue
+            max_event_time = None
+            if name in USAGE_DATASETS:
+                digests, max_event_time = _summarize_usage_source(name, DEFAULT_CHUNKSIZE)
+                set_week_digests(conn, name, digests)
+                rows_loaded[name] = sum(rows for rows, _ in digests.values())
+            set_watermark(conn, name, file_sha256(file_path), max_event_time, rows_loaded.get(name, 0))
+        _record_usage_versions(conn)
+    print("Load watermarks recorded")
+
+
+def _swap_usage_weeks(conn, weeks, regions, chunks, use_copy=False):
+    """Replace the usage records of weeks (week keys, see load_watermarks.week_keys) with their rows in chunks.
+
+    Each dated week is loaded into a standalone table and swapped in as its
+    partition; undated rows are deleted and inserted again. Returns the rows loaded.
+    """
+    swap_tables = {week: prepare_swap_table(conn, week) for week in sorted(weeks) if week != UNDATED}
+    if UNDATED in weeks:
+        conn.execute(text("DELETE FROM usage_records WHERE usage_event_date_time IS NULL;"))
+    rows_loaded = 0
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        for week, rows in chunk.groupby(week_keys(chunk['usage_event_date_time']), sort=False):
+            if week in weeks:
+                write_table(conn, regions.assign(rows), swap_tables.get(week, 'usage_records'), use_copy=use_copy)
+                rows_loaded += len(rows)
+    for week, swap_table in swap_tables.items():
+        swap_week_partition(conn, week, swap_table)
+    return rows_loaded
+
+
+def _week_usage_chunks(week_start, chunksize, usage_source):
+    if usage_source == 'archive':
+        # The archive holds the week as one slice, nothing else is read
+        yield open_archive().usage_frame([week_start.date().isoformat()])
+        return
+    for name in USAGE_DATASETS:
+        yield from iter_staged_chunks(name, chunksize)
+
+
+def reload_usage_week(engine, week_start, regions, chunksize=DEFAULT_CHUNKSIZE, use_copy=False, usage_source='staging'):
+    """Reload one week of usage records from staging (or the archive) as a partition swap.
+
+    The week is loaded into a standalone table while the live partition keeps
+    serving queries; detach/attach and the fact refresh then commit together.
+    """
+    week_start = pd.Timestamp(week_start)
+    print(f"Reloading usage records for week {week_start.date()}...")
+    with engine.begin() as conn:
+        rows_loaded = _swap_usage_weeks(conn, {week_start.date().isoformat()}, regions,
+                                        _week_usage_chunks(week_start, chunksize, usage_source), use_copy=use_copy)
+        fact_rows = refresh_fact_weeks(conn, [week_start.date()])
+        rebuild_sketches(conn, 'postgresql', [week_start.date()])
+        # The swapped rows aren't compared with the week digests, so the usage tables get one-off versions
+        invalidate_versions(conn, 'postgresql', USAGE_TABLES)
+    print(f"Swapped in {rows_loaded} usage records for week {week_start.date()} "
+          f"(subscriber_week_fact: {fact_rows} rows)")
+
+
+def build_subscriber_week_fact(engine, versioned=True):
+    """Rebuild subscriber_week_fact and the distinct-subscriber sketches of every week.
+
+    versioned=False leaves the usage tables' versions to the caller (a full
+    load versions them with the watermarks, once the week digests are current).
+    """
+    with engine.begin() as conn:
+        with span('aggregate', FACT_TABLE) as step:
+            fact_rows = rebuild_fact(conn)
+            step.count(rows_out=fact_rows)
+        sketch_rows = rebuild_sketches(conn, 'postgresql')
+        if versioned:
+            _record_usage_versions(conn)
+    print(f"Built subscriber_week_fact: {fact_rows} rows")
+    print(f"Built {SKETCH_TABLE}: {sketch_rows} week/region sketches")
+
+
+def create_views(engine):
+    """(Re)create the reporting views in scripts/sql/views, which read subscriber_week_fact"""
+    views_dir = os.path.join(project_root, 'scripts', 'sql', 'views')
+    if not os.path.exists(views_dir):
+        return
+    with engine.begin() as conn:
+        for sql_file in sorted(os.listdir(views_dir)):
+            if sql_file.endswith('.sql'):
+                with open(os.path.join(views_dir, sql_file), 'r') as f:
+                    conn.exec_driver_sql(f.read())
+                print(f"Created view from {sql_file}")
+
+
+def create_indexes(engine):
+    # Create indexes for better performance (defined in scripts/sql/schema/indexes.sql)
+    with engine.begin() as conn:
         print("Creating indexes for better performance...")
-        conn.execute(text("CREATE INDEX IF NOT EXISTS idx_usage_msisdn ON usage_records (msisdn);"))
-        conn.execute(text("CREATE INDEX IF NOT EXISTS idx_usage_date ON usage_records (usage_event_date_time);"))
-        conn.execute(text("CREATE INDEX IF NOT EXISTS idx_usage_city ON usage_records (usage_event_city_id);"))
-        conn.execute(text("CREATE INDEX IF NOT EXISTS idx_subscribers_cell ON master_subscribers (cell_phone_number);"))
+        create_schema_indexes(conn)
         print("Indexes created successfully")
 
-    engine.dispose()
-    print(f"\nSUCCESS: Data successfully loaded!")
-    print(f"Database: {get_db_connection_string()}")
 
-except Exception as e:
-    print(f"ERROR: {e}")
-    import traceback
-    traceback.print_exc()
\ No newline at end of file
+def load_data_embedded(backend, streaming=False, chunksize=DEFAULT_CHUNKSIZE, frames=None, usage_source='staging',
+                       database=None):
+    """Full load into a fresh database file of an embedded backend (SQLite, DuckDB).
+
+    Same tables, fact table and views as on PostgreSQL, from the dialect
+    variants / translations of the schema and view SQL.
+    """
+    frames = frames or {}
+    path = database_path(backend, database)
+    for stale in (path, path + '.wal'):
+        if os.path.exists(stale):
+            os.remove(stale)
+
+    conn = connect(backend, database)
+    try:
+        execute_script(conn, backend, read_sql('schema', 'tables.sql', backend))
+
+        print("Loading tables to database...")
+        versions = {}
+        for table_name in tables_to_load:
+            if table_name in frames or os.path.exists(source_path(table_name)):
+                df = _table_frame(table_name, frames)
+                write_frame(conn, backend, df, table_name)
+                versions[table_name] = frame_digest(df)
+                print(f"Loaded {table_name}: {len(df)} records")
+            else:
+                print(f"ERROR: File not found: {source_path(table_name)}")
+
+        regions = prepare_regions(frames)
+        write_frame(conn, backend, regions.dim, REGION_TABLE)
+        versions[REGION_TABLE] = frame_digest(regions.dim)
+        print(f"Loaded {REGION_TABLE}: {len(regions.dim)} regions")
+
+        print("Preparing usage data...")
+        if streaming and 'usage_records' not in frames:
+            usage_chunks = (chunk for name in USAGE_DATASETS for chunk in iter_staged_chunks(name, chunksize))
+        else:
+            usage_data = frames.get('usage_records')
+            usage_chunks = [usage_data if usage_data is not None else prepare_usage_data(usage_source)]
+        usage_digests = {}
+        rows_loaded = 0
+        for chunk in usage_chunks:
+            add_week_digests(usage_digests, chunk)
+            rows_loaded += write_frame(conn, backend, regions.assign(chunk), 'usage_records')
+        print(f"Loaded usage_records: {rows_loaded} records")
+
+        print("Creating indexes for better performance...")
+        execute_script(conn, backend, read_sql('schema', 'indexes.sql', backend))
+
+        with span('aggregate', FACT_TABLE) as step:
+            for statement in (FACT_DDL, FACT_INDEX, FACT_REBUILD):
+                conn.execute(statement)
+            fact_rows = conn.execute(f"SELECT COUNT(*) FROM {FACT_TABLE}").fetchone()[0]
+            step.count(rows_out=fact_rows)
+        print(f"Built subscriber_week_fact: {fact_rows} rows")
+        sketch_rows = rebuild_sketches(conn, backend)
+        print(f"Built {SKETCH_TABLE}: {sketch_rows} week/region sketches")
+
+        views_dir = os.path.join(project_root, 'scripts', 'sql', 'views')
+        for sql_file in sorted(os.listdir(views_dir)) if os.path.exists(views_dir) else []:
+            if sql_file.endswith('.sql'):
+                execute_script(conn, backend, read_sql('views', sql_file, backend))
+                print(f"Created view from {sql_file}")
+        versions.update(usage_versions(usage_digests, versions))
+        record_versions(conn, backend, versions)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def load_data_to_db(streaming=False, chunksize=DEFAULT_CHUNKSIZE, incremental=False, use_copy=False, frames=None,
+                    reload_week=None, usage_source='staging', backend=None, database=None):
+    """Load all tables and usage records; returns True on success.
+
+    frames maps table names (and 'usage_records') to DataFrames an in-process
+    caller already holds, so they are not re-read from staging. reload_week
+    (a Monday) only swaps that week's usage partition. usage_source is where
+    a full load or a week reload reads usage records from (see USAGE_SOURCES).
+
+    backend is 'postgresql', 'sqlite' or 'duckdb' (default: DB_BACKEND in
+    scripts/config/database_config.py); database overrides an embedded
+    backend's database file. The embedded backends always do a full load.
+    """
+    frames = frames or {}
+    backend = resolve_backend(backend)
+    print("Loading data to database for advanced analysis...")
+    print(f"Using: {BACKENDS[backend]['label']}")
+    print(f"Project root: {project_root}")
+    print(f"Data directory: {data_dir}")
+
+    # Create database directory if it doesn't exist
+    os.makedirs(database_dir, exist_ok=True)
+
+    if is_embedded(backend):
+        if incremental or reload_week:
+            # No partitions or load watermarks there; a full load of one file is cheap
+            print(f"{BACKENDS[backend]['label']} has no incremental or week reloads, doing a full load instead")
+        try:
+            load_data_embedded(backend, streaming=streaming, chunksize=chunksize, frames=frames,
+                               usage_source=usage_source, database=database)
+        except Exception as e:
+            print(f"ERROR: {e}")
+            import traceback
+            traceback.print_exc()
+            return False
+        print(f"\nSUCCESS: Data successfully loaded!")
+        print(f"Database: {describe(backend, database)}")
+        return True
+
+    try:
+        # Create SQLAlchemy engine
+        engine = create_engine(get_connection_string())
+
+        # Test connection
+        with engine.connect() as conn:
+            result = conn.execute(text("SELECT version();"))
+            print("Connected to PostgreSQL:", result.fetchone()[0])
+
+        if incremental or reload_week:
+            with engine.begin() as conn:
+                current = schema_is_current(conn)
+            if not current:
+                print("Tables predate the typed schema, doing a full load instead")
+                incremental = False
+                reload_week = None
+
+        if reload_week:
+            regions = load_region_dimension(engine, use_copy=use_copy, frames=frames, keep_ids=True)
+            reload_usage_week(engine, reload_week, regions, chunksize=chunksize, use_copy=use_copy, usage_source=usage_source)
+        elif incremental:
+            with engine.begin() as conn:
+                ensure_watermark_table(conn)
+            reloaded = load_tables_incremental(engine, use_copy=use_copy, frames=frames)
+            regions = load_region_dimension(engine, use_copy=use_copy, frames=frames, keep_ids=True)
+            # A database loaded before the fact table (or the current sketches) existed gets it built once in full
+            has_fact = inspect(engine).has_table('subscriber_week_fact')
+            if has_fact and reloaded & {'master_subscribers', 'city_lookup'}:
+                refresh_usage_regions(engine, regions, use_copy=use_copy)
+            load_usage_records_incremental(engine, regions, chunksize=chunksize, use_copy=use_copy)
+            create_indexes(engine)
+            if not has_fact:
+                build_subscriber_week_fact(engine)
+            else:
+                # Refreshing changed weeks already rebuilt older sketches in full
+                with engine.begin() as conn:
+                    if not sketches_are_current(conn):
+                        sketch_rows = rebuild_sketches(conn, 'postgresql')
+                        _record_usage_versions(conn)
+                        print(f"Built {SKETCH_TABLE}: {sketch_rows} week/region sketches")
+            create_views(engine)
+        else:
+            with engine.begin() as conn:
+                # One-off versions up front, so results cached before a load that fails halfway are never reused
+                invalidate_versions(conn, 'postgresql', VERSIONED_TABLES)
+                apply_schema(conn)
+            rows_loaded = load_tables(engine, use_copy=use_copy, frames=frames)
+            regions = load_region_dimension(engine, use_copy=use_copy, frames=frames)
+            load_usage_records(engine, regions, streaming=streaming, chunksize=chunksize, use_copy=use_copy,
+                               usage_data=frames.get('usage_records'), usage_source=usage_source)
+            create_indexes(engine)
+            build_subscriber_week_fact(engine, versioned=False)
+            create_views(engine)
+            record_watermarks(engine, rows_loaded)
+
+        engine.dispose()
+        print(f"\nSUCCESS: Data successfully loaded!")
+        print(f"Database: {describe(backend)}")
+        return True
+
+    except Exception as e:
+        print(f"ERROR: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load the processed data into the analysis database")
+    parser.add_argument('--streaming', action='store_true',
+                        help="load usage records in chunks with bounded memory")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE,
+                        help="rows per chunk in streaming mode")
+    parser.add_argument('--incremental', action='store_true',
+                        help="only load sources that changed since the last run (reload changed usage weeks, upsert master)")
+    parser.add_argument('--copy', action='store_true',
+                        help="bulk load with COPY FROM STDIN and explicit column types instead of to_sql")
+    parser.add_argument('--reload-week', metavar='YYYY-MM-DD',
+                        help="reload only the usage records of the week starting on this Monday (partition swap)")
+    parser.add_argument('--usage-source', choices=USAGE_SOURCES, default='staging',
+                        help="full load / week reload: read usage records from staging, the event store or the usage archive")
+    parser.add_argument('--backend', choices=list(BACKENDS),
+                        help="analysis database (default: DB_BACKEND in scripts/config/database_config.py)")
+    args = parser.parse_args()
+
+    load_data_to_db(streaming=args.streaming, chunksize=args.chunksize, incremental=args.incremental, use_copy=args.copy,
+                    reload_week=args.reload_week, usage_source=args.usage_source, backend=args.backend)
@@ -0,0 +1,128 @@
+# scripts/python/load_watermarks.py
+
+import hashlib
+
+import numpy as np
+import pandas as pd # type: ignore
+from sqlalchemy import text # type: ignore
+
+from query_cache import row_hashes
+
+# One row per loaded source file: what was loaded last time and up to when
+WATERMARK_TABLE = 'load_watermarks'
+
+# One row per usage source and week: how many rows were loaded from it and a
+# hash of their content, so an incremental load finds the weeks that changed
+WEEK_DIGEST_TABLE = 'load_week_digests'
+
+# Week key of rows without an event time (they live in the default partition)
+UNDATED = 'undated'
+
+
+def file_sha256(file_path, block_size=1024 * 1024):
+    """Content hash of a source file, read in blocks"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def ensure_watermark_table(conn):
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {WATERMARK_TABLE} (
+            source_name TEXT PRIMARY KEY,
+            file_hash TEXT NOT NULL,
+            max_event_time TIMESTAMP,
+            rows_loaded BIGINT NOT NULL DEFAULT 0,
+            loaded_at TIMESTAMP NOT NULL DEFAULT now()
+        );
+    """))
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {WEEK_DIGEST_TABLE} (
+            source_name TEXT NOT NULL,
+            week TEXT NOT NULL,
+            rows_loaded BIGINT NOT NULL,
+            digest TEXT NOT NULL,
+            PRIMARY KEY (source_name, week)
+        );
+    """))
+
+
+def get_watermark(conn, source_name):
+    """Last recorded watermark for a source as a dict, or None if never loaded"""
+    row = conn.execute(
+        text(f"SELECT file_hash, max_event_time, rows_loaded FROM {WATERMARK_TABLE} WHERE source_name = :source_name"),
+        {'source_name': source_name}
+    ).fetchone()
+    if row is None:
+        return None
+    return {'file_hash': row[0], 'max_event_time': row[1], 'rows_loaded': row[2]}
+
+
+def set_watermark(conn, source_name, file_hash, max_event_time=None, rows_loaded=0):
+    conn.execute(text(f"""
+        INSERT INTO {WATERMARK_TABLE} (source_name, file_hash, max_event_time, rows_loaded, loaded_at)
+        VALUES (:source_name, :file_hash, :max_event_time, :rows_loaded, now())
+        ON CONFLICT (source_name) DO UPDATE SET
+            file_hash = EXCLUDED.file_hash,
+            max_event_time = EXCLUDED.max_event_time,
+            rows_loaded = EXCLUDED.rows_loaded,
+            loaded_at = EXCLUDED.loaded_at;
+    """), {
+        'source_name': source_name,
+        'file_hash': file_hash,
+        'max_event_time': max_event_time.to_pydatetime() if hasattr(max_event_time, 'to_pydatetime') else max_event_time,
+        'rows_loaded': int(rows_loaded),
+    })
+
+
+def week_keys(event_times):
+    """Week key per row: its Monday as YYYY-MM-DD (same weeks as the partitions), or UNDATED"""
+    event_times = pd.to_datetime(event_times)
+    week_starts = event_times.dt.normalize() - pd.to_timedelta(event_times.dt.weekday, unit='D')
+    return week_starts.dt.strftime('%Y-%m-%d').fillna(UNDATED)
+
+
+def add_week_digests(digests, chunk):
+    """Add a chunk of usage rows to {week: (rows, digest)}.
+
+    The digest sums 64-bit row hashes, so it doesn't depend on row order or
+    chunking but changes with any added, removed or edited row.
+    """
+    hashes = row_hashes(chunk)
+    keys = week_keys(chunk['usage_event_date_time']).to_numpy()
+    for week in np.unique(keys):
+        week_hashes = hashes[keys == week]
+        rows, digest = digests.get(week, (0, 0))
+        digests[week] = (rows + len(week_hashes), (digest + int(week_hashes.sum(dtype=np.uint64))) % 2**64)
+    return digests
+
+
+def merge_week_digests(digest_dicts):
+    """Week digests of several sources as one {week: (rows, digest)}, as if their rows were one table"""
+    merged = {}
+    for digests in digest_dicts:
+        for week, (rows, digest) in digests.items():
+            merged_rows, merged_digest = merged.get(week, (0, 0))
+            merged[week] = (merged_rows + rows, (merged_digest + digest) % 2**64)
+    return merged
+
+
+def get_week_digests(conn, source_name):
+    """{week: (rows, digest)} recorded for a usage source, empty if none"""
+    rows = conn.execute(
+        text(f"SELECT week, rows_loaded, digest FROM {WEEK_DIGEST_TABLE} WHERE source_name = :source_name"),
+        {'source_name': source_name}
+    ).fetchall()
+    return {week: (int(rows_loaded), int(digest, 16)) for week, rows_loaded, digest in rows}
+
+
+def set_week_digests(conn, source_name, digests):
+    conn.execute(text(f"DELETE FROM {WEEK_DIGEST_TABLE} WHERE source_name = :source_name"), {'source_name': source_name})
+    if digests:
+        conn.execute(text(f"""
+            INSERT INTO {WEEK_DIGEST_TABLE} (source_name, week, rows_loaded, digest)
+            VALUES (:source_name, :week, :rows_loaded, :digest);
+        """), [{'source_name': source_name, 'week': week, 'rows_loaded': rows, 'digest': f"{digest:016x}"}
+               for week, (rows, digest) in digests.items()])
@@ -0,0 +1,74 @@
+# scripts/python/normalization.py
+
+import numpy as np
+import pandas as pd # type: ignore
+
+# South African numbers: country code + 9 digit national number
+COUNTRY_CODE = '27'
+NATIONAL_NUMBER_LENGTH = 9
+
+
+def _factorize(series):
+    """Split a column into integer codes and its unique values (NaN -> code -1)"""
+    codes, uniques = pd.factorize(series)
+    return codes, pd.Series(uniques, dtype='object')
+
+
+def _canonicalize_msisdn_values(values):
+    """Canonicalize a (small) Series of raw MSISDN values to 27XXXXXXXXX strings"""
+    # Drop the '.0' of numbers read back as floats (27745858892.0), then
+    # remove +, spaces, and any non-digit characters
+    digits = values.astype(str).str.replace(r'\.0+$', '', regex=True).str.replace(r'\D', '', regex=True)
+    lengths = digits.str.len()
+
+    # 0XXXXXXXXX (local format) -> 27XXXXXXXXX
+    local = digits.str.startswith('0') & (lengths == NATIONAL_NUMBER_LENGTH + 1)
+    digits = digits.where(~local, COUNTRY_CODE + digits.str[1:])
+
+    # XXXXXXXXX (local format that lost its leading zero, e.g. read back as an int)
+    national = lengths == NATIONAL_NUMBER_LENGTH
+    digits = digits.where(~national, COUNTRY_CODE + digits)
+
+    return digits
+
+
+def normalize_msisdn_with_rejects(msisdn_series):
+    """normalize_msisdn plus the number of rows whose value is not a 27 + 9 digit number afterwards.
+
+    Missing values are not counted; the check runs over the distinct values only.
+    """
+    codes, uniques = _factorize(msisdn_series)
+    canonical = _canonicalize_msisdn_values(uniques)
+    invalid = ~canonical.str.fullmatch(COUNTRY_CODE + r'\d{%d}' % NATIONAL_NUMBER_LENGTH).to_numpy(dtype=bool)
+    # Code -1 (missing) picks up the trailing NaN
+    values = np.append(canonical.to_numpy(dtype='object'), np.nan)[codes]
+    rejected = int(np.append(invalid, False)[codes].sum())
+    return pd.Series(values, index=msisdn_series.index, name=msisdn_series.name, dtype='object'), rejected
+
+
+def normalize_msisdn(msisdn_series):
+    """Canonicalize a whole MSISDN column ('+27...', '0...', spaces) to '27...' strings.
+
+    The string work only runs over the distinct values; every row is then
+    filled in with a single take. NaN stays NaN.
+    """
+    return normalize_msisdn_with_rejects(msisdn_series)[0]
+
+
+def normalize_revenue(revenue_series):
+    """Parse a whole revenue column ('10,28', '36.21', blanks) to float64, bad values -> 0.0"""
+    if pd.api.types.is_numeric_dtype(revenue_series):
+        return revenue_series.astype('float64').fillna(0.0)
+
+    codes, uniques = _factorize(revenue_series)
+    # Convert to string, replace comma with point, then convert to float
+    revenue_str = uniques.astype(str).str.replace(',', '.', regex=False).str.strip()
+    parsed = pd.to_numeric(revenue_str, errors='coerce').fillna(0.0).to_numpy(dtype='float64')
+    values = np.append(parsed, 0.0)[codes]
+    return pd.Series(values, index=revenue_series.index, name=revenue_series.name)
+
+
+def normalize_msisdn_key(msisdn_series):
+    """Canonical MSISDN as a nullable int64 key (27XXXXXXXXX), for typed storage and joins"""
+    canonical = normalize_msisdn(msisdn_series)
+    return pd.to_numeric(canonical.replace('', np.nan), errors='coerce').astype('Int64')
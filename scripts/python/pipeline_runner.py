@@ -0,0 +1,108 @@
+# scripts/python/pipeline_runner.py
+
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from instrumentation import stage_span
+
+
+class Stage:
+    """One node of the pipeline DAG.
+
+    func receives the results of its dependencies as keyword arguments (named
+    after the dependency) and returns the value handed to its dependents.
+    """
+
+    def __init__(self, name, func, depends_on=()):
+        self.name = name
+        self.func = func
+        self.depends_on = list(depends_on)
+
+
+def _check_graph(stages):
+    names = {stage.name for stage in stages}
+    for stage in stages:
+        missing = [dep for dep in stage.depends_on if dep not in names]
+        if missing:
+            raise ValueError(f"Stage {stage.name} depends on unknown stage(s): {missing}")
+
+    # Kahn's algorithm, only to reject cycles before anything runs
+    remaining = {stage.name: set(stage.depends_on) for stage in stages}
+    while remaining:
+        ready = [name for name, deps in remaining.items() if not deps]
+        if not ready:
+            raise ValueError(f"Pipeline has a dependency cycle between: {sorted(remaining)}")
+        for name in ready:
+            del remaining[name]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+
+
+def _run_stage(stage, inputs):
+    start = time.perf_counter()
+    with stage_span(stage.name):
+        result = stage.func(**inputs)
+    return result, time.perf_counter() - start
+
+
+def run_stages(stages, max_workers=4):
+    """Run stages in dependency order, independent stages concurrently.
+
+    A stage fails if it raises or returns False; its dependents are skipped.
+    Returns {name: {'status', 'seconds', 'result'}} in the order stages were given.
+    """
+    _check_graph(stages)
+    by_name = {stage.name: stage for stage in stages}
+    report = {stage.name: {'status': 'pending', 'seconds': 0.0, 'result': None} for stage in stages}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        running = {}
+        while True:
+            # Submit every stage whose dependencies have all completed; skip those with a failed one
+            for stage in stages:
+                entry = report[stage.name]
+                if entry['status'] != 'pending':
+                    continue
+                dep_status = [report[dep]['status'] for dep in stage.depends_on]
+                if any(status in ('failed', 'skipped') for status in dep_status):
+                    entry['status'] = 'skipped'
+                    print(f"- {stage.name} skipped (an upstream stage failed)")
+                elif all(status == 'done' for status in dep_status):
+                    inputs = {dep: report[dep]['result'] for dep in stage.depends_on}
+                    entry['status'] = 'running'
+                    print(f"> {stage.name} started")
+                    running[executor.submit(_run_stage, stage, inputs)] = stage.name
+
+            if not running:
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                entry = report[name]
+                try:
+                    result, seconds = future.result()
+                except Exception:
+                    entry['status'] = 'failed'
+                    print(f"✗ {name} failed with error:")
+                    traceback.print_exc()
+                    continue
+                entry['seconds'] = seconds
+                if result is False:
+                    entry['status'] = 'failed'
+                    print(f"✗ {name} failed after {seconds:.2f}s")
+                else:
+                    entry['status'] = 'done'
+                    entry['result'] = result
+                    print(f"✓ {name} completed in {seconds:.2f}s")
+
+    return {name: report[name] for name in by_name}
+
+
+def print_stage_timings(report, total_seconds=None):
+    print(f"\n{'Stage':<32} {'Status':<8} {'Seconds':>9}")
+    for name, entry in report.items():
+        print(f"{name:<32} {entry['status']:<8} {entry['seconds']:>9.2f}")
+    if total_seconds is not None:
+        print(f"{'Total (wall clock)':<32} {'':<8} {total_seconds:>9.2f}")
@@ -0,0 +1,234 @@
+# scripts/python/query_cache.py
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+from datetime import datetime
+
+import pandas as pd # type: ignore
+
+from instrumentation import span
+
+# Setup paths
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(script_dir))
+data_dir = os.path.join(project_root, 'data')
+cache_dir = os.path.join(data_dir, 'query_cache')
+
+# The loader stamps every table it loads with a version derived from its
+# content (see content_digest), so reloading unchanged data - a full load on
+# every pipeline run, an embedded database file recreated from scratch -
+# keeps the versions and the cached results stay valid. Tables whose content
+# isn't known yet (a load in progress) get a one-off version instead.
+VERSION_TABLE = 'table_versions'
+
+VERSION_DDL = f"""
+    CREATE TABLE IF NOT EXISTS {VERSION_TABLE} (
+        table_name TEXT PRIMARY KEY,
+        version TEXT NOT NULL,
+        recorded_at TIMESTAMP NOT NULL
+    );
+"""
+
+INDEX_FILE = 'cache_index.json'
+
+
+def content_digest(*parts):
+    """Version of content described by parts (strings, numbers, or lists / dicts of them)"""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:32]
+
+
+def _canonical(values):
+    # The same values hash the same whatever their dtype: staged, in-memory and compact frames differ
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.astype(object)
+    if pd.api.types.is_datetime64_any_dtype(values.dtype):
+        return values.astype('datetime64[ns]')
+    if pd.api.types.is_bool_dtype(values.dtype) or pd.api.types.is_numeric_dtype(values.dtype):
+        return values.astype('float64')
+    return values
+
+
+def row_hashes(df):
+    """64-bit hash of each row's values (columns in name order, dtypes normalized)"""
+    columns = sorted(df.columns, key=str)
+    canonical = pd.DataFrame({str(col): _canonical(df[col]) for col in columns}, index=df.index)
+    return pd.util.hash_pandas_object(canonical, index=False).to_numpy()
+
+
+def frame_digest(df):
+    """Version of a DataFrame's content: its columns and the sum of its row hashes (row order doesn't matter)"""
+    row_sum = int(row_hashes(df).sum(dtype='uint64')) if len(df) else 0
+    return content_digest(sorted(str(col) for col in df.columns), len(df), row_sum)
+
+
+def unique_version():
+    """Version that matches no content: for tables being changed whose content isn't known yet"""
+    return f"load-{time.time_ns()}"
+
+
+def record_versions(conn, backend, versions):
+    """Stamp tables with {table_name: version}; conn is SQLAlchemy on PostgreSQL, DBAPI otherwise"""
+    if not versions:
+        return
+    recorded_at = datetime.now().isoformat(sep=' ', timespec='seconds')
+    rows = [(table_name, version, recorded_at) for table_name, version in sorted(versions.items())]
+    names = ', '.join(f"'{table_name}'" for table_name in sorted(versions))
+    if backend == 'postgresql':
+        conn.exec_driver_sql(VERSION_DDL)
+        conn.exec_driver_sql(f"DELETE FROM {VERSION_TABLE} WHERE table_name IN ({names})")
+        conn.exec_driver_sql(f"INSERT INTO {VERSION_TABLE} (table_name, version, recorded_at) VALUES (%s, %s, %s)", rows)
+    else:
+        conn.execute(VERSION_DDL)
+        conn.execute(f"DELETE FROM {VERSION_TABLE} WHERE table_name IN ({names})")
+        conn.executemany(f"INSERT INTO {VERSION_TABLE} (table_name, version, recorded_at) VALUES (?, ?, ?)", rows)
+
+
+def invalidate_versions(conn, backend, tables):
+    """Give tables one-off versions, so no cached result of theirs is served until they are versioned again"""
+    version = unique_version()
+    record_versions(conn, backend, {table_name: version for table_name in tables})
+
+
+def read_data_versions(conn):
+    """{table_name: version} from a DBAPI connection, or None if the loader recorded none"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"SELECT table_name, version FROM {VERSION_TABLE}")
+        return {table_name: version for table_name, version in cursor.fetchall()}
+    except Exception:
+        # Database loaded before data versions were recorded
+        if hasattr(conn, 'rollback'):
+            conn.rollback()
+        return None
+    finally:
+        cursor.close()
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class QueryCache:
+    """Exported analysis results, reused while neither the SQL nor the data it reads changed.
+
+    An entry's key is the hash of the SQL as executed, the database it ran on
+    and the version of every versioned table the SQL names. Per query and
+    database only the latest entry is kept; older ones are stale and evicted.
+    """
+
+    def __init__(self, directory=cache_dir):
+        self.directory = directory
+        self.index_path = os.path.join(directory, INDEX_FILE)
+        self.index = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r') as f:
+                self.index = json.load(f)
+
+    @staticmethod
+    def entry_name(query_name, database):
+        return f"{database}::{query_name}"
+
+    @staticmethod
+    def key(sql, database, versions):
+        """Cache key of a query, or None if a table it reads has no version (not cacheable)"""
+        tables = tables_read(sql)
+        if versions is None or not tables or tables - set(versions):
+            return None
+        digest = hashlib.sha256()
+        digest.update(sql.encode('utf-8'))
+        digest.update(database.encode('utf-8'))
+        digest.update(json.dumps(sorted((name, versions[name]) for name in tables)).encode('utf-8'))
+        return digest.hexdigest()
+
+    def lookup(self, query_name, database, key):
+        """Path of the cached result for this key, or None on a miss"""
+        entry = self.index.get(self.entry_name(query_name, database))
+        if key is None or entry is None or entry['key'] != key:
+            return None
+        path = os.path.join(self.directory, entry['file'])
+        return path if os.path.exists(path) else None
+
+    def serve(self, query_name, database, key, output_path):
+        """Copy a cached result to output_path; returns its row count, or None on a miss"""
+        cached = self.lookup(query_name, database, key)
+        if cached is None:
+            return None
+        entry = self.index[self.entry_name(query_name, database)]
+        with span('load', f"cached {query_name}") as step:
+            if not os.path.exists(output_path) or _file_sha256(output_path) != entry['sha256']:
+                shutil.copyfile(cached, output_path + '.tmp')
+                os.replace(output_path + '.tmp', output_path)
+            step.count(rows_out=entry['rows'])
+        return entry['rows']
+
+    def store(self, query_name, database, key, output_path, rows, seconds):
+        """Keep a copy of a fresh result; the entry it replaces (a stale key) is evicted"""
+        if key is None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        name = self.entry_name(query_name, database)
+        stale = self.index.get(name)
+        file_name = f"{os.path.splitext(query_name)[0]}_{key[:16]}.csv"
+        shutil.copyfile(output_path, os.path.join(self.directory, file_name + '.tmp'))
+        os.replace(os.path.join(self.directory, file_name + '.tmp'), os.path.join(self.directory, file_name))
+        self.index[name] = {
+            'key': key, 'file': file_name, 'rows': rows, 'seconds': seconds,
+            'sha256': _file_sha256(output_path), 'stored_at': datetime.now().isoformat(timespec='seconds'),
+        }
+        if stale is not None and stale['file'] != file_name:
+            self._remove(stale['file'])
+
+    def evict(self, keep=None):
+        """Drop entries (all, or all but the names in keep) and cached files no entry points at; returns the files removed"""
+        for name in [name for name in self.index if keep is None or name not in keep]:
+            del self.index[name]
+        referenced = {entry['file'] for entry in self.index.values()}
+        removed = 0
+        if os.path.exists(self.directory):
+            for file_name in os.listdir(self.directory):
+                if file_name != INDEX_FILE and file_name not in referenced:
+                    self._remove(file_name)
+                    removed += 1
+        return removed
+
+    def save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.index_path + '.tmp', 'w') as f:
+            json.dump(self.index, f, indent=1, sort_keys=True)
+        os.replace(self.index_path + '.tmp', self.index_path)
+
+    def _remove(self, file_name):
+        path = os.path.join(self.directory, file_name)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def tables_read(sql):
+    """Tables a query reads: the names after FROM / JOIN that aren't its own CTEs"""
+    sql = re.sub(r'--[^\n]*', '', sql)
+    names = {name.lower() for name in re.findall(r'\b(?:FROM|JOIN)\s+"?(\w+)', sql, re.IGNORECASE)}
+    ctes = {name.lower() for name in re.findall(r'\b(\w+)\s+AS\s*\(', sql, re.IGNORECASE)}
+    return names - ctes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show or clear the SQL analysis result cache")
+    parser.add_argument('--clear', action='store_true', help="remove every cached result")
+    args = parser.parse_args()
+
+    cache = QueryCache()
+    if args.clear:
+        cache.evict()
+        cache.save()
+        print(f"Cleared {cache_dir}")
+    for name, entry in sorted(cache.index.items()):
+        print(f"{name}: {entry['rows']} rows, stored {entry['stored_at']} ({entry['seconds']:.2f}s to compute)")
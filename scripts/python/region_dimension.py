@@ -0,0 +1,105 @@
+# scripts/python/region_dimension.py
+
+import numpy as np
+import pandas as pd # type: ignore
+
+# Region of a usage row: its subscriber's master region, else the city the
+# event happened in, else Unknown. Names are normalized against the city
+# lookup (case, spacing and alternative names such as Egoli or Tshwane), so
+# every region is one row of region_dim with one province and the regional
+# rollups group on its integer region_id.
+REGION_TABLE = 'region_dim'
+REGION_COLUMNS = ['region_id', 'region_name', 'province_name']
+
+# A city's region_id is its CITY_ID, so IDs stay put between loads; master
+# regions that match no city get IDs above the largest CITY_ID
+UNKNOWN_REGION_ID = 0
+UNKNOWN_REGION = 'Unknown'
+
+
+def region_key(values):
+    """Matching key of region / city names: trimmed, single-spaced, case-folded"""
+    values = pd.Series(values, dtype='object')
+    return values.str.strip().str.replace(r'\s+', ' ', regex=True).str.casefold()
+
+
+def build_region_dim(city_lookup, master_subscribers, existing=None):
+    """region_id, region_name, province_name for Unknown, every city and every unmatched master region.
+
+    existing is the region_dim already in the database: its unmatched regions
+    keep their IDs and new ones are numbered after them.
+    """
+    cities = pd.DataFrame({
+        'region_id': city_lookup['CITY_ID'].astype('int64'),
+        'region_name': city_lookup['CITY_NAME'].str.strip(),
+        'province_name': city_lookup['PROVINCE_NAME'].str.strip(),
+    })
+    known = set(region_key(city_lookup['CITY_NAME'])) | set(region_key(city_lookup['ALTERNATIVE_CITY_NAME']).dropna())
+
+    others = pd.DataFrame(columns=REGION_COLUMNS)
+    if existing is not None and len(existing):
+        others = existing[(existing['region_id'] != UNKNOWN_REGION_ID) & ~existing['region_id'].isin(cities['region_id'])]
+        others = others[~region_key(others['region_name']).isin(known).to_numpy()][REGION_COLUMNS]
+    known |= set(region_key(others['region_name']))
+
+    # First spelling of each new name, in name order so the IDs are repeatable
+    regions = master_subscribers['region'].dropna().str.strip()
+    regions = regions[regions != '']
+    new = regions[~region_key(regions).isin(known).to_numpy()]
+    new = new.groupby(region_key(new).to_numpy()).first().sort_index()
+    next_id = int(max(cities['region_id'].max(), others['region_id'].max() if len(others) else 0)) + 1
+    new = pd.DataFrame({
+        'region_id': np.arange(next_id, next_id + len(new), dtype='int64'),
+        'region_name': new.to_numpy(dtype='object'),
+        'province_name': None,
+    })
+
+    unknown = pd.DataFrame({'region_id': [UNKNOWN_REGION_ID], 'region_name': [UNKNOWN_REGION], 'province_name': [None]})
+    dim = pd.concat([unknown, cities, others, new], ignore_index=True)
+    dim['region_id'] = dim['region_id'].astype('int16')
+    return dim
+
+
+class RegionResolver:
+    """Resolves usage rows to region_ids of a region dimension, with array lookups instead of joins"""
+
+    def __init__(self, city_lookup, master_subscribers, existing=None):
+        self.dim = build_region_dim(city_lookup, master_subscribers, existing)
+
+        ids_by_key = dict(zip(region_key(self.dim['region_name']), self.dim['region_id']))
+        alternatives = city_lookup.dropna(subset=['ALTERNATIVE_CITY_NAME'])
+        ids_by_key.update(zip(region_key(alternatives['ALTERNATIVE_CITY_NAME']), alternatives['CITY_ID'].astype('int16')))
+
+        # Master region_id by MSISDN, sorted for searchsorted; -1 = no usable region
+        master = master_subscribers.dropna(subset=['cell_phone_number']).drop_duplicates('cell_phone_number')
+        master = master.sort_values('cell_phone_number')
+        self._msisdns = master['cell_phone_number'].to_numpy(dtype='int64')
+        self._master_region = region_key(master['region']).map(ids_by_key).fillna(-1).to_numpy(dtype='int16')
+
+        # region_id by event city id (cities are their own regions)
+        city_ids = city_lookup['CITY_ID'].to_numpy(dtype='int64')
+        self._city_region = np.full(int(city_ids.max()) + 1 if len(city_ids) else 1, UNKNOWN_REGION_ID, dtype='int16')
+        self._city_region[city_ids[city_ids >= 0]] = city_ids[city_ids >= 0]
+
+    def resolve(self, msisdn, city_id):
+        """region_id (int16 array) per usage row from its MSISDN and event city id"""
+        cities = pd.Series(city_id).to_numpy(dtype='int64', na_value=-1)
+        in_lookup = (cities >= 0) & (cities < len(self._city_region))
+        regions = np.full(len(cities), UNKNOWN_REGION_ID, dtype='int16')
+        regions[in_lookup] = self._city_region[cities[in_lookup]]
+
+        if len(self._msisdns):
+            keys = pd.Series(msisdn).to_numpy(dtype='int64', na_value=-1)
+            position = np.minimum(np.searchsorted(self._msisdns, keys), len(self._msisdns) - 1)
+            master_region = np.where(self._msisdns[position] == keys, self._master_region[position], -1)
+            regions = np.where(master_region >= 0, master_region, regions).astype('int16')
+        return regions
+
+    def master_regions(self):
+        """msisdn, region_id of the master subscribers whose region resolved (the rest fall back to the event city)"""
+        found = self._master_region >= 0
+        return pd.DataFrame({'msisdn': self._msisdns[found], 'region_id': self._master_region[found]})
+
+    def assign(self, usage):
+        """usage with its region_id column (added, or replaced)"""
+        return usage.assign(region_id=self.resolve(usage['msisdn'], usage['usage_event_city_id']))
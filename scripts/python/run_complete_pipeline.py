@@ -1,43 +1,111 @@
 # scripts/python/run_complete_pipeline.py
 
-import subprocess
-import os
-import sys
+import argparse
+import time
 
-def run_pipeline():
-    """Run the complete data pipeline from start to finish"""
-    print("Starting V Mobile Data Pipeline...")
-    
-    scripts_dir = os.path.join(os.path.dirname(__file__))
-    
-    # Define the execution order for PostgreSQL
-    scripts = [
-        'subscriber_consolidation.py',
-        'weekly_qualification_report.py', 
-        'load_data_to_db.py',
-        'execute_sql_analysis.py'
+from db_backends import BACKENDS, resolve_backend
+from execute_sql_analysis import run_sql_analysis
+from instrumentation import end_run, print_steps, start_run, summarize_steps, spans, write_run_report
+from load_data_to_db import load_data_to_db
+from pipeline_runner import Stage, print_stage_timings, run_stages
+from staging import stage_all
+from subscriber_consolidation import consolidate_subscribers
+from subscriber_master_store import update_master_store
+from usage_archive import USAGE_SOURCES
+from weekly_qualification_report import generate_weekly_report, load_usage_data
+
+
+def build_stages(incremental=False, use_copy=False, usage_source='staging', backend=None):
+    """The pipeline as a DAG; DataFrames are handed from stage to stage in memory.
+
+    staging -> subscriber_consolidation --+--> weekly_qualification_report
+            -> usage_data ----------------+--> load_data_to_db -> execute_sql_analysis
+    """
+    def consolidation(staging):
+        if incremental:
+            # Only changed operator records; the change log feeds the master upsert
+            all_subscribers, master_subscribers, _ = update_master_store()
+        else:
+            all_subscribers, master_subscribers = consolidate_subscribers()
+        return {'all_subscribers': all_subscribers, 'master_subscribers': master_subscribers}
+
+    def usage_data(staging):
+        return load_usage_data(usage_source)
+
+    def weekly_report(subscriber_consolidation, usage_data):
+        return generate_weekly_report(
+            master_subscribers=subscriber_consolidation['master_subscribers'],
+            usage_data=usage_data
+        )
+
+    def load(subscriber_consolidation, usage_data):
+        frames = dict(subscriber_consolidation, usage_records=usage_data)
+        return load_data_to_db(incremental=incremental, use_copy=use_copy, frames=frames, backend=backend)
+
+    def sql_analysis(load_data_to_db):
+        return run_sql_analysis(backend=backend)
+
+    return [
+        Stage('staging', lambda: stage_all()),
+        Stage('subscriber_consolidation', consolidation, depends_on=['staging']),
+        Stage('usage_data', usage_data, depends_on=['staging']),
+        Stage('weekly_qualification_report', weekly_report, depends_on=['subscriber_consolidation', 'usage_data']),
+        Stage('load_data_to_db', load, depends_on=['subscriber_consolidation', 'usage_data']),
+        Stage('execute_sql_analysis', sql_analysis, depends_on=['load_data_to_db']),
     ]
-    
-    for script in scripts:
-        script_path = os.path.join(scripts_dir, script)
-        print(f"\n{'='*50}")
-        print(f"Running: {script}")
-        print(f"{'='*50}")
-        
-        try:
-            result = subprocess.run([sys.executable, script_path], check=True, capture_output=True, text=True)
-            print(f"✓ {script} completed successfully")
-            print(result.stdout)
-        except subprocess.CalledProcessError as e:
-            print(f"✗ {script} failed with error:")
-            print(e.stderr)
-            return False
-    
+
+
+def run_pipeline(max_workers=4, incremental=False, use_copy=False, usage_source='staging', backend=None,
+                 profile=(), trace_memory=()):
+    """Run the complete data pipeline from start to finish.
+
+    Every run writes a run report (per-step time, rows in/out, rejects and
+    peak memory, see instrumentation) to data/run_reports. profile /
+    trace_memory name stages (or 'all') to run under cProfile / tracemalloc.
+    """
+    print("Starting V Mobile Data Pipeline...")
+
+    start_run('pipeline', profile=profile, trace_memory=trace_memory)
+    try:
+        start = time.perf_counter()
+        report = run_stages(build_stages(incremental=incremental, use_copy=use_copy, usage_source=usage_source, backend=backend), max_workers=max_workers)
+        print_stage_timings(report, total_seconds=time.perf_counter() - start)
+
+        completed = all(entry['status'] == 'done' for entry in report.values())
+        options = {'max_workers': max_workers, 'incremental': incremental, 'use_copy': use_copy,
+                   'usage_source': usage_source, 'backend': resolve_backend(backend)}
+        report_path = write_run_report(status='done' if completed else 'failed', stages=report, options=options)
+        print_steps([entry for entry in summarize_steps(spans()) if entry['step'] != 'stage'], limit=10)
+    finally:
+        end_run()
+    print(f"\nRun report: {report_path} (and .csv)")
+
+    if not completed:
+        print("\nPipeline did not complete, see the failed stages above.")
+        return False
+
     print(f"\n{'='*50}")
-    print("PostgreSQL Pipeline completed successfully!")
+    print(f"{BACKENDS[resolve_backend(backend)]['label']} Pipeline completed successfully!")
     print("Data is ready for Power BI dashboard refresh.")
     print(f"{'='*50}")
     return True
 
+
 if __name__ == "__main__":
-    run_pipeline()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Run the V Mobile pipeline in-process, independent stages in parallel")
+    parser.add_argument('--max-workers', type=int, default=4, help="stages allowed to run at the same time")
+    parser.add_argument('--incremental', action='store_true', help="consolidate and load only changed sources (see subscriber_master_store, load_data_to_db)")
+    parser.add_argument('--copy', action='store_true', help="bulk load with COPY instead of to_sql")
+    parser.add_argument('--usage-source', choices=USAGE_SOURCES, default='staging',
+                        help="read usage from staging, the compact event store or the usage archive")
+    parser.add_argument('--backend', choices=list(BACKENDS),
+                        help="analysis database; sqlite/duckdb run without a database server")
+    stage_names = [stage.name for stage in build_stages()] + ['all']
+    parser.add_argument('--profile', nargs='+', choices=stage_names, default=[], metavar='STAGE',
+                        help="run these stages (or 'all') under cProfile; stats are written next to the run report")
+    parser.add_argument('--trace-memory', nargs='+', choices=stage_names, default=[], metavar='STAGE',
+                        help="trace these stages' allocations with tracemalloc (use with --max-workers 1)")
+    args = parser.parse_args()
+
+    run_pipeline(max_workers=args.max_workers, incremental=args.incremental, use_copy=args.copy, usage_source=args.usage_source,
+                 backend=args.backend, profile=args.profile, trace_memory=args.trace_memory)
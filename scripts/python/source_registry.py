@@ -0,0 +1,275 @@
+# scripts/python/source_registry.py
+
+import argparse
+import codecs
+import csv
+import os
+import re
+
+import pandas as pd # type: ignore
+
+from instrumentation import span, timed_chunks
+
+# Setup paths
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(script_dir))
+data_dir = os.path.join(project_root, 'data')
+raw_data_dir = os.path.join(data_dir, 'raw')
+processed_data_dir = os.path.join(data_dir, 'processed')
+
+USAGE_COLUMN_MAP = {
+    'MSISDN': 'msisdn',
+    'USAGE_EVENT_DATE_TIME': 'usage_event_date_time',
+    'USAGE_EVENT_CITY_ID': 'usage_event_city_id',
+    'USAGE_EVENT_TYPE_ID': 'usage_event_type_id',
+    'USAGE_EVENT_TRACKING_QUANTITY': 'usage_event_tracking_quantity',
+    'USAGE_EVENT_TRACKING_UNIT': 'usage_event_tracking_unit',
+    'USAGE_EVENT_BILLING_QUANTITY': 'usage_event_billing_quantity',
+    'USAGE_EVENT_BILLING_UNIT': 'usage_event_billing_unit',
+    'USAGE_EVENT_REVENUE': 'usage_event_revenue',
+}
+
+# Read dtypes by canonical column; MSISDNs and dates stay text until normalized/parsed
+USAGE_READ_DTYPES = {
+    'msisdn': 'object',
+    'usage_event_date_time': 'object',
+    'usage_event_city_id': 'Int64',
+    'usage_event_type_id': 'Int64',
+    'usage_event_tracking_quantity': 'float64',
+    'usage_event_tracking_unit': 'object',
+    'usage_event_billing_quantity': 'float64',
+    'usage_event_billing_unit': 'object',
+    'usage_event_revenue': 'float64',
+}
+
+SUBSCRIBER_READ_DTYPES = {
+    'region': 'object',
+    'cell_phone_number': 'object',
+    'sim_activation_date': 'object',
+    'first_name': 'object',
+    'last_name': 'object',
+    'date_of_birth': 'object',
+}
+
+# Every source file the pipeline reads and exactly how to read it:
+#   folder/file      where it is (data/raw or data/processed)
+#   delimiter, encoding, decimal   fixed CSV dialect (see sniff_dialect for new drops)
+#   columns          source header -> canonical column name (omitted: names are kept)
+#   dtypes           read dtype per canonical column
+#   msisdn           canonical columns holding MSISDNs (become int64 keys)
+#   dates            canonical column -> exact timestamp format (None: detected per file)
+#   usage            usage records, normalized in chunks by usage_ingestion
+SOURCES = {
+    # Raw usage records
+    'usage_week1': {
+        'folder': 'raw', 'file': 'VMobile_usage_records.csv',
+        'delimiter': ';', 'encoding': 'utf-8', 'decimal': ',',
+        'columns': USAGE_COLUMN_MAP, 'dtypes': USAGE_READ_DTYPES,
+        'dates': {'usage_event_date_time': '%d %m %Y %H:%M'}, 'usage': True,
+    },
+    'usage_week2': {
+        'folder': 'raw', 'file': 'VMobile_usage_records_week_2.csv',
+        'delimiter': ',', 'encoding': 'utf-8-sig', 'decimal': '.',
+        'columns': USAGE_COLUMN_MAP, 'dtypes': USAGE_READ_DTYPES,
+        'dates': {'usage_event_date_time': '%Y/%m/%d %H:%M'}, 'usage': True,
+    },
+
+    # Raw operator subscriber extracts, mapped onto the consolidated layout
+    'vmobile_subscribers': {
+        'folder': 'raw', 'file': 'VMobile_subscribers.csv',
+        'delimiter': ';', 'encoding': 'utf-8', 'decimal': '.',
+        'columns': {
+            'Location': 'region',
+            'Cell Number': 'cell_phone_number',
+            'SIM Activation Date': 'sim_activation_date',
+            'First Name': 'first_name',
+            'Last Name': 'last_name',
+            'Birthday': 'date_of_birth',
+        },
+        'dtypes': SUBSCRIBER_READ_DTYPES,
+        'msisdn': ['cell_phone_number'], 'dates': {'sim_activation_date': '%d %m %Y'},
+    },
+    'bluemobile_subscribers': {
+        'folder': 'raw', 'file': 'VMobile_subscribers_bluemobile.csv',
+        'delimiter': ';', 'encoding': 'utf-8', 'decimal': '.',
+        'columns': {
+            'Activate': 'sim_activation_date',
+            'Name': 'first_name',
+            'City': 'region',
+            'Cell': 'cell_phone_number',
+            'Date': 'date_of_birth',
+            'Surname': 'last_name',
+        },
+        'dtypes': SUBSCRIBER_READ_DTYPES,
+        'msisdn': ['cell_phone_number'], 'dates': {'sim_activation_date': '%d %m %Y'},
+    },
+    'arrowmobile_subscribers': {
+        # No date of birth in the ArrowMobile extract
+        'folder': 'raw', 'file': 'VMobile_subscribers_arrowmobile.csv',
+        'delimiter': ';', 'encoding': 'utf-8', 'decimal': '.',
+        'columns': {
+            'CellNo': 'cell_phone_number',
+            'FirstName': 'first_name',
+            'LastName': 'last_name',
+            'Area': 'region',
+            'SIMDate': 'sim_activation_date',
+        },
+        'dtypes': SUBSCRIBER_READ_DTYPES,
+        'msisdn': ['cell_phone_number'], 'dates': {'sim_activation_date': '%d %m %Y'},
+    },
+
+    # Raw lookups
+    'city_lookup': {
+        'folder': 'raw', 'file': 'VMobile_city_lookup.csv',
+        'delimiter': ';', 'encoding': 'utf-8', 'decimal': ',',
+        'dtypes': {
+            'CITY_ID': 'int64', 'PROVINCE_NAME': 'object', 'CITY_NAME': 'object',
+            'ALTERNATIVE_CITY_NAME': 'object', 'CITY_LATITUDE': 'float64',
+            'CITY_LONGITUDE': 'float64', 'CITY_POPULATION': 'object',
+        },
+    },
+    'usage_event_lookup': {
+        'folder': 'raw', 'file': 'VMobile_usage_event_lookup.csv',
+        'delimiter': ';', 'encoding': 'utf-8', 'decimal': '.',
+        'dtypes': {'USAGE_EVENT_TYPE_ID': 'int64', 'USAGE_EVENT_TYPE': 'object'},
+    },
+
+    # Processed outputs of earlier stages
+    'all_subscribers': {
+        'folder': 'processed', 'file': 'combined_subscribers_all.csv',
+        'delimiter': ',', 'encoding': 'utf-8', 'decimal': '.',
+        'dtypes': dict(SUBSCRIBER_READ_DTYPES, source_system_name='object', source_priority='Int64', is_master_record='bool'),
+        'msisdn': ['cell_phone_number'], 'dates': {'sim_activation_date': '%Y-%m-%d'},
+    },
+    'master_subscribers': {
+        'folder': 'processed', 'file': 'combined_subscribers_master.csv',
+        'delimiter': ',', 'encoding': 'utf-8', 'decimal': '.',
+        'dtypes': dict(SUBSCRIBER_READ_DTYPES, source_system_name='object', source_priority='Int64', is_master_record='bool'),
+        'msisdn': ['cell_phone_number'], 'dates': {'sim_activation_date': '%Y-%m-%d'},
+    },
+    'subscriber_master_changes': {
+        # Written by subscriber_master_store, applied by load_data_to_db --incremental
+        'folder': 'processed', 'file': 'subscriber_master_changes.csv',
+        'delimiter': ',', 'encoding': 'utf-8', 'decimal': '.',
+        'dtypes': dict(SUBSCRIBER_READ_DTYPES, change_type='object', previous_source_system_name='object',
+                       source_system_name='object', source_priority='Int64', is_master_record='bool'),
+        'msisdn': ['cell_phone_number'], 'dates': {'sim_activation_date': '%Y-%m-%d'},
+    },
+    'subscriber_details': {
+        'folder': 'processed', 'file': 'subscriber_details.csv',
+        'delimiter': ',', 'encoding': 'utf-8', 'decimal': '.',
+        'dtypes': {
+            'msisdn': 'object', 'week_start': 'object', 'weekly_revenue': 'float64',
+            'total_events': 'Int64', 'sms_events': 'Int64', 'voice_events': 'Int64', 'is_qualifying': 'Int64',
+            'first_name': 'object', 'last_name': 'object', 'region': 'object', 'date_of_birth': 'object',
+            'sim_activation_date': 'object', 'source_system_name': 'object',
+        },
+        'msisdn': ['msisdn'], 'dates': {'week_start': '%Y-%m-%d'},
+    },
+    'regional_analysis': {
+        'folder': 'processed', 'file': 'regional_analysis.csv',
+        'delimiter': ',', 'encoding': 'utf-8', 'decimal': '.',
+        'dtypes': {
+            'week_start': 'object', 'region_name': 'object', 'province_name': 'object',
+            'total_subscribers': 'Int64', 'total_revenue': 'float64', 'qualifying_subscribers': 'Int64',
+            'avg_qualifier_revenue': 'float64', 'qualification_rate': 'float64',
+        },
+        'dates': {'week_start': '%Y-%m-%d'},
+    },
+    'weekly_summary_trends': {
+        'folder': 'processed', 'file': 'weekly_summary_trends.csv',
+        'delimiter': ',', 'encoding': 'utf-8', 'decimal': '.',
+        'dtypes': {
+            'week_start': 'object', 'total_subscribers': 'Int64', 'total_revenue': 'float64',
+            'total_events': 'Int64', 'qualifying_subscribers': 'Int64',
+            'avg_qualifier_revenue': 'float64', 'qualification_rate': 'float64',
+        },
+        'dates': {'week_start': '%Y-%m-%d'},
+    },
+}
+
+
+def source_path(name):
+    spec = SOURCES[name]
+    folder = raw_data_dir if spec['folder'] == 'raw' else processed_data_dir
+    return os.path.join(folder, spec['file'])
+
+
+def read_source(name, chunksize=None, columns=None):
+    """Read a registered source with its fixed dialect and dtypes, columns renamed to canonical names.
+
+    Returns a DataFrame, or an iterator of DataFrames when chunksize is given.
+    columns (canonical names) limits what is parsed.
+    """
+    spec = SOURCES[name]
+    column_map = spec.get('columns', {})
+    source_names = {canonical: source for source, canonical in column_map.items()}
+
+    usecols = None
+    if columns is not None:
+        usecols = [source_names.get(col, col) for col in columns]
+        # Only columns this source actually has
+        usecols = lambda col, wanted=set(usecols): col in wanted
+    dtypes = {source_names.get(col, col): dtype for col, dtype in spec.get('dtypes', {}).items()}
+    read_options = {
+        'sep': spec['delimiter'],
+        'encoding': spec['encoding'],
+        'decimal': spec['decimal'],
+        'dtype': dtypes,
+        'usecols': usecols,
+    }
+
+    if chunksize is not None:
+        reader = pd.read_csv(source_path(name), chunksize=chunksize, **read_options)
+        return timed_chunks('load', name, (chunk.rename(columns=column_map) for chunk in reader))
+    with span('load', name) as current:
+        df = pd.read_csv(source_path(name), **read_options).rename(columns=column_map)
+        current.count(rows_out=len(df))
+    return df
+
+
+def sniff_dialect(file_path, sample_bytes=64 * 1024):
+    """Work out a new drop's encoding, delimiter and decimal separator once, for its registry entry"""
+    with open(file_path, 'rb') as f:
+        raw = f.read(sample_bytes)
+
+    if raw.startswith(codecs.BOM_UTF8):
+        encoding = 'utf-8-sig'
+    else:
+        try:
+            raw.decode('utf-8')
+            encoding = 'utf-8'
+        except UnicodeDecodeError as e:
+            # A cut multi-byte character at the end of the sample is still utf-8
+            encoding = 'utf-8' if e.start >= len(raw) - 3 else 'latin-1'
+
+    text = raw.decode(encoding, errors='ignore')
+    lines = text.splitlines()
+    if len(raw) == sample_bytes and len(lines) > 1:
+        lines = lines[:-1]  # last line may be cut off
+    sample = '\n'.join(lines)
+
+    delimiter = csv.Sniffer().sniff(sample, delimiters=';,\t|').delimiter
+    rows = list(csv.reader(lines, delimiter=delimiter))
+    header = rows[0] if rows else []
+
+    # Numbers written like 10,28 (only possible when ',' is not the delimiter)
+    comma_decimals = sum(1 for row in rows[1:] for value in row if re.fullmatch(r'\s*-?\d+,\d+\s*', value))
+    dot_decimals = sum(1 for row in rows[1:] for value in row if re.fullmatch(r'\s*-?\d+\.\d+\s*', value))
+    decimal = ',' if delimiter != ',' and comma_decimals > dot_decimals else '.'
+
+    return {'delimiter': delimiter, 'encoding': encoding, 'decimal': decimal, 'header': header}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sniff the CSV dialect of a new source file for its SOURCES entry")
+    parser.add_argument('file', help="path of the new CSV drop")
+    args = parser.parse_args()
+
+    dialect = sniff_dialect(args.file)
+    print(f"File:      {args.file}")
+    print(f"Encoding:  {dialect['encoding']}")
+    print(f"Delimiter: {dialect['delimiter']!r}")
+    print(f"Decimal:   {dialect['decimal']!r}")
+    print(f"Columns:   {dialect['header']}")
+    print("\nAdd it to SOURCES in source_registry.py with these fixed read parameters.")
@@ -0,0 +1,178 @@
+# scripts/python/staging.py
+
+import argparse
+import json
+import os
+import threading
+
+import pandas as pd # type: ignore
+
+from instrumentation import span, timed_chunks
+from normalization import normalize_msisdn_key
+from source_registry import SOURCES, read_source, source_path
+from timestamps import parse_timestamps
+from usage_ingestion import DEFAULT_CHUNKSIZE, iter_usage_chunks, type_usage_chunk
+
+try:
+    import pyarrow as pa # type: ignore
+    import pyarrow.parquet as pq # type: ignore
+except ImportError:  # staging is skipped and sources are read directly
+    pa = pq = None
+
+# Setup paths
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(script_dir))
+data_dir = os.path.join(project_root, 'data')
+staging_dir = os.path.join(data_dir, 'staging')
+
+# Bump when the typing of a dataset changes so older staged files are rebuilt
+STAGING_VERSION = 3
+
+# Datasets and how they are read and typed are declared in source_registry.SOURCES
+USAGE_DATASETS = ['usage_week1', 'usage_week2']
+
+# Stages may run concurrently; only one thread checks/rebuilds a staged file at a time
+_stage_lock = threading.RLock()
+
+
+def staging_available():
+    return pq is not None
+
+
+def staged_path(name):
+    return os.path.join(staging_dir, f"{name}.parquet")
+
+
+def _meta_path(name):
+    return os.path.join(staging_dir, f"{name}.meta.json")
+
+
+def _source_signature(name):
+    stat = os.stat(source_path(name))
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'version': STAGING_VERSION}
+
+
+def is_current(name):
+    """A staged file is valid while its source keeps the same size and mtime"""
+    if not os.path.exists(staged_path(name)) or not os.path.exists(_meta_path(name)):
+        return False
+    with open(_meta_path(name), 'r') as f:
+        recorded = json.load(f)
+    return recorded == _source_signature(name)
+
+
+def _type_table(df, spec, name=None):
+    for col in spec.get('msisdn', []):
+        if col in df.columns:
+            with span('normalize', name, rows_in=len(df)) as step:
+                present = df[col].notna()
+                df[col] = normalize_msisdn_key(df[col])
+                step.count(rows_out=len(df), rejected=(present & df[col].isna()).sum())
+    for col, fmt in spec.get('dates', {}).items():
+        if col in df.columns:
+            with span('parse_dates', name, rows_in=len(df)) as step:
+                df[col], rejected = parse_timestamps(df[col], formats=[fmt], date_format=fmt)
+                step.count(rows_out=len(df), rejected=rejected)
+            if rejected:
+                print(f"Warning: {rejected} values in {col} do not match {fmt} and were set to NaT")
+    return df
+
+
+def iter_source_chunks(name, chunksize=DEFAULT_CHUNKSIZE, columns=None):
+    """Parse and type a dataset straight from its source file"""
+    spec = SOURCES[name]
+    if spec.get('usage'):
+        for chunk in iter_usage_chunks(name, chunksize, columns=columns):
+            yield type_usage_chunk(chunk)
+        return
+
+    for chunk in read_source(name, chunksize=chunksize):
+        chunk = _type_table(chunk, spec, name)
+        yield chunk if columns is None else chunk[[col for col in columns if col in chunk.columns]]
+
+
+def stage(name, force=False, chunksize=DEFAULT_CHUNKSIZE):
+    """Convert one dataset to Parquet unless the staged copy is still current"""
+    if not staging_available():
+        return None
+    with _stage_lock:
+        if not force and is_current(name):
+            return staged_path(name)
+        return _write_staged(name, chunksize)
+
+
+def _write_staged(name, chunksize):
+    os.makedirs(staging_dir, exist_ok=True)
+    signature = _source_signature(name)
+    tmp_path = staged_path(name) + '.tmp'
+
+    # Chunks are appended as row groups, so large usage files are never fully in memory
+    writer = None
+    rows = 0
+    with span('write', name) as step:
+        try:
+            for chunk in iter_source_chunks(name, chunksize):
+                table = pa.Table.from_pandas(chunk, preserve_index=False, schema=writer.schema if writer else None)
+                if writer is None:
+                    writer = pq.ParquetWriter(tmp_path, table.schema)
+                writer.write_table(table)
+                rows += len(chunk)
+        finally:
+            if writer is not None:
+                writer.close()
+        step.count(rows_in=rows, rows_out=rows)
+
+    os.replace(tmp_path, staged_path(name))
+    with open(_meta_path(name), 'w') as f:
+        json.dump(signature, f)
+    print(f"Staged {name}: {rows} records -> {staged_path(name)}")
+    return staged_path(name)
+
+
+def read_staged(name, columns=None):
+    """Typed DataFrame for a dataset, (re)staging it first if the source changed"""
+    path = stage(name)
+    if path is None:
+        return pd.concat(list(iter_source_chunks(name, columns=columns)), ignore_index=True)
+    with span('load', name) as step:
+        df = pd.read_parquet(path, columns=columns)
+        step.count(rows_out=len(df))
+    return df
+
+
+def iter_staged_chunks(name, chunksize=DEFAULT_CHUNKSIZE, columns=None):
+    """Typed chunks of a dataset, streamed from its staged Parquet file"""
+    path = stage(name, chunksize=chunksize)
+    if path is None:
+        yield from iter_source_chunks(name, chunksize, columns)
+        return
+
+    parquet_file = pq.ParquetFile(path)
+    if columns is not None:
+        columns = [col for col in columns if col in parquet_file.schema_arrow.names]
+    batches = (batch.to_pandas() for batch in parquet_file.iter_batches(batch_size=chunksize, columns=columns))
+    yield from timed_chunks('load', name, batches)
+
+
+def stage_all(force=False):
+    if not staging_available():
+        print("pyarrow is not installed, nothing staged. Install with: pip install pyarrow")
+        return
+
+    print(f"Staging datasets to: {staging_dir}")
+    for name in SOURCES:
+        if not os.path.exists(source_path(name)):
+            print(f"Skipping {name}: source not found ({source_path(name)})")
+            continue
+        if not force and is_current(name):
+            print(f"{name} is up to date")
+            continue
+        stage(name, force=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert raw and processed datasets to typed Parquet")
+    parser.add_argument('--force', action='store_true', help="re-stage even if the sources are unchanged")
+    args = parser.parse_args()
+
+    stage_all(force=args.force)
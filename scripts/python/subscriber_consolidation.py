@@ -1,122 +1,217 @@
 # scripts/subscriber_consolidation.py
 
+import argparse
+import numpy as np
 import pandas as pd # type: ignore
 import os
 
+from instrumentation import span
+from staging import iter_staged_chunks, read_staged
+
 
 # Get the directory where this script is located
 script_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.dirname(os.path.dirname(script_dir))  # Go up two levels to VMobile/
 data_dir = os.path.join(project_root, 'data')
 raw_data_dir = os.path.join(data_dir, 'raw')
-
-vmobile_path = os.path.join(raw_data_dir, "VMobile_subscribers.csv")
-bluemobile_path = os.path.join(raw_data_dir, "VMobile_subscribers_bluemobile.csv")
-arrowmobile_path = os.path.join(raw_data_dir, "VMobile_subscribers_arrowmobile.csv")
-
-# Load the three subscriber datasets
-print("Loading subscriber data...")
-df_vmobile = pd.read_csv(vmobile_path, delimiter=';')
-df_bluemobile = pd.read_csv(bluemobile_path, delimiter=';')
-df_arrowmobile = pd.read_csv(arrowmobile_path, delimiter=';')
-
-# DEBUG: Check the actual column names
-print("V Mobile columns:", df_vmobile.columns.tolist())
-print("BlueMobile columns:", df_bluemobile.columns.tolist())
-print("ArrowMobile columns:", df_arrowmobile.columns.tolist())
-
-# Display the shape (rows, columns) of each to verify load
-print(f"V Mobile data: {df_vmobile.shape}")
-print(f"BlueMobile data: {df_bluemobile.shape}")
-print(f"ArrowMobile data: {df_arrowmobile.shape}")
-
-# Standardize V Mobile Columns
-# Note: 'Location' is the Region. 'Birthday' is Date of Birth.
-df_vmobile_standardized = df_vmobile.rename(columns={
-    'Cell Number': 'cell_phone_number',
-    'SIM Activation Date': 'sim_activation_date',
-    'First Name': 'first_name',
-    'Last Name': 'last_name',
-    'Birthday': 'date_of_birth',
-    'Location': 'region'
-})
-# Add a column to track the source system
-df_vmobile_standardized['source_system_name'] = 'VMobile'
-
-# Standardize BlueMobile Columns
-# Note: 'Activate' is SIM Activation Date. 'Name' is First Name. 'Surname' is Last Name.
-df_bluemobile_standardized = df_bluemobile.rename(columns={
-    'Cell': 'cell_phone_number',
-    'Activate': 'sim_activation_date',
-    'Name': 'first_name',
-    'Surname': 'last_name',
-    'Date': 'date_of_birth',  # Assuming 'Date' is Date of Birth
-    'City': 'region'
-})
-df_bluemobile_standardized['source_system_name'] = 'BlueMobile'
-
-# Standardize ArrowMobile Columns
-df_arrowmobile_standardized = df_arrowmobile.rename(columns={
-    'CellNo': 'cell_phone_number',
-    'SIMDate': 'sim_activation_date',
-    'FirstName': 'first_name',
-    'LastName': 'last_name',
-    # ArrowMobile file doesn't have Date of Birth or Region in the screenshot
-    'Area': 'region'
-})
-# Add missing columns to match the others
-df_arrowmobile_standardized['date_of_birth'] = None  # Or pd.NA
-df_arrowmobile_standardized['source_system_name'] = 'ArrowMobile'
-
-# Combine all standardized DataFrames
-print("Combining all subscriber data...")
-combined_subscribers = pd.concat(
-    [df_vmobile_standardized, df_bluemobile_standardized, df_arrowmobile_standardized],
-    ignore_index=True  # This resets the index so it's continuous
-)
-
-print(f"Combined data shape: {combined_subscribers.shape}")
-print(combined_subscribers.head())
-
-# First, ensure 'sim_activation_date' is a datetime object for correct comparison
-combined_subscribers['sim_activation_date'] = pd.to_datetime(combined_subscribers['sim_activation_date'], dayfirst=True, errors='coerce')
-
-# Define the priority of source systems for tie-breaking
-# Lower number = higher priority
-source_priority = {'VMobile': 1, 'BlueMobile': 2, 'ArrowMobile': 3}
-combined_subscribers['source_priority'] = combined_subscribers['source_system_name'].map(source_priority)
-
-# Step 1: Sort the entire dataframe by our business rules.
-# We sort by phone number, then by priority (VMobile first), then by SIM date (newest first).
-combined_subscribers_sorted = combined_subscribers.sort_values(
-    by=['cell_phone_number', 'source_priority', 'sim_activation_date'],
-    ascending=[True, True, False]
-)
-
-# Step 2: Mark the first occurrence of each phone number as the master record.
-combined_subscribers_sorted['is_master_record'] = False
-combined_subscribers_sorted.loc[~combined_subscribers_sorted.duplicated(subset=['cell_phone_number']), 'is_master_record'] = True
-
-# Let's create our final outputs
-print("Creating final output tables...")
-
-# Output 1: The combined table with the master record flag
-final_combined_table = combined_subscribers_sorted.copy()
-
-# Output 2: A table containing ONLY the master records
-master_records_table = final_combined_table[final_combined_table['is_master_record'] == True].copy()
-
-print(f"Final combined table shape: {final_combined_table.shape}")
-print(f"Master records table shape: {master_records_table.shape}")
-print(f"Number of unique subscribers: {master_records_table['cell_phone_number'].nunique()}")
-
-# Save the results to the processed data folder
-output_dir = "data/processed/"
-# os.makedirs(output_dir, exist_ok=True)  # Create folder if it doesn't exist
-
-final_combined_table.to_csv(os.path.join(output_dir, "combined_subscribers_all.csv"), index=False)
-master_records_table.to_csv(os.path.join(output_dir, "combined_subscribers_master.csv"), index=False)
-
-print("Data preparation complete! Files saved to 'data/processed/'")
-print("1. 'combined_subscribers_all.csv' - All records with master flag")
-print("2. 'combined_subscribers_master.csv' - Only master records")
\ No newline at end of file
+processed_data_dir = os.path.join(data_dir, 'processed')
+
+# Operator extracts and the priority of each source system for picking the
+# master record. Lower number = higher priority
+SUBSCRIBER_SOURCES = [
+    ('vmobile_subscribers', 'VMobile', 1),
+    ('bluemobile_subscribers', 'BlueMobile', 2),
+    ('arrowmobile_subscribers', 'ArrowMobile', 3),
+]
+
+# Layout of combined_subscribers_all.csv / combined_subscribers_master.csv
+SUBSCRIBER_COLUMNS = [
+    'region', 'cell_phone_number', 'sim_activation_date', 'first_name', 'last_name',
+    'date_of_birth', 'source_system_name', 'source_priority', 'is_master_record'
+]
+
+# Activation day given to records without one, so they lose to any dated record
+MISSING_ACTIVATION_DAY = -(2 ** 31)
+
+
+def master_rank(source_priority, sim_activation_date):
+    """int64 rank per record, lowest wins: source priority first, then the newest SIM activation.
+
+    Activation dates count at day resolution; records without one come last
+    within their source priority.
+    """
+    dates = pd.to_datetime(sim_activation_date)
+    days = dates.to_numpy(dtype='datetime64[ns]').astype('datetime64[D]').astype('int64')
+    days = np.where(dates.isna().to_numpy(), MISSING_ACTIVATION_DAY, days)
+    priority = pd.Series(source_priority).to_numpy(dtype='int64', na_value=len(SUBSCRIBER_SOURCES) + 1)
+    return priority * 2 ** 32 - days
+
+
+def select_masters(keys, ranks):
+    """Position of the best-ranked record per key, via one hash-grouped argmin (no sort).
+
+    On equal rank the earlier record wins. Records without a key are one group.
+    """
+    ranks = pd.Series(np.asarray(ranks), index=pd.RangeIndex(len(ranks)))
+    keys = pd.Series(keys).reset_index(drop=True)
+    return ranks.groupby(keys, sort=False, dropna=False).idxmin().to_numpy()
+
+
+def iter_subscriber_chunks(chunksize=None, sources=None):
+    """Typed records of each operator extract in the combined layout (without the master flag).
+
+    chunksize=None yields each source whole. sources limits the extracts read
+    (by dataset name), they are still read in priority order.
+    """
+    for name, source_system, priority in SUBSCRIBER_SOURCES:
+        if sources is not None and name not in sources:
+            continue
+        chunks = [read_staged(name)] if chunksize is None else iter_staged_chunks(name, chunksize)
+        for chunk in chunks:
+            chunk = chunk.assign(source_system_name=source_system, source_priority=priority)
+            # ArrowMobile has no date of birth; add it empty to match the others
+            if 'date_of_birth' not in chunk.columns:
+                chunk['date_of_birth'] = None
+            yield chunk[SUBSCRIBER_COLUMNS[:-1]]
+
+
+def _flag_masters(combined_subscribers):
+    ranks = master_rank(combined_subscribers['source_priority'], combined_subscribers['sim_activation_date'])
+    is_master = np.zeros(len(combined_subscribers), dtype=bool)
+    is_master[select_masters(combined_subscribers['cell_phone_number'], ranks)] = True
+    combined_subscribers['is_master_record'] = is_master
+    return combined_subscribers
+
+
+def _output_paths():
+    os.makedirs(processed_data_dir, exist_ok=True)  # Create folder if it doesn't exist
+    return (os.path.join(processed_data_dir, "combined_subscribers_all.csv"),
+            os.path.join(processed_data_dir, "combined_subscribers_master.csv"))
+
+
+def consolidate_subscribers(chunksize=None):
+    """Combine the three operator extracts and pick one master record per subscriber.
+
+    Records are keyed on the canonical int64 MSISDN from staging, so '+27...'
+    and '0...' numbers of one subscriber are one key. The master per key is
+    the record with the highest source priority, then the newest SIM
+    activation; it is found with a hash-grouped argmin in O(n) instead of a
+    global sort. Records keep their source order in the outputs.
+
+    Writes combined_subscribers_all.csv / combined_subscribers_master.csv and
+    returns both tables so an in-process caller can hand them on directly.
+    With chunksize the sources are streamed instead (see
+    consolidate_subscribers_streaming) and (None, None) is returned.
+    """
+    if chunksize is not None:
+        consolidate_subscribers_streaming(chunksize)
+        return None, None
+
+    # Typed staging copies: columns already mapped to the combined layout by
+    # source_registry, canonical int64 cell numbers, parsed SIM activation dates
+    print("Loading subscriber data...")
+    sources = list(iter_subscriber_chunks())
+    for (_, source_system, _), df in zip(SUBSCRIBER_SOURCES, sources):
+        print(f"{source_system} data: {df.shape}")
+
+    print("Combining all subscriber data...")
+    with span('merge', 'master_subscribers', rows_in=sum(len(df) for df in sources)) as step:
+        combined_subscribers = pd.concat(sources, ignore_index=True)
+        print(f"Combined data shape: {combined_subscribers.shape}")
+
+        # Output 1: The combined table with the master record flag
+        final_combined_table = _flag_masters(combined_subscribers)
+
+        # Output 2: A table containing ONLY the master records
+        master_records_table = final_combined_table[final_combined_table['is_master_record']].copy()
+        step.count(rows_out=len(master_records_table))
+
+    print(f"Final combined table shape: {final_combined_table.shape}")
+    print(f"Master records table shape: {master_records_table.shape}")
+    print(f"Number of unique subscribers: {master_records_table['cell_phone_number'].nunique()}")
+
+    all_path, master_path = _output_paths()
+    with span('write', 'combined_subscribers', rows_in=len(final_combined_table)) as step:
+        final_combined_table.to_csv(all_path, index=False)
+        master_records_table.to_csv(master_path, index=False)
+        step.count(rows_out=len(final_combined_table) + len(master_records_table))
+
+    print("Data preparation complete! Files saved to 'data/processed/'")
+    print("1. 'combined_subscribers_all.csv' - All records with master flag")
+    print("2. 'combined_subscribers_master.csv' - Only master records")
+
+    return final_combined_table, master_records_table
+
+
+def _merge_winners(best, winners):
+    """Best record per key of best and the later chunks' winners (earlier records keep winning ties)"""
+    combined = pd.concat([best] + winners, ignore_index=True)
+    return combined.iloc[select_masters(combined['key'], combined['rank'])]
+
+
+def consolidate_subscribers_streaming(chunksize):
+    """Two streaming passes over the extracts, for ones too large to combine in memory.
+
+    Pass 1 keeps only the best (rank, record number) per MSISDN: each chunk is
+    reduced to its own winners, which are merged into the best so far once
+    they outnumber it. Every record is regrouped a bounded number of times on
+    average, so the pass stays O(n), and memory grows with the number of
+    subscribers (plus one chunk), not records.
+    Pass 2 re-reads the chunks and writes every record with its master flag.
+    """
+    print(f"Selecting master records in chunks of {chunksize}...")
+    best = pd.DataFrame({
+        'key': pd.array([], dtype='Int64'),
+        'rank': np.array([], dtype='int64'),
+        'record': np.array([], dtype='int64'),
+    })
+    winners = []
+    pending = 0
+    records = 0
+    with span('merge', 'master_subscribers') as step:
+        for chunk in iter_subscriber_chunks(chunksize):
+            candidates = pd.DataFrame({
+                'key': chunk['cell_phone_number'].to_numpy(),
+                'rank': master_rank(chunk['source_priority'], chunk['sim_activation_date']),
+                'record': np.arange(records, records + len(chunk), dtype='int64'),
+            })
+            winners.append(candidates.iloc[select_masters(candidates['key'], candidates['rank'])])
+            pending += len(winners[-1])
+            records += len(chunk)
+            if pending > max(len(best), chunksize):
+                best = _merge_winners(best, winners)
+                winners, pending = [], 0
+        best = _merge_winners(best, winners)
+        step.count(rows_in=records, rows_out=len(best))
+
+    is_master = np.zeros(records, dtype=bool)
+    is_master[best['record'].to_numpy()] = True
+    print(f"{records} records, {len(best)} unique subscribers")
+
+    all_path, master_path = _output_paths()
+    records = 0
+    masters = 0
+    with span('write', 'combined_subscribers') as step, \
+            open(all_path + '.tmp', 'w', newline='') as all_file, open(master_path + '.tmp', 'w', newline='') as master_file:
+        for chunk in iter_subscriber_chunks(chunksize):
+            chunk = chunk.assign(is_master_record=is_master[records:records + len(chunk)])
+            chunk.to_csv(all_file, index=False, header=records == 0)
+            chunk[chunk['is_master_record']].to_csv(master_file, index=False, header=records == 0)
+            records += len(chunk)
+            masters += int(chunk['is_master_record'].sum())
+        step.count(rows_in=records, rows_out=records + masters)
+    os.replace(all_path + '.tmp', all_path)
+    os.replace(master_path + '.tmp', master_path)
+
+    print(f"Final combined table: {records} records")
+    print(f"Master records table: {masters} records")
+    print("Data preparation complete! Files saved to 'data/processed/'")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Combine the operator subscriber extracts and pick master records")
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help="stream the extracts in chunks of this many records (for very large extracts)")
+    args = parser.parse_args()
+
+    consolidate_subscribers(chunksize=args.chunksize)
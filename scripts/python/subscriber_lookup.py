@@ -0,0 +1,337 @@
+# scripts/python/subscriber_lookup.py
+
+import argparse
+import json
+import os
+import re
+import threading
+import time
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd # type: ignore
+
+from normalization import COUNTRY_CODE, NATIONAL_NUMBER_LENGTH
+from source_registry import source_path
+from staging import USAGE_DATASETS, iter_staged_chunks, read_staged, stage
+from subscriber_consolidation import master_rank, select_masters
+from usage_ingestion import SMS_EVENT_IDS, VOICE_EVENT_IDS, _event_masks, _sorted_codes
+from weekly_qualification_report import QUALIFYING_REVENUE
+
+# Seconds between checks whether the staged inputs changed (checks stat the files)
+REFRESH_SECONDS = 5.0
+
+# Week numbers count Mondays since 1970-01-05 (day 4 of the epoch), the same
+# weeks as DATE_TRUNC('week') in the analysis SQL
+_EPOCH = date(1970, 1, 1)
+_FIRST_MONDAY = 4
+_WEEK_BITS = 16
+
+
+def _week_numbers(timestamps):
+    days = timestamps.to_numpy(dtype='datetime64[ns]').astype('datetime64[D]').astype('int64')
+    return (days - _FIRST_MONDAY) // 7
+
+
+def _week_start(week_number):
+    return np.datetime64(int(week_number) * 7 + _FIRST_MONDAY, 'D')
+
+
+def _week_number(week_start):
+    """Week number of a date ('YYYY-MM-DD', date or Timestamp); any day of the week works"""
+    day = date.fromisoformat(week_start) if isinstance(week_start, str) else pd.Timestamp(week_start).date()
+    return ((day - _EPOCH).days - _FIRST_MONDAY) // 7
+
+
+def msisdn_key(value):
+    """Canonical int64 MSISDN for one value ('+27...', '0...', '27...' or an int), None if unusable"""
+    digits = re.sub(r'\D', '', str(value))
+    if len(digits) == NATIONAL_NUMBER_LENGTH + 1 and digits.startswith('0'):
+        digits = COUNTRY_CODE + digits[1:]
+    elif len(digits) == NATIONAL_NUMBER_LENGTH:
+        digits = COUNTRY_CODE + digits
+    return int(digits) if digits else None
+
+
+def _weekly_chunk_totals(chunk):
+    """Revenue, event, SMS and voice counts per (msisdn, week) key of one usage chunk"""
+    chunk = chunk[chunk['msisdn'].notna() & chunk['usage_event_date_time'].notna()]
+    keys = (chunk['msisdn'].to_numpy(dtype='int64') << _WEEK_BITS) + _week_numbers(chunk['usage_event_date_time'])
+    codes, uniques = _sorted_codes(keys)
+    type_ids = chunk['usage_event_type_id'].to_numpy(dtype='int64', na_value=0)
+    is_sms, is_voice = _event_masks(type_ids, SMS_EVENT_IDS, VOICE_EVENT_IDS)
+    revenue = chunk['usage_event_revenue'].to_numpy(dtype='float64', na_value=0.0)
+    return pd.DataFrame({
+        'key': uniques,
+        'revenue': np.bincount(codes, weights=revenue, minlength=len(uniques)),
+        'events': np.bincount(codes, minlength=len(uniques)),
+        'sms': np.bincount(codes[is_sms], minlength=len(uniques)),
+        'voice': np.bincount(codes[is_voice], minlength=len(uniques)),
+    })
+
+
+def build_lookup_index(chunksize=None):
+    """Plain numpy arrays for the lookups: masters sorted by msisdn, weekly totals by (msisdn, week)"""
+    master = read_staged('master_subscribers')
+    master = master.iloc[select_masters(master['cell_phone_number'], master_rank(master['source_priority'], master['sim_activation_date']))]
+    master = master[master['cell_phone_number'].notna()]
+    master = master.iloc[np.argsort(master['cell_phone_number'].to_numpy(dtype='int64'), kind='stable')]
+    region_code, region_names = pd.factorize(master['region'].fillna('Unknown'))
+
+    # Per-chunk totals, then one more grouping over those (far fewer rows than events)
+    chunk_totals = []
+    for name in USAGE_DATASETS:
+        columns = ['msisdn', 'usage_event_date_time', 'usage_event_type_id', 'usage_event_revenue']
+        chunks = [read_staged(name, columns=columns)] if chunksize is None else iter_staged_chunks(name, chunksize, columns=columns)
+        chunk_totals.extend(_weekly_chunk_totals(chunk) for chunk in chunks)
+    totals = pd.concat(chunk_totals, ignore_index=True)
+    codes, keys = _sorted_codes(totals['key'].to_numpy())
+
+    def total(col):
+        return np.bincount(codes, weights=totals[col].to_numpy(), minlength=len(keys))
+
+    index = {
+        'master_msisdn': master['cell_phone_number'].to_numpy(dtype='int64'),
+        'master_first_name': master['first_name'].to_numpy(dtype='object'),
+        'master_last_name': master['last_name'].to_numpy(dtype='object'),
+        'master_region': region_code.astype('int16'),
+        'master_sim_activation_date': master['sim_activation_date'].to_numpy(dtype='datetime64[D]'),
+        'master_source_system': master['source_system_name'].to_numpy(dtype='object'),
+        'region_names': np.asarray(region_names, dtype='object'),
+        'region_codes': {name: code for code, name in enumerate(region_names)},
+        'msisdn': keys >> _WEEK_BITS,
+        'week': (keys & ((1 << _WEEK_BITS) - 1)).astype('int32'),
+        # Cents, as the report and the NUMERIC(12,2) columns count money
+        'revenue': total('revenue').round(2),
+        'events': total('events').astype('int32'),
+        'sms': total('sms').astype('int32'),
+        'voice': total('voice').astype('int32'),
+    }
+
+    # Region of each weekly row = its subscriber's master region (-1: not in master)
+    index['region'] = np.full(len(keys), -1, dtype='int16')
+    if len(index['master_msisdn']):
+        position = np.minimum(np.searchsorted(index['master_msisdn'], index['msisdn']), len(index['master_msisdn']) - 1)
+        found = index['master_msisdn'][position] == index['msisdn']
+        index['region'][found] = index['master_region'][position[found]]
+
+    # Qualifying rows ordered by week, region, revenue (highest first), with
+    # the boundaries of every (week, region) and every week
+    qualifying = np.flatnonzero(index['revenue'] >= QUALIFYING_REVENUE)
+    by_region = qualifying[np.lexsort((-index['revenue'][qualifying], index['region'][qualifying], index['week'][qualifying]))]
+    by_week = qualifying[np.lexsort((-index['revenue'][qualifying], index['week'][qualifying]))]
+    index['top_by_region'] = by_region
+    index['top_by_region_bounds'] = _group_bounds(index['week'][by_region], index['region'][by_region])
+    index['top_by_week'] = by_week
+    index['top_by_week_bounds'] = _group_bounds(index['week'][by_week])
+    return index
+
+
+def _group_bounds(*sorted_keys):
+    """{key: (start, end)} for runs of equal keys in already sorted arrays"""
+    if not len(sorted_keys[0]):
+        return {}
+    change = np.zeros(len(sorted_keys[0]), dtype=bool)
+    change[0] = True
+    for keys in sorted_keys:
+        change[1:] |= keys[1:] != keys[:-1]
+    starts = np.flatnonzero(change)
+    ends = np.append(starts[1:], len(change))
+    group_keys = zip(*(keys[starts].tolist() for keys in sorted_keys))
+    return {key if len(sorted_keys) > 1 else key[0]: (start, end)
+            for key, start, end in zip(group_keys, starts.tolist(), ends.tolist())}
+
+
+def _inputs_signature():
+    """Changes whenever a staged input (or, without staging, its source file) is rewritten"""
+    signature = []
+    for name in ['master_subscribers'] + USAGE_DATASETS:
+        path = stage(name) or source_path(name)
+        stat = os.stat(path)
+        signature.append((path, stat.st_size, stat.st_mtime_ns))
+    return tuple(signature)
+
+
+class SubscriberLookup:
+    """Drill-through lookups over master subscribers and their weekly totals, held in numpy arrays.
+
+    Lookups are binary searches or slices of pre-sorted arrays. The index is
+    rebuilt when the staged master or usage data changes, checked at most
+    every refresh_seconds; queries keep using the old index until the new
+    one is ready.
+    """
+
+    def __init__(self, refresh_seconds=REFRESH_SECONDS, chunksize=None):
+        self.refresh_seconds = refresh_seconds
+        self.chunksize = chunksize
+        self._lock = threading.Lock()
+        self._index = None
+        self._signature = None
+        self._checked_at = 0.0
+        self.refresh()
+
+    def refresh(self, force=False):
+        """Rebuild the index if the staged inputs changed; True if it was rebuilt"""
+        with self._lock:
+            self._checked_at = time.monotonic()
+            signature = _inputs_signature()
+            if not force and signature == self._signature:
+                return False
+            started = time.perf_counter()
+            self._index = build_lookup_index(self.chunksize)
+            self._signature = signature
+            print(f"Lookup index built in {time.perf_counter() - started:.2f}s: "
+                  f"{len(self._index['master_msisdn'])} subscribers, {len(self._index['msisdn'])} subscriber-weeks")
+            return True
+
+    def _current(self):
+        if time.monotonic() - self._checked_at >= self.refresh_seconds and not self._lock.locked():
+            self.refresh()
+        return self._index
+
+    def subscriber(self, msisdn):
+        """Master record of one subscriber as a dict, or None"""
+        index = self._current()
+        key = msisdn_key(msisdn)
+        if key is None:
+            return None
+        position = np.searchsorted(index['master_msisdn'], key)
+        if position == len(index['master_msisdn']) or index['master_msisdn'][position] != key:
+            return None
+        return {
+            'msisdn': key,
+            'first_name': index['master_first_name'][position],
+            'last_name': index['master_last_name'][position],
+            'region': index['region_names'][index['master_region'][position]],
+            'sim_activation_date': str(index['master_sim_activation_date'][position]),
+            'source_system_name': index['master_source_system'][position],
+        }
+
+    def weekly_history(self, msisdn):
+        """Every week with usage for one subscriber, oldest first"""
+        index = self._current()
+        key = msisdn_key(msisdn)
+        if key is None:
+            return []
+        start, end = np.searchsorted(index['msisdn'], [key, key + 1])
+        return self._weekly_rows(index, slice(start, end))
+
+    def top_qualifiers(self, week_start, region=None, n=10):
+        """Highest revenue qualifying subscribers of a week, optionally in one master region"""
+        index = self._current()
+        week = _week_number(week_start)
+        if region is None:
+            order, (start, end) = index['top_by_week'], index['top_by_week_bounds'].get(week, (0, 0))
+        else:
+            if region not in index['region_codes']:
+                return []
+            bounds = index['top_by_region_bounds'].get((week, index['region_codes'][region]), (0, 0))
+            order, (start, end) = index['top_by_region'], bounds
+        return self._weekly_rows(index, order[start:min(end, start + n)])
+
+    def weeks(self):
+        """Week starts with any usage"""
+        return [str(_week_start(week)) for week in np.unique(self._current()['week'])]
+
+    def regions(self):
+        return list(self._current()['region_names'])
+
+    @staticmethod
+    def _weekly_rows(index, rows):
+        """Weekly rows as dicts; each column is sliced once rather than indexed per row"""
+        region_names = index['region_names']
+        columns = zip(
+            index['msisdn'][rows].tolist(), index['week'][rows].tolist(), index['revenue'][rows].tolist(),
+            index['events'][rows].tolist(), index['sms'][rows].tolist(), index['voice'][rows].tolist(),
+            index['region'][rows].tolist(),
+        )
+        return [{
+            'msisdn': msisdn,
+            'week_start': str(_week_start(week)),
+            'weekly_revenue': revenue,
+            'total_events': events,
+            'sms_events': sms,
+            'voice_events': voice,
+            'is_qualifying': int(revenue >= QUALIFYING_REVENUE),
+            'region': region_names[region] if region >= 0 else None,
+        } for msisdn, week, revenue, events, sms, voice, region in columns]
+
+
+def _make_handler(lookup):
+    class LookupHandler(BaseHTTPRequestHandler):
+        """GET /subscribers/<msisdn>, /weeks, /weeks/<YYYY-MM-DD>/top?region=...&n=10, /regions"""
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            parts = [part for part in url.path.split('/') if part]
+            query = parse_qs(url.query)
+            try:
+                if len(parts) == 2 and parts[0] == 'subscribers':
+                    if msisdn_key(parts[1]) is None:
+                        return self._send(400, {'error': f"not an MSISDN: {parts[1]}"})
+                    body = {'subscriber': lookup.subscriber(parts[1]), 'weekly_history': lookup.weekly_history(parts[1])}
+                elif parts == ['weeks']:
+                    body = lookup.weeks()
+                elif parts == ['regions']:
+                    body = lookup.regions()
+                elif len(parts) == 3 and parts[0] == 'weeks' and parts[2] == 'top':
+                    body = lookup.top_qualifiers(parts[1], region=query.get('region', [None])[0],
+                                                 n=int(query.get('n', ['10'])[0]))
+                else:
+                    return self._send(404, {'error': f"unknown path {url.path}"})
+            except ValueError as e:
+                return self._send(400, {'error': str(e)})
+            except Exception as e:
+                print(f"Error answering {self.path}: {e}")
+                import traceback
+                traceback.print_exc()
+                return self._send(500, {'error': str(e)})
+            self._send(200, body)
+
+        def _send(self, status, body):
+            payload = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return LookupHandler
+
+
+def serve(lookup, host='127.0.0.1', port=8050):
+    """Answer lookups as JSON over HTTP on a local port until interrupted"""
+    server = ThreadingHTTPServer((host, port), _make_handler(lookup))
+    print(f"Subscriber lookup service on http://{host}:{server.server_port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Look up subscribers and weekly qualifiers from an in-memory index")
+    parser.add_argument('--msisdn', help="print a subscriber's details and weekly history")
+    parser.add_argument('--week', help="week start (YYYY-MM-DD) for --top")
+    parser.add_argument('--region', help="limit --top to one master region")
+    parser.add_argument('--top', type=int, default=10, help="number of qualifiers to list for --week")
+    parser.add_argument('--serve', action='store_true', help="run the local HTTP endpoint")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8050)
+    args = parser.parse_args()
+
+    lookup = SubscriberLookup()
+    if args.msisdn:
+        print(json.dumps({'subscriber': lookup.subscriber(args.msisdn),
+                          'weekly_history': lookup.weekly_history(args.msisdn)}, indent=2))
+    if args.week:
+        print(json.dumps(lookup.top_qualifiers(args.week, region=args.region, n=args.top), indent=2))
+    if args.serve:
+        serve(lookup, host=args.host, port=args.port)
@@ -0,0 +1,236 @@
+# scripts/python/subscriber_master_store.py
+
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd # type: ignore
+
+from load_watermarks import file_sha256
+from source_registry import source_path
+from staging import read_staged, staging_available
+from subscriber_consolidation import (
+    SUBSCRIBER_COLUMNS, SUBSCRIBER_SOURCES, _flag_masters, _output_paths, consolidate_subscribers,
+    iter_subscriber_chunks, master_rank, select_masters
+)
+
+# Setup paths
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(script_dir))
+data_dir = os.path.join(project_root, 'data')
+processed_data_dir = os.path.join(data_dir, 'processed')
+store_dir = os.path.join(data_dir, 'master_store')
+
+STORE_RECORDS_PATH = os.path.join(store_dir, 'subscriber_records.parquet')
+STORE_META_PATH = os.path.join(store_dir, 'subscriber_records.meta.json')
+
+# Master changes of the last consolidation run, picked up by load_data_to_db --incremental
+CHANGE_LOG_PATH = os.path.join(processed_data_dir, 'subscriber_master_changes.csv')
+CHANGE_LOG_META_PATH = os.path.join(processed_data_dir, 'subscriber_master_changes.json')
+
+CHANGE_TYPES = ['insert', 'update', 'master_flip', 'delete']
+
+# Columns that make up a record's content (what a changed row is detected by)
+_CONTENT_COLUMNS = SUBSCRIBER_COLUMNS[:-1]
+
+
+def record_fingerprints(records):
+    """(content hash, occurrence) per record; exact duplicate rows get occurrence 0, 1, ..."""
+    fingerprint = pd.util.hash_pandas_object(records[_CONTENT_COLUMNS], index=False).to_numpy()
+    occurrence = pd.Series(fingerprint).groupby(fingerprint, sort=False).cumcount().to_numpy()
+    return fingerprint, occurrence
+
+
+def _record_ids(records):
+    return pd.MultiIndex.from_arrays([records['fingerprint'].to_numpy(), records['occurrence'].to_numpy()])
+
+
+def _with_fingerprints(records):
+    records = records.reset_index(drop=True)
+    records['fingerprint'], records['occurrence'] = record_fingerprints(records)
+    return records
+
+
+def _source_hashes():
+    return {name: file_sha256(source_path(name)) for name, _, _ in SUBSCRIBER_SOURCES}
+
+
+def load_store():
+    """(records, meta) of the persistent master store, or (None, None) when there is none yet"""
+    if not os.path.exists(STORE_RECORDS_PATH) or not os.path.exists(STORE_META_PATH):
+        return None, None
+    with open(STORE_META_PATH, 'r') as f:
+        meta = json.load(f)
+    return pd.read_parquet(STORE_RECORDS_PATH), meta
+
+
+def save_store(records, meta):
+    os.makedirs(store_dir, exist_ok=True)
+    records.to_parquet(STORE_RECORDS_PATH + '.tmp', index=False)
+    os.replace(STORE_RECORDS_PATH + '.tmp', STORE_RECORDS_PATH)
+    with open(STORE_META_PATH, 'w') as f:
+        json.dump(meta, f)
+
+
+def changed_keys(old_records, new_records):
+    """MSISDNs with a record added to or removed from one source's extract"""
+    old_ids, new_ids = _record_ids(old_records), _record_ids(new_records)
+    removed = old_records.loc[~old_ids.isin(new_ids), 'cell_phone_number']
+    added = new_records.loc[~new_ids.isin(old_ids), 'cell_phone_number']
+    return pd.concat([removed, added]).unique()
+
+
+def master_changes(old_masters, new_masters):
+    """Change log between two sets of master records (of the same MSISDNs), keyed on cell_phone_number.
+
+    insert: a new subscriber; delete: no record left; master_flip: the master
+    now comes from another source system; update: same source system,
+    changed details. Unchanged masters are left out.
+    """
+    old_masters = old_masters.set_index('cell_phone_number')
+    new_masters = new_masters.set_index('cell_phone_number')
+    columns = [col for col in _CONTENT_COLUMNS if col != 'cell_phone_number']
+
+    inserted = new_masters.index.difference(old_masters.index)
+    deleted = old_masters.index.difference(new_masters.index)
+    both = new_masters.index.intersection(old_masters.index)
+
+    old_both, new_both = old_masters.loc[both, columns], new_masters.loc[both, columns]
+    flipped = old_both['source_system_name'] != new_both['source_system_name']
+    # Missing values on both sides count as equal
+    same = ((old_both == new_both) | (old_both.isna() & new_both.isna())).fillna(False)
+    differs = ~same.all(axis=1).to_numpy()
+    flipped = flipped.to_numpy()
+
+    changes = pd.concat([
+        new_masters.loc[inserted].assign(change_type='insert', previous_source_system_name=None),
+        new_masters.loc[both[differs & ~flipped]].assign(change_type='update'),
+        new_masters.loc[both[flipped]].assign(change_type='master_flip'),
+        old_masters.loc[deleted].assign(change_type='delete', previous_source_system_name=None),
+    ])
+    changes.loc[both[differs], 'previous_source_system_name'] = old_both.loc[differs, 'source_system_name']
+    changes = changes.reset_index()
+    return changes[['change_type', 'cell_phone_number', 'previous_source_system_name'] + columns + ['is_master_record']]
+
+
+def write_change_log(changes, base_master_hash, master_hash):
+    """Save the change log with the master file hashes it goes from and to"""
+    changes.to_csv(CHANGE_LOG_PATH, index=False)
+    counts = changes['change_type'].value_counts()
+    meta = {
+        'base_master_hash': base_master_hash,
+        'master_hash': master_hash,
+        'counts': {change_type: int(counts.get(change_type, 0)) for change_type in CHANGE_TYPES},
+    }
+    with open(CHANGE_LOG_META_PATH, 'w') as f:
+        json.dump(meta, f)
+    return meta
+
+
+def read_change_log(base_master_hash, master_hash):
+    """The last change log if it leads from base_master_hash to master_hash, else None.
+
+    The loader only applies it on top of exactly the master file it loaded
+    last; otherwise it has to fall back to upserting every master.
+    """
+    if not os.path.exists(CHANGE_LOG_PATH) or not os.path.exists(CHANGE_LOG_META_PATH):
+        return None
+    with open(CHANGE_LOG_META_PATH, 'r') as f:
+        meta = json.load(f)
+    if meta['base_master_hash'] != base_master_hash or meta['master_hash'] != master_hash:
+        return None
+    return read_staged('subscriber_master_changes')
+
+
+def _write_outputs(records):
+    all_path, master_path = _output_paths()
+    base_master_hash = file_sha256(master_path) if os.path.exists(master_path) else None
+    final_combined_table = records[SUBSCRIBER_COLUMNS]
+    master_records_table = final_combined_table[final_combined_table['is_master_record']].copy()
+    final_combined_table.to_csv(all_path, index=False)
+    master_records_table.to_csv(master_path, index=False)
+    return final_combined_table, master_records_table, base_master_hash, file_sha256(master_path)
+
+
+def update_master_store(full=False):
+    """Apply new or changed operator records to the persistent master store.
+
+    Only sources whose file changed are re-read. Their records are diffed
+    against the store by content fingerprint, and masters are re-selected
+    only for the MSISDNs that gained or lost a record. Records keep the
+    order a full consolidation gives them (source, then file order), so ties
+    resolve the same way and the outputs match a full rebuild.
+
+    Writes combined_subscribers_all/master.csv and the change log of
+    inserts, updates, master flips and deletes; returns (all, masters, changes),
+    changes is None when nothing changed.
+    """
+    if not staging_available():
+        print("pyarrow is not installed, no master store; running a full consolidation")
+        all_subscribers, master_subscribers = consolidate_subscribers()
+        return all_subscribers, master_subscribers, None
+
+    records, meta = (None, None) if full else load_store()
+    source_hashes = _source_hashes()
+
+    if records is None:
+        print("Building the subscriber master store from all operator extracts...")
+        records = _with_fingerprints(_flag_masters(pd.concat(list(iter_subscriber_chunks()), ignore_index=True)))
+        old_masters = records.iloc[:0]
+        affected = records['cell_phone_number'].unique()
+    else:
+        changed = [name for name, _, _ in SUBSCRIBER_SOURCES if meta['sources'].get(name) != source_hashes[name]]
+        if not changed:
+            # The outputs and the last change log stay as they are
+            print("Operator extracts unchanged since the last consolidation, master store is current")
+            all_subscribers = records[SUBSCRIBER_COLUMNS]
+            return all_subscribers, all_subscribers[all_subscribers['is_master_record']].copy(), None
+        fresh = dict(zip(changed, iter_subscriber_chunks(sources=changed)))
+        affected = []
+        blocks = []
+        for name, source_system, _ in SUBSCRIBER_SOURCES:
+            stored = records[records['source_system_name'] == source_system]
+            if name not in changed:
+                blocks.append(stored)
+                continue
+            source_records = _with_fingerprints(fresh[name])
+            keys = changed_keys(stored, source_records)
+            print(f"{source_system}: {len(keys)} subscribers with new, changed or removed records")
+            affected.append(keys)
+            # Records that were already stored keep their master flag
+            stored_flags = pd.Series(stored['is_master_record'].to_numpy(), index=_record_ids(stored))
+            source_records['is_master_record'] = stored_flags.reindex(_record_ids(source_records), fill_value=False).to_numpy()
+            blocks.append(source_records)
+        affected = pd.Series(np.concatenate(affected) if affected else [], dtype='Int64').unique()
+
+        old_masters = records[records['is_master_record'] & records['cell_phone_number'].isin(affected)]
+        records = pd.concat(blocks, ignore_index=True)
+
+        # Re-select masters only among the affected subscribers' records
+        is_affected = records['cell_phone_number'].isin(affected).to_numpy()
+        subset = records[is_affected]
+        ranks = master_rank(subset['source_priority'], subset['sim_activation_date'])
+        is_master = np.zeros(len(subset), dtype=bool)
+        is_master[select_masters(subset['cell_phone_number'], ranks)] = True
+        records.loc[is_affected, 'is_master_record'] = is_master
+
+    new_masters = records[records['is_master_record'] & records['cell_phone_number'].isin(affected)]
+    changes = master_changes(old_masters[SUBSCRIBER_COLUMNS], new_masters[SUBSCRIBER_COLUMNS])
+
+    save_store(records, {'sources': source_hashes})
+    all_subscribers, master_subscribers, base_master_hash, master_hash = _write_outputs(records)
+    change_meta = write_change_log(changes, base_master_hash, master_hash)
+
+    print(f"Master store: {len(records)} records, {len(master_subscribers)} master subscribers")
+    print("Master changes: " + ", ".join(f"{count} {change_type}" for change_type, count in change_meta['counts'].items()))
+    print(f"Change log saved to: {CHANGE_LOG_PATH}")
+    return all_subscribers, master_subscribers, changes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incrementally maintain the subscriber master store and its change log")
+    parser.add_argument('--full', action='store_true', help="rebuild the store from all operator extracts")
+    args = parser.parse_args()
+
+    update_master_store(full=args.full)
@@ -0,0 +1,332 @@
+# scripts/python/subscriber_sketches.py
+
+import argparse
+import zlib
+
+import numpy as np
+import pandas as pd # type: ignore
+
+from db_backends import BACKENDS, connect, describe, get_connection_string, is_embedded, resolve_backend
+from instrumentation import span
+from region_dimension import REGION_TABLE
+from subscriber_week_fact import FACT_TABLE
+from weekly_qualification_report import QUALIFYING_REVENUE
+
+# Distinct subscribers can't be summed across weeks or regions (one subscriber
+# is active in many), so next to subscriber_week_fact the loader keeps one
+# HyperLogLog sketch of the active and one of the qualifying subscribers per
+# week and region. Sketches merge by taking register maxima: a month, quarter
+# or all-region distinct count is a merge of stored sketches, no usage rows
+# are read. Qualifying is the campaign rule of weekly_qualification_report:
+# the subscriber's revenue of the week across all regions reached
+# QUALIFYING_REVENUE. A qualifier is in the qualifying sketch of every region
+# they were active in that week, so merging all regions counts each one once.
+# Per region this is campaign_qualifiers_active, not the qualifying_subscribers
+# of regional_analysis.sql, which only counts revenue earned in the region.
+SKETCH_TABLE = 'subscriber_week_sketch'
+
+# Bump when what the sketches hold changes; incremental loads rebuild older ones
+SKETCH_VERSION = 3
+SKETCH_MARKER = f"vmobile sketches v{SKETCH_VERSION}"
+
+# 2**12 registers: about 1.6% standard error, 4 KiB per sketch before compression
+HLL_PRECISION = 12
+
+SKETCH_COLUMNS = [
+    'week_start', 'region_id', 'subscribers', 'campaign_qualifiers_active', 'active_sketch', 'qualifying_sketch',
+]
+
+# subscribers / campaign_qualifiers_active are the exact counts of the (week, region) itself
+# (campaign_qualifiers_active: campaign qualifiers of the week active in the region)
+SKETCH_DDL = f"""
+    CREATE TABLE IF NOT EXISTS {SKETCH_TABLE} (
+        week_start DATE NOT NULL,
+        region_id SMALLINT NOT NULL,
+        subscribers INTEGER NOT NULL,
+        campaign_qualifiers_active INTEGER NOT NULL,
+        active_sketch {{blob}} NOT NULL,
+        qualifying_sketch {{blob}} NOT NULL
+    );
+"""
+
+# Subscriber revenue per week and region, with the subscriber's total of the
+# week across all regions; the input of the sketches and of exact counts
+FACT_ROLLUP = f"""
+    SELECT week_start, region_id, msisdn, SUM(revenue) AS revenue,
+           SUM(SUM(revenue)) OVER (PARTITION BY week_start, msisdn) AS week_revenue
+    FROM {FACT_TABLE}
+    {{where}}
+    GROUP BY week_start, region_id, msisdn
+"""
+
+PERIODS = ['week', 'month', 'quarter', 'all']
+
+
+def _hash64(msisdns):
+    """splitmix64 finalizer: well mixed 64-bit hashes of int64 MSISDNs (uint64 arithmetic wraps)"""
+    z = np.asarray(msisdns, dtype='int64').astype('uint64') + np.uint64(0x9E3779B97F4A7C15)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+def _bit_length(values):
+    length = np.zeros(len(values), dtype='uint8')
+    values = values.copy()
+    for shift in (32, 16, 8, 4, 2, 1):
+        big = values >= (np.uint64(1) << np.uint64(shift))
+        length[big] += shift
+        values[big] >>= np.uint64(shift)
+    return length + (values > 0)
+
+
+def register_updates(msisdns, precision=HLL_PRECISION):
+    """(register index, rank) of each MSISDN: the hash's top bits pick the register, the rest its rank"""
+    hashes = _hash64(msisdns)
+    width = 64 - precision
+    index = (hashes >> np.uint64(width)).astype('int64')
+    rest = hashes & np.uint64((1 << width) - 1)
+    # Position of the first 1 bit in the remaining bits (width + 1 when they are all 0)
+    rank = (width + 1 - _bit_length(rest)).astype('uint8')
+    return index, rank
+
+
+class HyperLogLog:
+    """HyperLogLog distinct counter of MSISDNs (Flajolet et al. 2007, linear counting for small counts)"""
+
+    def __init__(self, precision=HLL_PRECISION, registers=None):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype='uint8') if registers is None else registers
+
+    def add(self, msisdns):
+        index, rank = register_updates(msisdns, self.precision)
+        np.maximum.at(self.registers, index, rank)
+        return self
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError(f"Can't merge sketches of precision {self.precision} and {other.precision}")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype('int64')))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * np.log(m / zeros)
+        return float(estimate)
+
+    def to_bytes(self):
+        return zlib.compress(self.registers.tobytes())
+
+    @classmethod
+    def from_bytes(cls, data, precision=HLL_PRECISION):
+        registers = np.frombuffer(zlib.decompress(bytes(data)), dtype='uint8').copy()
+        if len(registers) != 1 << precision:
+            raise ValueError(f"Sketch has {len(registers)} registers, expected {1 << precision}")
+        return cls(precision, registers)
+
+
+def build_week_sketches(revenue, precision=HLL_PRECISION):
+    """One SKETCH_TABLE row per (week_start, region_id) of a FACT_ROLLUP frame"""
+    if revenue.empty:
+        return pd.DataFrame(columns=SKETCH_COLUMNS)
+    groups = revenue.groupby(['week_start', 'region_id'], sort=True).ngroup().to_numpy()
+    keys = revenue[['week_start', 'region_id']].drop_duplicates().sort_values(['week_start', 'region_id'])
+    qualifying = revenue['week_revenue'].to_numpy(dtype='float64') >= QUALIFYING_REVENUE
+
+    # Every group's registers as one row of a matrix, filled in one pass
+    index, rank = register_updates(revenue['msisdn'], precision)
+    active = np.zeros((len(keys), 1 << precision), dtype='uint8')
+    np.maximum.at(active, (groups, index), rank)
+    qualified = np.zeros_like(active)
+    np.maximum.at(qualified, (groups[qualifying], index[qualifying]), rank[qualifying])
+
+    return pd.DataFrame({
+        'week_start': keys['week_start'].to_numpy(),
+        'region_id': keys['region_id'].to_numpy(dtype='int64'),
+        'subscribers': np.bincount(groups, minlength=len(keys)),
+        'campaign_qualifiers_active': np.bincount(groups[qualifying], minlength=len(keys)),
+        'active_sketch': [zlib.compress(row.tobytes()) for row in active],
+        'qualifying_sketch': [zlib.compress(row.tobytes()) for row in qualified],
+    })
+
+
+def _query(conn, sql):
+    """Result of a query as a DataFrame, on a SQLAlchemy (PostgreSQL) or an embedded DBAPI connection"""
+    if hasattr(conn, 'exec_driver_sql'):
+        result = conn.exec_driver_sql(sql)
+        return pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+    cursor = conn.execute(sql)
+    return pd.DataFrame(cursor.fetchall(), columns=[column[0] for column in cursor.description])
+
+
+def _week_filter(week_starts):
+    if week_starts is None:
+        return ''
+    return f"WHERE week_start IN ({', '.join(repr(str(week)) for week in sorted(week_starts))})"
+
+
+def read_subscriber_revenue(conn, week_starts=None):
+    """FACT_ROLLUP (optionally of some weeks only), with week_start as ISO date text on every backend"""
+    revenue = _query(conn, FACT_ROLLUP.format(where=_week_filter(week_starts)))
+    revenue['week_start'] = pd.to_datetime(revenue['week_start']).dt.strftime('%Y-%m-%d')
+    revenue['revenue'] = revenue['revenue'].astype('float64')
+    revenue['week_revenue'] = revenue['week_revenue'].astype('float64')
+    return revenue
+
+
+def rebuild_sketches(conn, backend, week_starts=None):
+    """(Re)build the sketches of all weeks, or only of week_starts, from subscriber_week_fact; returns the row count"""
+    embedded = is_embedded(backend)
+    ddl = SKETCH_DDL.format(blob='BLOB' if embedded else 'BYTEA')
+    with span('aggregate', SKETCH_TABLE) as step:
+        if week_starts is not None and not week_starts:
+            return 0
+        if not embedded and week_starts is not None and not sketches_are_current(conn):
+            # Sketches of an older SKETCH_VERSION can't be patched week by week
+            week_starts = None
+        # A full rebuild recreates the table, so its columns match this SKETCH_VERSION
+        statements = [ddl] if week_starts is not None else [f"DROP TABLE IF EXISTS {SKETCH_TABLE}", ddl]
+        for statement in statements:
+            if embedded:
+                conn.execute(statement)
+            else:
+                conn.exec_driver_sql(statement)
+        delete = f"DELETE FROM {SKETCH_TABLE} {_week_filter(week_starts)}"
+        revenue = read_subscriber_revenue(conn, week_starts)
+        sketches = build_week_sketches(revenue)
+        rows = list(sketches[SKETCH_COLUMNS].itertuples(index=False, name=None))
+        rows = [(week, int(region), int(active), int(qualifying), active_sketch, qualifying_sketch)
+                for week, region, active, qualifying, active_sketch, qualifying_sketch in rows]
+        marks = ', '.join(['?' if embedded else '%s'] * len(SKETCH_COLUMNS))
+        insert = f"INSERT INTO {SKETCH_TABLE} ({', '.join(SKETCH_COLUMNS)}) VALUES ({marks})"
+        if embedded:
+            conn.execute(delete)
+            if rows:
+                conn.executemany(insert, rows)
+        else:
+            conn.exec_driver_sql(delete)
+            if rows:
+                conn.exec_driver_sql(insert, rows)
+            if week_starts is None:
+                conn.exec_driver_sql(f"COMMENT ON TABLE {SKETCH_TABLE} IS '{SKETCH_MARKER}'")
+        step.count(rows_in=len(revenue), rows_out=len(rows))
+    return len(rows)
+
+
+def sketches_are_current(conn):
+    """True when the PostgreSQL sketch table exists and was fully built by this SKETCH_VERSION"""
+    marker = conn.exec_driver_sql(f"SELECT obj_description(to_regclass('{SKETCH_TABLE}'), 'pg_class')").scalar()
+    return marker == SKETCH_MARKER
+
+
+def read_sketches(conn):
+    sketches = _query(conn, f"SELECT {', '.join(SKETCH_COLUMNS)} FROM {SKETCH_TABLE}")
+    sketches['week_start'] = pd.to_datetime(sketches['week_start'])
+    return sketches
+
+
+def period_of(week_starts, period):
+    """Label of the period each week (by its Monday) falls in"""
+    week_starts = pd.to_datetime(week_starts)
+    if period == 'week':
+        return week_starts.dt.strftime('%Y-%m-%d')
+    if period == 'month':
+        return week_starts.dt.strftime('%Y-%m')
+    if period == 'quarter':
+        return week_starts.dt.year.astype(str) + '-Q' + week_starts.dt.quarter.astype(str)
+    if period == 'all':
+        return pd.Series('all', index=week_starts.index)
+    raise ValueError(f"Unknown period {period!r}, expected one of {PERIODS}")
+
+
+def _merged_count(blobs):
+    merged = HyperLogLog()
+    for blob in blobs:
+        merged.merge(HyperLogLog.from_bytes(blob))
+    return round(merged.count())
+
+
+def distinct_subscribers(sketches, period='month', by_region=False):
+    """Estimated distinct active and qualifying subscribers per period (and region), merged from the sketches"""
+    keys = ['period', 'region_id'] if by_region else ['period']
+    sketches = sketches.assign(period=period_of(sketches['week_start'], period))
+    rows = []
+    for key, group in sketches.groupby(keys, sort=True):
+        key = key if isinstance(key, tuple) else (key,)
+        rows.append(dict(zip(keys, key),
+                         active_subscribers=_merged_count(group['active_sketch']),
+                         campaign_qualifiers_active=_merged_count(group['qualifying_sketch'])))
+    return pd.DataFrame(rows, columns=keys + ['active_subscribers', 'campaign_qualifiers_active'])
+
+
+def exact_distinct_subscribers(revenue, period='month', by_region=False):
+    """The same counts exactly, from a FACT_ROLLUP frame (for validating the sketches)"""
+    keys = ['period', 'region_id'] if by_region else ['period']
+    revenue = revenue.assign(period=period_of(revenue['week_start'], period))
+    qualifying = revenue[revenue['week_revenue'] >= QUALIFYING_REVENUE]
+    return pd.concat([
+        revenue.groupby(keys)['msisdn'].nunique().rename('active_subscribers'),
+        qualifying.groupby(keys)['msisdn'].nunique().rename('campaign_qualifiers_active'),
+    ], axis=1).fillna(0).astype('int64').reset_index()
+
+
+def _with_region_names(counts, conn):
+    regions = _query(conn, f"SELECT region_id, region_name FROM {REGION_TABLE}")
+    counts = counts.merge(regions, on='region_id', how='left').rename(columns={'region_name': 'region'})
+    return counts[['period', 'region'] + [col for col in counts.columns if col not in ('period', 'region', 'region_id')]]
+
+
+def report_distinct_subscribers(period='month', by_region=False, exact=False, backend=None, database=None):
+    """Distinct subscribers per period from the stored sketches; exact adds exact counts and the relative error"""
+    backend = resolve_backend(backend)
+    if is_embedded(backend):
+        conn = connect(backend, database, read_only=True)
+        close = conn.close
+    else:
+        from sqlalchemy import create_engine # type: ignore
+        engine = create_engine(get_connection_string())
+        conn = engine.connect()
+        close = lambda: (conn.close(), engine.dispose())
+    try:
+        print(f"Merging {SKETCH_TABLE} per {period}{' and region' if by_region else ''} ({describe(backend, database)})")
+        with span('aggregate', f"{SKETCH_TABLE} per {period}"):
+            counts = distinct_subscribers(read_sketches(conn), period, by_region)
+        if exact:
+            keys = ['period', 'region_id'] if by_region else ['period']
+            with span('aggregate', f"{FACT_TABLE} per {period}"):
+                exact_counts = exact_distinct_subscribers(read_subscriber_revenue(conn), period, by_region)
+            counts = counts.merge(exact_counts, on=keys, how='outer', suffixes=('', '_exact')).fillna(0)
+            for col in ('active_subscribers', 'campaign_qualifiers_active'):
+                counts[f"{col}_error_pct"] = (
+                    (counts[col] - counts[f"{col}_exact"]) * 100.0 / counts[f"{col}_exact"].where(counts[f"{col}_exact"] > 0)
+                ).round(2)
+        if by_region:
+            counts = _with_region_names(counts, conn)
+    finally:
+        close()
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Distinct active / qualifying subscribers per period, merged from the weekly sketches")
+    parser.add_argument('--period', choices=PERIODS, default='month')
+    parser.add_argument('--by-region', action='store_true', help="one row per period and region instead of all regions")
+    parser.add_argument('--exact', action='store_true',
+                        help="also count exactly from subscriber_week_fact and show the sketches' error")
+    parser.add_argument('--backend', choices=list(BACKENDS),
+                        help="analysis database (default: DB_BACKEND in scripts/config/database_config.py)")
+    parser.add_argument('--output', help="also write the counts to this CSV")
+    args = parser.parse_args()
+
+    counts = report_distinct_subscribers(args.period, args.by_region, args.exact, args.backend)
+    print(counts.to_string(index=False))
+    print(f"campaign_qualifiers_active: subscribers whose revenue of the week across all regions reached "
+          f"R{QUALIFYING_REVENUE}, counted in each region they were active in (regional_analysis's "
+          f"qualifying_subscribers only counts revenue earned in the region)")
+    if args.output:
+        counts.to_csv(args.output, index=False)
+        print(f"Saved {len(counts)} rows to {args.output}")
@@ -0,0 +1,73 @@
+# scripts/python/timestamps.py
+
+import re
+
+import pandas as pd # type: ignore
+
+# Timestamp layouts seen in the CDR files, e.g. '18 07 2025 10:53' (week 1)
+# and '2025/07/24 17:31' (week 2)
+CDR_TIMESTAMP_FORMATS = ['%d %m %Y %H:%M', '%Y/%m/%d %H:%M', '%Y%m%d %H:%M', '%d/%m/%Y %H:%M']
+
+# Rows looked at to decide a source's format
+SAMPLE_ROWS = 1000
+
+_FIELD_SHAPES = {
+    '%Y': r'\d{4}', '%m': r'\d{1,2}', '%d': r'\d{1,2}',
+    '%H': r'\d{1,2}', '%M': r'\d{1,2}', '%S': r'\d{1,2}',
+}
+
+
+def format_shape(fmt):
+    """Regex a value has to match to be parsed with fmt, e.g. '%Y/%m/%d' -> \\d{4}/\\d{1,2}/\\d{1,2}"""
+    parts = re.split(r'(%[A-Za-z])', fmt)
+    return ''.join(_FIELD_SHAPES[part] if part in _FIELD_SHAPES else re.escape(part) for part in parts)
+
+
+def _as_text(values):
+    if not pd.api.types.is_string_dtype(values.dtype):
+        values = values.astype('object').where(values.isna(), values.astype(str))
+    return values.str.strip()
+
+
+def detect_timestamp_format(values, formats=CDR_TIMESTAMP_FORMATS, sample_rows=SAMPLE_ROWS):
+    """The one format whose shape every sampled value has, or None if the sample is mixed"""
+    sample = _as_text(values.dropna().head(sample_rows))
+    if sample.empty:
+        return None
+    for fmt in formats:
+        if sample.str.fullmatch(format_shape(fmt)).all():
+            return fmt
+    return None
+
+
+def parse_timestamps(values, formats=CDR_TIMESTAMP_FORMATS, date_format=None):
+    """Parse timestamps with exact formats only; returns (datetime Series, rejected rows).
+
+    With date_format (e.g. detected once per file) the whole column is parsed
+    with it. Rows it does not fit, or every row when no format is given, are
+    matched per row against the shape of each format in `formats` and each
+    group is parsed with its own exact format. Values that fit no shape, or
+    fit one but are not a real date, become NaT and are counted as rejected.
+    There is no fallback to pandas' format inference.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values.dtype):
+        return values, 0
+
+    text = _as_text(values)
+    parsed = pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns]')
+
+    if date_format is not None:
+        parsed = pd.to_datetime(text, format=date_format, errors='coerce')
+    pending = parsed.isna() & text.notna()
+
+    for fmt in formats:
+        if not pending.any():
+            break
+        if fmt == date_format:
+            continue
+        fits = pending & text.str.fullmatch(format_shape(fmt), na=False)
+        if fits.any():
+            parsed[fits] = pd.to_datetime(text[fits], format=fmt, errors='coerce')
+            pending &= parsed.isna()
+
+    return parsed, int(pending.sum())
@@ -0,0 +1,282 @@
+# scripts/python/usage_archive.py
+
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd # type: ignore
+
+from load_watermarks import file_sha256
+from staging import USAGE_DATASETS, iter_staged_chunks, source_path
+from normalization import normalize_msisdn_key
+from usage_event_store import EVENT_COLUMNS, compact_chunk, events_to_usage_frame
+from usage_ingestion import DEFAULT_CHUNKSIZE
+
+# Setup paths
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(script_dir))
+data_dir = os.path.join(project_root, 'data')
+archive_dir = os.path.join(data_dir, 'usage_archive')
+
+EVENTS_PATH = os.path.join(archive_dir, 'events.bin')
+BLOCKS_PATH = os.path.join(archive_dir, 'blocks.bin')
+INDEX_PATH = os.path.join(archive_dir, 'index.json')
+
+# Bump when the record layout changes; an archive of another version is rebuilt
+ARCHIVE_VERSION = 1
+
+# One fixed-size little-endian record per event: the usage_event_store columns
+# plus the archived source it came from
+ARCHIVE_DTYPE = np.dtype(
+    [(col, '<' + np.dtype(dtype).str[1:]) for col, dtype in EVENT_COLUMNS.items()] + [('source_id', '<i1')]
+)
+# First event of each MSISDN within a week segment
+BLOCK_DTYPE = np.dtype([('msisdn', '<i8'), ('start', '<i8')])
+
+NAT = np.iinfo('int64').min
+NS_PER_DAY = 86_400 * 10 ** 9
+# Week key of the segment holding events without a timestamp
+UNDATED = 'undated'
+
+# Where the report and the loader can read usage records from: the typed
+# staging copies, the compact event store (usage_event_store) or this archive
+USAGE_SOURCES = ['staging', 'event_store', 'archive']
+
+
+def _empty_index():
+    return {'version': ARCHIVE_VERSION, 'units': [], 'sources': {}, 'event_rows': 0, 'block_rows': 0, 'weeks': {}}
+
+
+def load_index():
+    """The archive index, or an empty one when there is no (current) archive yet.
+
+    weeks maps a week start ('YYYY-MM-DD', or 'undated') to its live segment:
+    offset/count into events.bin, block_offset/block_count into blocks.bin
+    and the source ids it holds. event_rows/block_rows are the committed file
+    lengths; anything past them is an unfinished append.
+    """
+    if not os.path.exists(INDEX_PATH):
+        return _empty_index()
+    with open(INDEX_PATH, 'r') as f:
+        index = json.load(f)
+    return index if index.get('version') == ARCHIVE_VERSION else _empty_index()
+
+
+def _save_index(index):
+    with open(INDEX_PATH + '.tmp', 'w') as f:
+        json.dump(index, f, indent=1)
+    os.replace(INDEX_PATH + '.tmp', INDEX_PATH)
+
+
+def _append_rows(path, rows, committed):
+    """Append records after the committed ones (dropping any unfinished tail), returns the offset"""
+    with open(path, 'ab') as f:
+        f.truncate(committed * rows.dtype.itemsize)
+        f.seek(committed * rows.dtype.itemsize)
+        f.write(rows.tobytes())
+    return committed
+
+
+def week_key(day):
+    """'YYYY-MM-DD' of the Monday starting the week of a date, Timestamp or 'YYYY-MM-DD'"""
+    day = pd.Timestamp(day).normalize()
+    return (day - pd.Timedelta(days=day.weekday())).date().isoformat()
+
+
+def week_keys(event_time):
+    """Week key per event (int64 ns times); 'undated' for NaT"""
+    dated = event_time != NAT
+    # Day 4 of the epoch (1970-01-05) is the first Monday
+    numbers, codes = np.unique((event_time[dated] // NS_PER_DAY - 4) // 7, return_inverse=True)
+    labels = np.full(len(event_time), UNDATED, dtype=object)
+    labels[dated] = np.array([str(np.datetime64(int(week) * 7 + 4, 'D')) for week in numbers], dtype=object)[codes]
+    return labels
+
+
+def _source_events(name, source_id, units, chunksize):
+    parts = []
+    for chunk in iter_staged_chunks(name, chunksize):
+        columns = compact_chunk(chunk, units)
+        records = np.empty(len(chunk), dtype=ARCHIVE_DTYPE)
+        for col, values in columns.items():
+            records[col] = values
+        records['source_id'] = source_id
+        parts.append(records)
+    return np.concatenate(parts) if parts else np.empty(0, dtype=ARCHIVE_DTYPE)
+
+
+def _sorted_segment(records):
+    """Events of one week ordered by MSISDN, then time, and the MSISDN block boundaries"""
+    records = records[np.lexsort((records['event_time'], records['msisdn']))]
+    keys, starts = np.unique(records['msisdn'], return_index=True)
+    blocks = np.empty(len(keys), dtype=BLOCK_DTYPE)
+    blocks['msisdn'] = keys
+    blocks['start'] = starts
+    return records, blocks
+
+
+def append_usage(names=USAGE_DATASETS, chunksize=DEFAULT_CHUNKSIZE, rebuild=False):
+    """Archive new or changed usage sources; returns the number of week segments written.
+
+    Events are only ever appended. Every week a source has events in gets a
+    new segment: the events already archived for that week (minus those of a
+    replaced source) merged with the new ones and sorted by MSISDN. The index
+    then points at the new segment, the old one is left as dead space until
+    the next rebuild. rebuild=True starts a fresh archive from all sources.
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    index = _empty_index() if rebuild else load_index()
+    if rebuild or index['event_rows'] == 0:
+        for path in (EVENTS_PATH, BLOCKS_PATH):
+            if os.path.exists(path):
+                os.remove(path)
+
+    hashes = {name: file_sha256(source_path(name)) for name in names if os.path.exists(source_path(name))}
+    changed = [name for name in hashes if index['sources'].get(name, {}).get('sha256') != hashes[name]]
+    if not changed:
+        print("Usage archive is up to date")
+        return 0
+
+    # Source ids are stable: a replaced source keeps its id
+    for name in changed:
+        if name not in index['sources']:
+            index['sources'][name] = {'id': len(index['sources'])}
+    replaced_ids = [index['sources'][name]['id'] for name in changed]
+
+    new_events = np.concatenate([
+        _source_events(name, index['sources'][name]['id'], index['units'], chunksize) for name in changed
+    ])
+    new_weeks = week_keys(new_events['event_time'])
+    affected = set(new_weeks) | {
+        week for week, segment in index['weeks'].items() if set(segment['sources']) & set(replaced_ids)
+    }
+
+    events = _open_events(index)
+    for week in sorted(affected):
+        kept = np.empty(0, dtype=ARCHIVE_DTYPE)
+        if week in index['weeks']:
+            segment = index['weeks'][week]
+            old = events[segment['offset']:segment['offset'] + segment['count']]
+            kept = np.asarray(old[~np.isin(old['source_id'], replaced_ids)])
+        records, blocks = _sorted_segment(np.concatenate([kept, new_events[new_weeks == week]]))
+        if len(records) == 0:
+            del index['weeks'][week]
+            continue
+        offset = _append_rows(EVENTS_PATH, records, index['event_rows'])
+        blocks['start'] += offset
+        block_offset = _append_rows(BLOCKS_PATH, blocks, index['block_rows'])
+        index['event_rows'] += len(records)
+        index['block_rows'] += len(blocks)
+        index['weeks'][week] = {
+            'offset': offset, 'count': len(records),
+            'block_offset': block_offset, 'block_count': len(blocks),
+            'sources': sorted(int(source_id) for source_id in np.unique(records['source_id'])),
+        }
+        print(f"Archived week {week}: {len(records)} events, {len(blocks)} subscribers")
+
+    for name in changed:
+        index['sources'][name]['sha256'] = hashes[name]
+    index['weeks'] = dict(sorted(index['weeks'].items()))
+    _save_index(index)
+
+    live = sum(segment['count'] for segment in index['weeks'].values())
+    print(f"Usage archive: {live} live events in {len(index['weeks'])} weeks, "
+          f"{index['event_rows'] - live} dead (reclaimed by --rebuild)")
+    return len(affected)
+
+
+def _open_events(index):
+    if index['event_rows'] == 0:
+        return np.empty(0, dtype=ARCHIVE_DTYPE)
+    return np.memmap(EVENTS_PATH, dtype=ARCHIVE_DTYPE, mode='r', shape=(index['event_rows'],))
+
+
+class UsageArchive:
+    """Read-only, memory-mapped view of the usage archive.
+
+    week_events / msisdn_events return slices of the mapped file (no copy,
+    no parsing); the frame methods turn them into usage record DataFrames.
+    """
+
+    def __init__(self):
+        self.index = load_index()
+        self.units = self.index['units']
+        self.events = _open_events(self.index)
+        self.blocks = (np.memmap(BLOCKS_PATH, dtype=BLOCK_DTYPE, mode='r', shape=(self.index['block_rows'],))
+                       if self.index['block_rows'] else np.empty(0, dtype=BLOCK_DTYPE))
+
+    def weeks(self):
+        """Archived week starts, oldest first (without the undated segment)"""
+        return [week for week in self.index['weeks'] if week != UNDATED]
+
+    def week_events(self, week_start):
+        """All events of the week (any day of it, or 'undated'), sorted by MSISDN"""
+        week = week_start if week_start == UNDATED else week_key(week_start)
+        segment = self.index['weeks'].get(week)
+        if segment is None:
+            return self.events[:0]
+        return self.events[segment['offset']:segment['offset'] + segment['count']]
+
+    def msisdn_events(self, msisdn):
+        """[(week start, events)] of one subscriber, oldest week first; one block lookup per week"""
+        key = normalize_msisdn_key(pd.Series([str(msisdn)]))[0]
+        if pd.isna(key):
+            return []
+        found = []
+        for week, segment in self.index['weeks'].items():
+            blocks = self.blocks[segment['block_offset']:segment['block_offset'] + segment['block_count']]
+            position = np.searchsorted(blocks['msisdn'], key)
+            if position == len(blocks) or blocks['msisdn'][position] != key:
+                continue
+            end = blocks['start'][position + 1] if position + 1 < len(blocks) else segment['offset'] + segment['count']
+            found.append((week, self.events[blocks['start'][position]:end]))
+        return found
+
+    def latest_event_time(self):
+        weeks = self.weeks()
+        if not weeks:
+            return pd.NaT
+        return pd.Timestamp(int(self.week_events(weeks[-1])['event_time'].max()))
+
+    def to_frame(self, events):
+        """Usage records (usual column names, compact dtypes) for archived events"""
+        events = np.asarray(events)
+        return events_to_usage_frame({col: events[col] for col in EVENT_COLUMNS}, self.units)
+
+    def usage_frame(self, weeks=None):
+        """Usage records of the given weeks (default: all, including undated events)"""
+        weeks = list(self.index['weeks']) if weeks is None else weeks
+        return self.to_frame(np.concatenate([self.week_events(week) for week in weeks] or [self.events[:0]]))
+
+    def recent_frame(self, days=7):
+        """Usage records of the weeks overlapping the last `days` days before the latest event"""
+        latest = self.latest_event_time()
+        if pd.isna(latest):
+            return self.usage_frame([])
+        first = week_key(latest - pd.Timedelta(days=days - 1))
+        return self.usage_frame([week for week in self.weeks() if week >= first])
+
+
+def open_archive(chunksize=DEFAULT_CHUNKSIZE):
+    """UsageArchive over the current sources, appending any new or changed ones first"""
+    append_usage(chunksize=chunksize)
+    return UsageArchive()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Append usage events to the memory-mapped week/MSISDN archive")
+    parser.add_argument('--rebuild', action='store_true', help="rewrite the archive from all sources (drops dead segments)")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument('--week', metavar='YYYY-MM-DD', help="print the events of this week")
+    parser.add_argument('--msisdn', help="print the events of this subscriber across weeks")
+    args = parser.parse_args()
+
+    append_usage(chunksize=args.chunksize, rebuild=args.rebuild)
+    archive = UsageArchive()
+    if args.week:
+        print(archive.to_frame(archive.week_events(args.week)).to_string(index=False))
+    if args.msisdn:
+        for week, events in archive.msisdn_events(args.msisdn):
+            print(f"\nWeek {week}: {len(events)} events")
+            print(archive.to_frame(events).to_string(index=False))
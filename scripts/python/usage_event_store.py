@@ -0,0 +1,227 @@
+# scripts/python/usage_event_store.py
+
+import argparse
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd # type: ignore
+
+from source_registry import source_path
+from staging import USAGE_DATASETS, iter_staged_chunks, read_staged
+from usage_ingestion import DEFAULT_CHUNKSIZE, iter_usage_chunks
+
+# Setup paths
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(os.path.dirname(script_dir))
+data_dir = os.path.join(project_root, 'data')
+event_store_dir = os.path.join(data_dir, 'event_store')
+
+# Bump when the layout below changes so stored events are rebuilt
+EVENT_STORE_VERSION = 1
+
+# One .npy file per column, memory-mapped when read. Missing values:
+# msisdn 0, ids -1, units -1 (code into the unit dictionary), event_time NaT
+# (int64 min, so it views straight as datetime64[ns]), quantities NaN.
+# Quantities are whole seconds/MBs/SMSs, exact in float32 up to 2**24.
+# Revenue is kept as int32 cents, which is exact where float32 is not.
+EVENT_COLUMNS = {
+    'msisdn': 'int64',
+    'event_time': 'int64',
+    'city_id': 'int16',
+    'type_id': 'int16',
+    'tracking_quantity': 'float32',
+    'tracking_unit': 'int8',
+    'billing_quantity': 'float32',
+    'billing_unit': 'int8',
+    'revenue_cents': 'int32',
+}
+
+# Usage record column each event column is made from
+USAGE_COLUMN_OF = {
+    'msisdn': 'msisdn',
+    'event_time': 'usage_event_date_time',
+    'city_id': 'usage_event_city_id',
+    'type_id': 'usage_event_type_id',
+    'tracking_quantity': 'usage_event_tracking_quantity',
+    'tracking_unit': 'usage_event_tracking_unit',
+    'billing_quantity': 'usage_event_billing_quantity',
+    'billing_unit': 'usage_event_billing_unit',
+    'revenue_cents': 'usage_event_revenue',
+}
+
+def store_path(name):
+    return os.path.join(event_store_dir, name)
+
+
+def _meta_path(name):
+    return os.path.join(store_path(name), 'meta.json')
+
+
+def _source_signature(name):
+    stat = os.stat(source_path(name))
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'version': EVENT_STORE_VERSION}
+
+
+def is_current(name):
+    """Stored events are valid while the source keeps the same size and mtime"""
+    if not os.path.exists(_meta_path(name)):
+        return False
+    with open(_meta_path(name), 'r') as f:
+        return json.load(f)['signature'] == _source_signature(name)
+
+
+def _encode_units(values, units):
+    """int8 codes into the shared unit dictionary (extended with new units), -1 for missing"""
+    codes, uniques = pd.factorize(values)
+    for unit in uniques:
+        if unit not in units:
+            units.append(unit)
+    mapping = np.array([units.index(unit) for unit in uniques] + [-1], dtype='int8')
+    return mapping[codes]
+
+
+def compact_chunk(chunk, units):
+    """Typed usage chunk -> dict of compact column arrays"""
+    return {
+        'msisdn': chunk['msisdn'].to_numpy(dtype='int64', na_value=0),
+        'event_time': chunk['usage_event_date_time'].to_numpy(dtype='datetime64[ns]').view('int64'),
+        'city_id': chunk['usage_event_city_id'].to_numpy(dtype='int16', na_value=-1),
+        'type_id': chunk['usage_event_type_id'].to_numpy(dtype='int16', na_value=-1),
+        'tracking_quantity': chunk['usage_event_tracking_quantity'].to_numpy(dtype='float32', na_value=np.nan),
+        'tracking_unit': _encode_units(chunk['usage_event_tracking_unit'], units),
+        'billing_quantity': chunk['usage_event_billing_quantity'].to_numpy(dtype='float32', na_value=np.nan),
+        'billing_unit': _encode_units(chunk['usage_event_billing_unit'], units),
+        'revenue_cents': np.round(chunk['usage_event_revenue'].to_numpy(dtype='float64', na_value=0.0) * 100).astype('int32'),
+    }
+
+
+def build_event_store(name, chunksize=DEFAULT_CHUNKSIZE):
+    """Write one usage dataset as compact column files, built from its staged chunks"""
+    units = []
+    parts = {col: [] for col in EVENT_COLUMNS}
+    for chunk in iter_staged_chunks(name, chunksize):
+        for col, values in compact_chunk(chunk, units).items():
+            parts[col].append(values)
+
+    tmp_dir = store_path(name) + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    rows = 0
+    for col, dtype in EVENT_COLUMNS.items():
+        values = np.concatenate(parts[col]) if parts[col] else np.empty(0, dtype=dtype)
+        np.save(os.path.join(tmp_dir, f"{col}.npy"), values.astype(dtype, copy=False))
+        rows = len(values)
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+        json.dump({'rows': rows, 'units': units, 'signature': _source_signature(name)}, f)
+
+    shutil.rmtree(store_path(name), ignore_errors=True)
+    os.replace(tmp_dir, store_path(name))
+    print(f"Stored {name}: {rows} events -> {store_path(name)}")
+    return store_path(name)
+
+
+def open_event_store(name, columns=None):
+    """Memory-mapped columns of one dataset plus its unit dictionary, (re)built first if stale"""
+    if not is_current(name):
+        build_event_store(name)
+    with open(_meta_path(name), 'r') as f:
+        meta = json.load(f)
+    columns = EVENT_COLUMNS if columns is None else columns
+    events = {col: np.load(os.path.join(store_path(name), f"{col}.npy"), mmap_mode='r') for col in columns}
+    return events, meta['units']
+
+
+def _masked(values, missing, dtype):
+    """Plain numpy column, or a nullable one when the missing-value marker occurs"""
+    is_missing = values == missing
+    if is_missing.any():
+        return pd.arrays.IntegerArray(np.asarray(values), is_missing).astype(dtype)
+    return values
+
+
+def events_to_usage_frame(events, units):
+    """Usage records with the usual column names over compact columns.
+
+    msisdn stays int64, ids int16, quantities float32 and units categorical;
+    revenue is turned back into float64 rands (exact to the cent).
+    """
+    frame = {}
+    for col, values in events.items():
+        usage_col = USAGE_COLUMN_OF[col]
+        if col == 'msisdn':
+            frame[usage_col] = _masked(values, 0, 'Int64')
+        elif col == 'event_time':
+            frame[usage_col] = np.asarray(values).view('datetime64[ns]')
+        elif col in ('city_id', 'type_id'):
+            frame[usage_col] = _masked(values, -1, 'Int16')
+        elif col in ('tracking_unit', 'billing_unit'):
+            frame[usage_col] = pd.Categorical.from_codes(np.asarray(values), categories=units)
+        elif col == 'revenue_cents':
+            frame[usage_col] = values / 100.0
+        else:
+            frame[usage_col] = values
+    return pd.DataFrame(frame, copy=False)
+
+
+def read_usage_events(names=USAGE_DATASETS, columns=None):
+    """Compact usage DataFrame for the given datasets (usage record column names)"""
+    event_columns = None if columns is None else [col for col, usage_col in USAGE_COLUMN_OF.items() if usage_col in columns]
+    frames = []
+    all_units = []
+    for name in names:
+        events, units = open_event_store(name, event_columns)
+        frames.append(events_to_usage_frame(events, units))
+        all_units += [unit for unit in units if unit not in all_units]
+    if len(frames) == 1:
+        return frames[0]
+
+    # Each dataset has its own unit dictionary; recode to a shared one so the
+    # units stay categorical after concat
+    for frame in frames:
+        for col in ('usage_event_tracking_unit', 'usage_event_billing_unit'):
+            if col in frame.columns:
+                frame[col] = frame[col].cat.set_categories(all_units)
+    return pd.concat(frames, ignore_index=True)
+
+
+def _bytes_per_million(frame):
+    return frame.memory_usage(deep=True, index=False).sum() / max(len(frame), 1) * 1_000_000
+
+
+def memory_report(names=USAGE_DATASETS):
+    """MB per million events: normalized CSV read, typed staging frame, compact frame and files"""
+    rows = []
+    for name in names:
+        normalized = pd.concat(list(iter_usage_chunks(name)), ignore_index=True)
+        typed = read_staged(name)
+        events, units = open_event_store(name)
+        compact = events_to_usage_frame(events, units)
+        stored = sum(values.nbytes for values in events.values()) / max(len(compact), 1) * 1_000_000
+        rows.append({
+            'dataset': name,
+            'events': len(compact),
+            'normalized_csv_MB': _bytes_per_million(normalized) / 2**20,
+            'typed_staging_MB': _bytes_per_million(typed) / 2**20,
+            'compact_frame_MB': _bytes_per_million(compact) / 2**20,
+            'event_store_MB': stored / 2**20,
+        })
+    report = pd.DataFrame(rows)
+    print("Memory per million events (MB):")
+    print(report.to_string(index=False, float_format=lambda v: f"{v:,.1f}"))
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the compact memory-mapped usage event store")
+    parser.add_argument('--rebuild', action='store_true', help="rebuild even if the sources are unchanged")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE)
+    args = parser.parse_args()
+
+    for name in USAGE_DATASETS:
+        if args.rebuild or not is_current(name):
+            build_event_store(name, chunksize=args.chunksize)
+        else:
+            print(f"{name} is up to date")
+    memory_report()
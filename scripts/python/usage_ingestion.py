@@ -0,0 +1,184 @@
+# scripts/python/usage_ingestion.py
+
+import numpy as np
+import pandas as pd # type: ignore
+
+from instrumentation import span
+from normalization import normalize_msisdn_with_rejects, normalize_revenue
+from source_registry import SOURCES, read_source
+from timestamps import detect_timestamp_format, parse_timestamps
+
+USAGE_COLUMNS = [
+    'msisdn', 'usage_event_date_time', 'usage_event_city_id',
+    'usage_event_type_id', 'usage_event_tracking_quantity',
+    'usage_event_tracking_unit', 'usage_event_billing_quantity',
+    'usage_event_billing_unit', 'usage_event_revenue'
+]
+
+# Typed columns once a chunk is normalized (MSISDN as a 27XXXXXXXXX integer key)
+USAGE_DTYPES = {
+    'msisdn': 'Int64',
+    'usage_event_date_time': 'datetime64[ns]',
+    'usage_event_city_id': 'Int64',
+    'usage_event_type_id': 'Int64',
+    'usage_event_tracking_quantity': 'float64',
+    'usage_event_tracking_unit': 'object',
+    'usage_event_billing_quantity': 'float64',
+    'usage_event_billing_unit': 'object',
+    'usage_event_revenue': 'float64',
+}
+
+SMS_EVENT_IDS = [6, 10]  # on-net-sms, other-mobile-sms
+VOICE_EVENT_IDS = [3, 4, 5, 8, 9]  # Various call types
+
+# Rows per chunk in streaming mode
+DEFAULT_CHUNKSIZE = 250_000
+
+WEEK = pd.Timedelta(days=7)
+
+
+def iter_usage_chunks(name, chunksize=DEFAULT_CHUNKSIZE, columns=None):
+    """Yield normalized chunks of one registered usage source (see source_registry.SOURCES).
+
+    The file is read with its declared delimiter, encoding, decimal separator
+    and dtypes, so revenue arrives as float64. Timestamps are parsed with the
+    declared format (detected on the first chunk for a source without one);
+    rows in another known layout are parsed per row (see
+    timestamps.parse_timestamps) and unparseable ones are counted and
+    reported. Pass columns to only parse the columns that are needed.
+    """
+    date_format = SOURCES[name].get('dates', {}).get('usage_event_date_time')
+    format_detected = date_format is not None
+    rejected = 0
+    for chunk in read_source(name, chunksize=chunksize, columns=columns):
+        with span('normalize', name, rows_in=len(chunk)) as step:
+            if 'msisdn' in chunk.columns:
+                chunk['msisdn'], invalid = normalize_msisdn_with_rejects(chunk['msisdn'])
+                step.count(rejected=invalid)
+            if 'usage_event_revenue' in chunk.columns:
+                chunk['usage_event_revenue'] = normalize_revenue(chunk['usage_event_revenue'])
+            step.count(rows_out=len(chunk))
+        if 'usage_event_date_time' in chunk.columns:
+            with span('parse_dates', name, rows_in=len(chunk)) as step:
+                if not format_detected:
+                    date_format = detect_timestamp_format(chunk['usage_event_date_time'])
+                    format_detected = True
+                chunk['usage_event_date_time'], chunk_rejected = parse_timestamps(chunk['usage_event_date_time'], date_format=date_format)
+                step.count(rows_out=len(chunk), rejected=chunk_rejected)
+            rejected += chunk_rejected
+
+        yield chunk
+
+    if rejected:
+        print(f"Warning: {rejected} timestamps in {SOURCES[name]['file']} match no known format and were set to NaT")
+
+
+def find_latest_event_time(chunks):
+    """Streaming pass over timestamp chunks, returns the latest event time"""
+    latest = pd.NaT
+    for chunk in chunks:
+        chunk_latest = chunk['usage_event_date_time'].max()
+        if pd.notna(chunk_latest) and (pd.isna(latest) or chunk_latest > latest):
+            latest = chunk_latest
+    return latest
+
+
+def summarize_usage_chunk(chunk, period_start):
+    """Per (msisdn, week) revenue, SMS billing quantity and voice event count for one chunk.
+
+    Week 0 is the 7 days starting at period_start, -1 the 7 days before, and so on.
+    """
+    chunk = chunk[chunk['usage_event_date_time'].notna()]
+    week = (chunk['usage_event_date_time'] - period_start) // WEEK
+
+    event_type = chunk['usage_event_type_id']
+    is_sms = event_type.isin(SMS_EVENT_IDS)
+    is_voice = event_type.isin(VOICE_EVENT_IDS)
+
+    summary = pd.DataFrame({
+        'msisdn': chunk['msisdn'],
+        'week': week.astype('int64'),
+        'total_weekly_revenue': chunk['usage_event_revenue'],
+        # SMS are counted by billing quantity, voice calls by number of events
+        'total_sms_count': chunk['usage_event_billing_quantity'].where(is_sms, 0),
+        'total_voice_call_count': is_voice.astype('int64'),
+    })
+    return summary.groupby(['msisdn', 'week']).sum()
+
+
+def _sorted_codes(keys):
+    """Dense codes for int64 keys, numbered in key order (hash factorize, then rank the uniques)"""
+    codes, uniques = pd.factorize(keys)
+    order = np.argsort(uniques, kind='stable')
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return rank[codes], uniques[order]
+
+
+def _event_masks(type_ids, *event_id_groups):
+    """One boolean mask per group of event type ids, via a lookup table indexed by type id"""
+    size = max([int(type_ids.max(initial=0))] + [max(ids) for ids in event_id_groups]) + 1
+    masks = []
+    for ids in event_id_groups:
+        lookup = np.zeros(size, dtype=bool)
+        lookup[ids] = True
+        masks.append(lookup[type_ids])
+    return masks
+
+
+def summarize_usage_by_msisdn(usage):
+    """Revenue, SMS billing quantity and voice event count per msisdn in one pass.
+
+    MSISDNs are coded to dense integers once and each metric is a weighted
+    bincount over those codes, instead of a groupby per metric plus merges.
+    Rows without an msisdn are left out, as groupby does. Sorted by msisdn.
+    """
+    msisdn = usage['msisdn']
+    keep = msisdn.notna().to_numpy()
+    if keep.all():
+        keep = slice(None)
+
+    codes, msisdns = _sorted_codes(msisdn.to_numpy(dtype='int64', na_value=0)[keep])
+    type_ids = usage['usage_event_type_id'].to_numpy(dtype='int64', na_value=0)[keep]
+    is_sms, is_voice = _event_masks(type_ids, SMS_EVENT_IDS, VOICE_EVENT_IDS)
+    revenue = usage['usage_event_revenue'].to_numpy(dtype='float64', na_value=0.0)[keep]
+    billing_quantity = usage['usage_event_billing_quantity'].to_numpy(dtype='float64', na_value=0.0)[keep]
+
+    # SMS are counted by billing quantity, voice calls by number of events
+    subscribers = len(msisdns)
+    return pd.DataFrame({
+        'msisdn': pd.array(msisdns, dtype='Int64'),
+        'total_weekly_revenue': np.bincount(codes, weights=revenue, minlength=subscribers),
+        'total_sms_count': np.bincount(codes, weights=np.where(is_sms, billing_quantity, 0.0), minlength=subscribers),
+        'total_voice_call_count': np.bincount(codes[is_voice], minlength=subscribers).astype('int64'),
+    })
+
+
+def aggregate_usage_stream(chunks, period_start):
+    """Fold normalized usage chunks into running per-(msisdn, week) totals.
+
+    Only the running totals are kept between chunks, so memory grows with
+    subscribers x weeks rather than with the number of usage records.
+    """
+    totals = None
+    rows_read = 0
+    for chunk in chunks:
+        rows_read += len(chunk)
+        summary = summarize_usage_chunk(chunk, period_start)
+        totals = summary if totals is None else totals.add(summary, fill_value=0)
+
+    if totals is None:
+        totals = pd.DataFrame(
+            columns=['total_weekly_revenue', 'total_sms_count', 'total_voice_call_count'],
+            index=pd.MultiIndex.from_arrays([[], []], names=['msisdn', 'week'])
+        )
+
+    print(f"Streamed {rows_read} usage records into {len(totals)} subscriber-week totals")
+    return totals
+
+
+def type_usage_chunk(chunk):
+    """Cast a normalized usage chunk to the fixed staging dtypes"""
+    if 'msisdn' in chunk.columns:
+        chunk['msisdn'] = pd.to_numeric(chunk['msisdn'], errors='coerce').astype('Int64')
+    return chunk.astype({col: dtype for col, dtype in USAGE_DTYPES.items() if col in chunk.columns})
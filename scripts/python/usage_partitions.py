@@ -0,0 +1,96 @@
+# scripts/python/usage_partitions.py
+
+import datetime
+
+import pandas as pd # type: ignore
+from sqlalchemy import text # type: ignore
+
+# usage_records is range-partitioned on usage_event_date_time, one partition per
+# Monday-to-Sunday week (see scripts/sql/schema/tables.sql). Rows without a
+# timestamp land in the default partition usage_records_undated.
+PARENT_TABLE = 'usage_records'
+PARTITION_PREFIX = 'usage_records_w'
+
+
+def weeks_of(event_times):
+    """Monday week starts (as dates) of a Series of event timestamps"""
+    event_times = pd.to_datetime(event_times).dropna()
+    week_starts = event_times.dt.normalize() - pd.to_timedelta(event_times.dt.weekday, unit='D')
+    return {week_start.date() for week_start in week_starts.unique()}
+
+
+def _as_date(week_start):
+    if isinstance(week_start, str):
+        week_start = pd.Timestamp(week_start)
+    if isinstance(week_start, pd.Timestamp):
+        week_start = week_start.date()
+    if week_start.weekday() != 0:
+        raise ValueError(f"{week_start} is not a Monday")
+    return week_start
+
+
+def partition_name(week_start):
+    return f"{PARTITION_PREFIX}{_as_date(week_start):%Y%m%d}"
+
+
+def _bounds(week_start):
+    week_start = _as_date(week_start)
+    return week_start, week_start + datetime.timedelta(days=7)
+
+
+def ensure_week_partitions(conn, week_starts):
+    """Create the partitions for these weeks if they don't exist yet"""
+    for week_start in sorted(set(week_starts)):
+        lower, upper = _bounds(week_start)
+        conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS {partition_name(week_start)}
+            PARTITION OF {PARENT_TABLE} FOR VALUES FROM ('{lower}') TO ('{upper}');
+        """))
+
+
+def list_week_partitions(conn):
+    """Week starts of the existing partitions, oldest first"""
+    rows = conn.execute(text("""
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = :parent AND child.relname LIKE :prefix
+        ORDER BY child.relname;
+    """), {'parent': PARENT_TABLE, 'prefix': PARTITION_PREFIX + '%'}).fetchall()
+    return [datetime.datetime.strptime(row[0][len(PARTITION_PREFIX):], '%Y%m%d').date() for row in rows]
+
+
+def drop_week_partitions(conn):
+    """Drop every week partition, e.g. ahead of a full reload"""
+    for week_start in list_week_partitions(conn):
+        conn.execute(text(f"DROP TABLE {partition_name(week_start)};"))
+
+
+def prepare_swap_table(conn, week_start):
+    """Empty table shaped like a week partition, to be loaded and then swapped in"""
+    lower, upper = _bounds(week_start)
+    swap_table = partition_name(week_start) + '_swap'
+    conn.execute(text(f"DROP TABLE IF EXISTS {swap_table};"))
+    conn.execute(text(f"CREATE TABLE {swap_table} (LIKE {PARENT_TABLE} INCLUDING DEFAULTS INCLUDING GENERATED);"))
+    # Matching CHECK constraint lets ATTACH PARTITION skip its validation scan
+    conn.execute(text(f"""
+        ALTER TABLE {swap_table} ADD CONSTRAINT {swap_table}_range CHECK (
+            usage_event_date_time IS NOT NULL
+            AND usage_event_date_time >= '{lower}' AND usage_event_date_time < '{upper}'
+        );
+    """))
+    return swap_table
+
+
+def swap_week_partition(conn, week_start, swap_table):
+    """Replace a week's partition with a loaded swap table (one transaction)"""
+    lower, upper = _bounds(week_start)
+    name = partition_name(week_start)
+    exists = conn.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {'name': name}).scalar()
+    if exists:
+        conn.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name};"))
+        conn.execute(text(f"DROP TABLE {name};"))
+    conn.execute(text(f"ALTER TABLE {swap_table} RENAME TO {name};"))
+    conn.execute(text(f"ALTER TABLE {name} RENAME CONSTRAINT {swap_table}_range TO {name}_range;"))
+    conn.execute(text(f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {name} FOR VALUES FROM ('{lower}') TO ('{upper}');"))
@@ -1,63 +1,45 @@
--- Regional Analysis with City Lookup (PostgreSQL)
-WITH subscriber_regions AS (
-    SELECT 
-        ur.msisdn,
-        ur.usage_event_date_time,
-        ur.usage_event_revenue,
-        COALESCE(ms.region, cl."CITY_NAME", 'Unknown') AS region_name,
-        cl."PROVINCE_NAME" AS province_name,
-        DATE_TRUNC('week', ur.usage_event_date_time)::DATE AS week_start
-    FROM usage_records ur
-    LEFT JOIN master_subscribers ms ON ur.msisdn::bigint = ms.cell_phone_number
-    LEFT JOIN city_lookup cl ON ur.usage_event_city_id = cl."CITY_ID"
-    WHERE ur.usage_event_date_time IS NOT NULL
-),
-weekly_regional_usage AS (
+-- Regional Analysis (PostgreSQL)
+-- The loader resolves every usage record to a region_id of region_dim (the
+-- subscriber's master region, else the event city), so the rollup groups
+-- subscriber_week_fact on integers and names come from one join at the end.
+-- Each region has one province, one row per week and region.
+-- qualifying_subscribers are the subscribers whose revenue in the region
+-- reached 30 that week. The sketches' campaign_qualifiers_active differ: they
+-- count the week's campaign qualifiers (revenue across all regions) active in
+-- the region.
+WITH weekly_regional_subscribers AS (
     SELECT 
         week_start,
-        region_name,
-        province_name,
-        COUNT(DISTINCT msisdn) AS total_subscribers,
-        SUM(usage_event_revenue) AS total_revenue
-    FROM subscriber_regions
-    GROUP BY week_start, region_name, province_name
-),
-weekly_regional_qualifiers AS (
-    SELECT 
-        week_start,
-        region_name,
-        province_name,
+        region_id,
         msisdn,
-        SUM(usage_event_revenue) AS weekly_revenue
-    FROM subscriber_regions
-    GROUP BY week_start, region_name, province_name, msisdn
-    HAVING SUM(usage_event_revenue) >= 30
+        SUM(revenue) AS weekly_revenue
+    FROM subscriber_week_fact
+    GROUP BY week_start, region_id, msisdn
 ),
-weekly_regional_qualifier_count AS (
+weekly_regional_usage AS (
     SELECT 
         week_start,
-        region_name,
-        province_name,
-        COUNT(*) AS qualifying_subscribers,
-        AVG(weekly_revenue) AS avg_qualifier_revenue
-    FROM weekly_regional_qualifiers
-    GROUP BY week_start, region_name, province_name
+        region_id,
+        COUNT(msisdn) AS total_subscribers,
+        SUM(weekly_revenue) AS total_revenue,
+        COUNT(*) FILTER (WHERE weekly_revenue >= 30) AS qualifying_subscribers,
+        AVG(weekly_revenue) FILTER (WHERE weekly_revenue >= 30) AS avg_qualifier_revenue
+    FROM weekly_regional_subscribers
+    GROUP BY week_start, region_id
 )
 SELECT 
     w.week_start,
-    w.region_name,
-    w.province_name,
+    COALESCE(r.region_name, 'Unknown') AS region_name,
+    r.province_name,
     w.total_subscribers,
     w.total_revenue,
-    COALESCE(q.qualifying_subscribers, 0) AS qualifying_subscribers,
-    COALESCE(q.avg_qualifier_revenue, 0) AS avg_qualifier_revenue,
+    w.qualifying_subscribers,
+    COALESCE(w.avg_qualifier_revenue, 0) AS avg_qualifier_revenue,
     CASE 
         WHEN w.total_subscribers > 0 THEN 
-            ROUND((COALESCE(q.qualifying_subscribers, 0) * 100.0 / w.total_subscribers), 2)
+            ROUND((w.qualifying_subscribers * 100.0 / w.total_subscribers), 2)
         ELSE 0 
     END AS qualification_rate
 FROM weekly_regional_usage w
-LEFT JOIN weekly_regional_qualifier_count q 
-    ON w.week_start = q.week_start 
-    AND w.region_name = q.region_name
-ORDER BY w.week_start, w.total_revenue DESC;
\ No newline at end of file
+LEFT JOIN region_dim r ON w.region_id = r.region_id
+ORDER BY w.week_start, w.total_revenue DESC, w.region_id;
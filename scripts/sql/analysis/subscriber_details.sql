@@ -1,15 +1,16 @@
 -- Subscriber Details for Drill-Through Analysis (PostgreSQL)
+-- Reads the per-subscriber weekly aggregates in subscriber_week_fact
+-- (built by load_data_to_db) instead of scanning usage_records
 WITH weekly_subscriber_revenue AS (
     SELECT 
         msisdn,
-        DATE_TRUNC('week', usage_event_date_time)::DATE AS week_start,
-        SUM(usage_event_revenue) AS weekly_revenue,
-        COUNT(*) AS total_events,
-        COUNT(CASE WHEN usage_event_type_id IN (6, 10) THEN 1 END) AS sms_events,
-        COUNT(CASE WHEN usage_event_type_id IN (3, 4, 5, 8, 9) THEN 1 END) AS voice_events
-    FROM usage_records
-    WHERE usage_event_date_time IS NOT NULL --dont count revenue for unknown dates
-    GROUP BY msisdn, DATE_TRUNC('week', usage_event_date_time)::DATE
+        week_start,
+        SUM(revenue) AS weekly_revenue,
+        SUM(event_count) AS total_events,
+        SUM(sms_count) AS sms_events,
+        SUM(voice_count) AS voice_events
+    FROM subscriber_week_fact
+    GROUP BY msisdn, week_start
 )
 SELECT 
     wr.msisdn,
@@ -26,5 +27,5 @@ SELECT
     ms.sim_activation_date,
     ms.source_system_name
 FROM weekly_subscriber_revenue wr
-LEFT JOIN master_subscribers ms ON wr.msisdn::bigint = ms.cell_phone_number
-ORDER BY wr.week_start, wr.weekly_revenue DESC;
\ No newline at end of file
+LEFT JOIN master_subscribers ms ON wr.msisdn = ms.cell_phone_number
+ORDER BY wr.week_start, wr.weekly_revenue DESC;
@@ -0,0 +1,3 @@
+-- Indexes for the typed tables (DuckDB variant of ../indexes.sql)
+-- None: DuckDB scans columns and skips row groups by their min/max zone maps,
+-- and its ART indexes only speed up point lookups while slowing down loads.
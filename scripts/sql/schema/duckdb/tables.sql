@@ -0,0 +1,52 @@
+-- Typed tables loaded by load_data_to_db (DuckDB variant of ../tables.sql)
+-- DuckDB has no declarative partitions: usage_records is one table, which its
+-- row-group zone maps prune by usage_event_date_time instead.
+
+CREATE TABLE IF NOT EXISTS usage_records (
+    msisdn BIGINT,
+    usage_event_date_time TIMESTAMP,
+    usage_event_city_id SMALLINT,
+    usage_event_type_id SMALLINT,
+    usage_event_tracking_quantity NUMERIC,
+    usage_event_tracking_unit TEXT,
+    usage_event_billing_quantity NUMERIC,
+    usage_event_billing_unit TEXT,
+    usage_event_revenue NUMERIC(12,2),
+    -- Resolved by the loader from the subscriber's master region / event city (see region_dim)
+    region_id SMALLINT,
+    -- Monday of the event's week, same as DATE_TRUNC('week', ...)::DATE
+    week_start DATE GENERATED ALWAYS AS (CAST(DATE_TRUNC('week', usage_event_date_time) AS DATE)) VIRTUAL
+);
+
+CREATE TABLE IF NOT EXISTS master_subscribers (
+    region TEXT,
+    cell_phone_number BIGINT,
+    sim_activation_date DATE,
+    first_name TEXT,
+    last_name TEXT,
+    date_of_birth TEXT,
+    source_system_name TEXT,
+    source_priority SMALLINT,
+    is_master_record BOOLEAN
+);
+
+CREATE TABLE IF NOT EXISTS city_lookup (
+    "CITY_ID" SMALLINT PRIMARY KEY,
+    "PROVINCE_NAME" TEXT,
+    "CITY_NAME" TEXT,
+    "ALTERNATIVE_CITY_NAME" TEXT,
+    "CITY_LATITUDE" DOUBLE PRECISION,
+    "CITY_LONGITUDE" DOUBLE PRECISION,
+    "CITY_POPULATION" TEXT
+);
+
+CREATE TABLE IF NOT EXISTS region_dim (
+    region_id SMALLINT PRIMARY KEY,
+    region_name TEXT NOT NULL,
+    province_name TEXT
+);
+
+CREATE TABLE IF NOT EXISTS usage_event_lookup (
+    "USAGE_EVENT_TYPE_ID" SMALLINT PRIMARY KEY,
+    "USAGE_EVENT_TYPE" TEXT
+);
@@ -0,0 +1,11 @@
+-- Indexes for the typed tables (PostgreSQL)
+-- (week_start, msisdn) serves the per-week subscriber rollups and the weekly
+-- refresh of subscriber_week_fact; (region_id, week_start) the regional
+-- ones. msisdn and cell_phone_number are both BIGINT, so joins
+-- between them can use the indexes without casts.
+
+CREATE INDEX IF NOT EXISTS idx_usage_week_msisdn ON usage_records (week_start, msisdn);
+CREATE INDEX IF NOT EXISTS idx_usage_region_week ON usage_records (region_id, week_start);
+CREATE INDEX IF NOT EXISTS idx_usage_msisdn ON usage_records (msisdn);
+CREATE INDEX IF NOT EXISTS idx_usage_date ON usage_records (usage_event_date_time);
+CREATE INDEX IF NOT EXISTS idx_subscribers_cell ON master_subscribers (cell_phone_number);
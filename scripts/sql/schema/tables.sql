@@ -0,0 +1,57 @@
+-- Typed tables loaded by load_data_to_db (PostgreSQL)
+-- Loaders append into these tables (a reload truncates them), so the types
+-- below are what the analysis SQL sees rather than what to_sql would infer.
+-- Bump SCHEMA_VERSION in db_schema.py when changing them.
+
+CREATE TABLE IF NOT EXISTS usage_records (
+    msisdn BIGINT,
+    usage_event_date_time TIMESTAMP,
+    usage_event_city_id SMALLINT,
+    usage_event_type_id SMALLINT,
+    usage_event_tracking_quantity NUMERIC,
+    usage_event_tracking_unit TEXT,
+    usage_event_billing_quantity NUMERIC,
+    usage_event_billing_unit TEXT,
+    usage_event_revenue NUMERIC(12,2),
+    -- Resolved by the loader from the subscriber's master region / event city (see region_dim)
+    region_id SMALLINT,
+    -- Monday of the event's week, same as DATE_TRUNC('week', ...)::DATE
+    week_start DATE GENERATED ALWAYS AS (DATE_TRUNC('week', usage_event_date_time)::DATE) STORED
+) PARTITION BY RANGE (usage_event_date_time);
+
+-- One partition per week, created by the loader as weeks arrive
+-- (usage_records_wYYYYMMDD, see usage_partitions.py); undated rows go here
+CREATE TABLE IF NOT EXISTS usage_records_undated PARTITION OF usage_records DEFAULT;
+
+CREATE TABLE IF NOT EXISTS master_subscribers (
+    region TEXT,
+    cell_phone_number BIGINT,
+    sim_activation_date DATE,
+    first_name TEXT,
+    last_name TEXT,
+    date_of_birth TEXT,
+    source_system_name TEXT,
+    source_priority SMALLINT,
+    is_master_record BOOLEAN
+);
+
+CREATE TABLE IF NOT EXISTS city_lookup (
+    "CITY_ID" SMALLINT PRIMARY KEY,
+    "PROVINCE_NAME" TEXT,
+    "CITY_NAME" TEXT,
+    "ALTERNATIVE_CITY_NAME" TEXT,
+    "CITY_LATITUDE" DOUBLE PRECISION,
+    "CITY_LONGITUDE" DOUBLE PRECISION,
+    "CITY_POPULATION" TEXT
+);
+
+CREATE TABLE IF NOT EXISTS region_dim (
+    region_id SMALLINT PRIMARY KEY,
+    region_name TEXT NOT NULL,
+    province_name TEXT
+);
+
+CREATE TABLE IF NOT EXISTS usage_event_lookup (
+    "USAGE_EVENT_TYPE_ID" SMALLINT PRIMARY KEY,
+    "USAGE_EVENT_TYPE" TEXT
+);
@@ -1,12 +1,54 @@
 -- Top Performing Regions View (PostgreSQL)
+-- Weekly regional totals are rolled up from subscriber_week_fact on region_id,
+-- the same way regional_analysis.sql does, then summed over all weeks.
+-- Subscribers are counted once over all weeks (not summed per week, which
+-- counted a subscriber active in several weeks several times); see
+-- subscriber_sketches.py for the same counts per month or quarter.
+DROP VIEW IF EXISTS top_performing_regions;
 CREATE OR REPLACE VIEW top_performing_regions AS
+WITH weekly_regional_subscribers AS (
+    SELECT 
+        week_start,
+        region_id,
+        msisdn,
+        SUM(revenue) AS weekly_revenue
+    FROM subscriber_week_fact
+    GROUP BY week_start, region_id, msisdn
+),
+weekly_regional AS (
+    SELECT 
+        week_start,
+        region_id,
+        COUNT(msisdn) AS total_subscribers,
+        COUNT(*) FILTER (WHERE weekly_revenue >= 30) AS qualifying_subscribers,
+        SUM(weekly_revenue) AS total_revenue
+    FROM weekly_regional_subscribers
+    GROUP BY week_start, region_id
+),
+regional_subscribers AS (
+    SELECT 
+        region_id,
+        COUNT(DISTINCT msisdn) AS total_subscribers,
+        COUNT(DISTINCT CASE WHEN weekly_revenue >= 30 THEN msisdn END) AS total_qualifiers
+    FROM weekly_regional_subscribers
+    GROUP BY region_id
+),
+regional_totals AS (
+    SELECT 
+        region_id,
+        SUM(total_revenue) AS total_revenue,
+        AVG(ROUND(qualifying_subscribers * 100.0 / NULLIF(total_subscribers, 0), 2)) AS avg_qualification_rate
+    FROM weekly_regional
+    GROUP BY region_id
+)
 SELECT 
-    region_name,
-    province_name,
-    SUM(total_subscribers) AS total_subscribers,
-    SUM(qualifying_subscribers) AS total_qualifiers,
-    SUM(total_revenue) AS total_revenue,
-    AVG(qualification_rate) AS avg_qualification_rate,
-    RANK() OVER (ORDER BY SUM(qualifying_subscribers) DESC) AS performance_rank
-FROM regional_analysis
-GROUP BY region_name, province_name;
\ No newline at end of file
+    COALESCE(r.region_name, 'Unknown') AS region_name,
+    r.province_name,
+    s.total_subscribers,
+    s.total_qualifiers,
+    t.total_revenue,
+    t.avg_qualification_rate,
+    RANK() OVER (ORDER BY s.total_qualifiers DESC) AS performance_rank
+FROM regional_totals t
+JOIN regional_subscribers s ON t.region_id = s.region_id
+LEFT JOIN region_dim r ON t.region_id = r.region_id;
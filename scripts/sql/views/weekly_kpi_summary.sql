@@ -1,13 +1,34 @@
 -- Weekly KPI Summary View (PostgreSQL)
+-- Built on subscriber_week_fact, so it is current right after each load
+DROP VIEW IF EXISTS weekly_kpi_summary;
 CREATE OR REPLACE VIEW weekly_kpi_summary AS
+WITH subscriber_weeks AS (
+    SELECT 
+        week_start,
+        msisdn,
+        SUM(revenue) AS weekly_revenue,
+        SUM(event_count) AS total_events
+    FROM subscriber_week_fact
+    GROUP BY week_start, msisdn
+),
+weekly_totals AS (
+    SELECT 
+        week_start,
+        COUNT(msisdn) AS total_subscribers,
+        COUNT(*) FILTER (WHERE weekly_revenue >= 30) AS qualifying_subscribers,
+        SUM(weekly_revenue) AS total_revenue,
+        SUM(total_events)::BIGINT AS total_events
+    FROM subscriber_weeks
+    GROUP BY week_start
+)
 SELECT 
     week_start,
     total_subscribers,
     qualifying_subscribers,
     total_revenue,
-    qualification_rate,
+    ROUND(qualifying_subscribers * 100.0 / NULLIF(total_subscribers, 0), 2) AS qualification_rate,
     total_revenue / NULLIF(qualifying_subscribers, 0) AS avg_revenue_per_qualifier,
     total_events,
     qualifying_subscribers - LAG(qualifying_subscribers) OVER (ORDER BY week_start) AS subscriber_growth,
     total_revenue - LAG(total_revenue) OVER (ORDER BY week_start) AS revenue_growth
-FROM weekly_summary_trends;
\ No newline at end of file
+FROM weekly_totals;